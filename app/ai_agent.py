@@ -16,6 +16,7 @@ from models.user import User, Client
 from models.order import Order, OrderItem
 from models.product import Product, Category
 from models.bonus import BonusTransaction
+from services import client_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -340,13 +341,8 @@ HAPPY CORN - наш эксклюзивный продукт, ГЛАВНЫЙ дл
         """Получить контекст о клиенте"""
         
         # Информация о заказах
-        recent_orders = db.query(Order).filter(
-            Order.client_id == client.id
-        ).order_by(Order.created_at.desc()).limit(5).all()
-        
-        total_orders = db.query(Order).filter(
-            Order.client_id == client.id
-        ).count()
+        metrics = client_metrics.summary(db, client.id)
+        total_orders = metrics['total_orders']
         
         context = f"""
 👤 ИНФОРМАЦИЯ О КЛИЕНТЕ:
@@ -369,8 +365,8 @@ HAPPY CORN - наш эксклюзивный продукт, ГЛАВНЫЙ дл
 • Всего заказов: {total_orders}
 """
             
-            if recent_orders:
-                context += f"• Последний заказ: {recent_orders[0].created_at.strftime('%d.%m.%Y')}\n"
+            if metrics['last_order_at']:
+                context += f"• Последний заказ: {metrics['last_order_at'].strftime('%d.%m.%Y')}\n"
             
             if total_orders == 0:
                 context += "\n💡 Новый клиент! Помогите с первым заказом, уделите особое внимание.\n"
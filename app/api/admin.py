@@ -1,12 +1,12 @@
 """
 API для администраторов и менеджеров
 """
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Header
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File, Header, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_, or_
 from typing import List, Optional
 from datetime import datetime, timedelta
-from database import get_db
+from database import get_db, get_pool_stats
 from models.user import User, Client
 from models.product import Product, Category
 from models.order import Order, OrderItem, OrderHistory
@@ -23,6 +23,11 @@ from schemas import (
 from api.auth import get_current_user
 from config import settings
 from notifications import notifier
+from services.catalog_cache import catalog_cache
+from services.settings_service import settings_service
+from services.client_search import search_clients
+from services import client_metrics, order_events, sales_rollup
+from pagination import paginate, InvalidCursor, NEXT_CURSOR_HEADER
 import logging
 
 logger = logging.getLogger(__name__)
@@ -122,6 +127,7 @@ async def admin_create_product(
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    catalog_cache.invalidate()
     
     return db_product
 
@@ -149,6 +155,7 @@ async def admin_update_product(
     
     db.commit()
     db.refresh(product)
+    catalog_cache.invalidate()
     
     return product
 
@@ -168,6 +175,7 @@ async def admin_delete_product(
     
     product.is_active = False
     db.commit()
+    catalog_cache.invalidate()
     
     return {"message": "Product deleted"}
 
@@ -193,6 +201,7 @@ async def admin_create_category(
     db.add(category)
     db.commit()
     db.refresh(category)
+    catalog_cache.invalidate()
     
     return category
 
@@ -202,8 +211,11 @@ async def admin_create_category(
 
 @router.get("/clients", response_model=List[ClientSchema])
 async def admin_get_clients(
+    response: Response,
     status: Optional[str] = Query(None, description="pending, active, blocked"),
-    search: Optional[str] = Query(None),
+    search: Optional[str] = Query(None, description="Название, БИН/ИИН, телефон, username"),
+    sales_rep_id: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     admin: User = Depends(get_admin_from_header),
@@ -211,25 +223,26 @@ async def admin_get_clients(
 ):
     """
     Получить список клиентов
-    """
-    query = db.query(Client)
-    
-    if status:
-        query = query.filter(Client.status == status)
     
-    if search:
-        query = query.filter(
-            or_(
-                Client.company_name.ilike(f"%{search}%"),
-                Client.bin_iin.ilike(f"%{search}%")
-            )
-        )
+    Keyset-пагинация: курсор следующей страницы в заголовке X-Next-Cursor.
+    skip оставлен для старых клиентов API и работает только без cursor.
+    """
+    query = search_clients(
+        db,
+        search=search,
+        status=status,
+        sales_rep_id=sales_rep_id,
+        # Для менеджера - только его клиенты
+        manager_id=admin.id if admin.role == "manager" else None
+    )
     
-    # Для менеджера - только его клиенты
-    if admin.role == "manager":
-        query = query.filter(Client.manager_id == admin.id)
+    try:
+        clients, next_cursor = paginate(query, (Client.created_at, Client.id), limit, cursor, skip)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
     
-    clients = query.order_by(Client.created_at.desc()).offset(skip).limit(limit).all()
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return clients
 
@@ -357,10 +370,12 @@ async def admin_block_client(
 
 @router.get("/orders", response_model=List[OrderSchema])
 async def admin_get_orders(
+    response: Response,
     status: Optional[str] = Query(None),
     client_id: Optional[int] = Query(None),
     date_from: Optional[str] = Query(None),
     date_to: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
     skip: int = Query(0, ge=0),
     limit: int = Query(50, ge=1, le=200),
     admin: User = Depends(get_admin_from_header),
@@ -368,6 +383,8 @@ async def admin_get_orders(
 ):
     """
     Получить список заказов
+    
+    Keyset-пагинация по (created_at, id), курсор в заголовке X-Next-Cursor.
     """
     query = db.query(Order)
     
@@ -387,7 +404,13 @@ async def admin_get_orders(
     if date_to:
         query = query.filter(Order.created_at <= datetime.fromisoformat(date_to))
     
-    orders = query.order_by(Order.created_at.desc()).offset(skip).limit(limit).all()
+    try:
+        orders, next_cursor = paginate(query, (Order.created_at, Order.id), limit, cursor, skip)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return orders
 
@@ -419,21 +442,12 @@ async def admin_update_order_status(
         order.delivered_at = datetime.utcnow()
         
         # Начисляем бонусы
-        from models.settings import SystemSetting
         from models.bonus import BonusTransaction
         from utils import calculate_bonus_amount
         from dateutil.relativedelta import relativedelta
         
-        bonus_percent_setting = db.query(SystemSetting).filter(
-            SystemSetting.key == "bonus_percent_default"
-        ).first()
-        
-        bonus_expiry_setting = db.query(SystemSetting).filter(
-            SystemSetting.key == "bonus_expiry_months"
-        ).first()
-        
-        bonus_percent = float(bonus_percent_setting.value) if bonus_percent_setting else 2.0
-        expiry_months = int(bonus_expiry_setting.value) if bonus_expiry_setting else 6
+        bonus_percent = settings_service.get("bonus_percent_default")
+        expiry_months = settings_service.get("bonus_expiry_months")
         
         bonus_amount = calculate_bonus_amount(order.total, bonus_percent)
         
@@ -452,6 +466,7 @@ async def admin_update_order_status(
                 expires_at=expires_at
             )
             db.add(bonus_tx)
+            client_metrics.bonus_recorded(db, client.id, earned=bonus_amount)
     
     # Записываем историю
     history = OrderHistory(
@@ -462,6 +477,8 @@ async def admin_update_order_status(
     )
     db.add(history)
     
+    order_events.order_status_changed(db, order, old_status)
+    
     db.commit()
     try:
         await notifier.notify_order_status_changed(order, new_status, db)
@@ -484,44 +501,23 @@ async def admin_get_dashboard_stats(
 ):
     """
     Статистика для дашборда
+    
+    Заказы и выручка - из витрины sales_rollup (без отменённых заказов).
     """
     today = datetime.utcnow().date()
     week_ago = today - timedelta(days=7)
     
-    # Сегодняшние заказы
-    today_orders_query = db.query(Order).filter(
-        func.date(Order.created_at) == today
-    )
-    
-    if admin.role == "manager":
-        today_orders_query = today_orders_query.filter(Order.manager_id == admin.id)
-    
-    today_orders = today_orders_query.count()
-    today_revenue = db.query(func.sum(Order.final_total)).filter(
-        func.date(Order.created_at) == today
-    ).scalar() or 0.0
-    
-    # За неделю
-    week_orders_query = db.query(Order).filter(
-        Order.created_at >= week_ago
-    )
-    
-    if admin.role == "manager":
-        week_orders_query = week_orders_query.filter(Order.manager_id == admin.id)
+    # Менеджер видит только свои заказы
+    manager_id = admin.id if admin.role == "manager" else None
     
-    week_orders = week_orders_query.count()
-    week_revenue = db.query(func.sum(Order.final_total)).filter(
-        Order.created_at >= week_ago
-    ).scalar() or 0.0
+    today_totals = sales_rollup.totals(db, today, manager_id=manager_id)
+    week_totals = sales_rollup.totals(db, week_ago, manager_id=manager_id)
     
     # Ожидают модерации
     pending_clients = db.query(Client).filter(Client.status == "pending").count()
     
     # Низкие остатки
-    low_stock_setting = db.query(SystemSetting).filter(
-        SystemSetting.key == "low_stock_threshold"
-    ).first()
-    threshold = int(low_stock_setting.value) if low_stock_setting else 10
+    threshold = settings_service.get("low_stock_threshold")
     
     low_stock_products = db.query(Product).filter(
         Product.is_active == True,
@@ -529,13 +525,22 @@ async def admin_get_dashboard_stats(
     ).count()
     
     return {
-        "today_orders": today_orders,
-        "today_revenue": today_revenue,
-        "week_orders": week_orders,
-        "week_revenue": week_revenue,
+        "today_orders": today_totals['orders'],
+        "today_revenue": today_totals['net_revenue'],
+        "week_orders": week_totals['orders'],
+        "week_revenue": week_totals['net_revenue'],
         "pending_clients": pending_clients,
         "low_stock_products": low_stock_products
     }
+@router.get("/stats/db_pool")
+async def admin_get_db_pool_stats(
+    admin: User = Depends(get_admin_from_header)
+):
+    """
+    Состояние пула соединений с БД
+    """
+    return get_pool_stats()
+
 # ============================================
 # ИМПОРТ ТОВАРОВ
 # ============================================
@@ -639,6 +644,7 @@ async def import_products(
                 errors.append(f"Строка {idx + 2}: {str(e)}")
         
         db.commit()
+        catalog_cache.invalidate()
         
         return {
             "success": True,
@@ -724,5 +730,6 @@ async def admin_update_setting(
     
     db.commit()
     db.refresh(setting)
+    settings_service.changed()
     
     return setting
\ No newline at end of file
@@ -1,8 +1,8 @@
 """
 API для дашборда AI-агента
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.orm import Session, joinedload
 from sqlalchemy import func, and_
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -12,6 +12,7 @@ from models.user import User
 from models.ai_log import AIConversation, AIProactiveMessage
 from models.ai_settings import AIAgentSettings
 from api.admin import get_admin_from_header
+from pagination import paginate, InvalidCursor, NEXT_CURSOR_HEADER
 
 router = APIRouter()
 
@@ -71,7 +72,9 @@ async def get_ai_stats(
 
 @router.get("/conversations")
 async def get_conversations(
+    response: Response,
     client_id: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
     limit: int = Query(50, ge=1, le=200),
     skip: int = Query(0, ge=0),
     admin: User = Depends(get_admin_from_header),
@@ -80,14 +83,20 @@ async def get_conversations(
     """
     История диалогов с AI
     """
-    query = db.query(AIConversation)
+    query = db.query(AIConversation).options(joinedload(AIConversation.client))
     
     if client_id:
         query = query.filter(AIConversation.client_id == client_id)
     
-    conversations = query.order_by(
-        AIConversation.created_at.desc()
-    ).offset(skip).limit(limit).all()
+    try:
+        conversations, next_cursor = paginate(
+            query, (AIConversation.created_at, AIConversation.id), limit, cursor, skip
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return [
         {
@@ -103,7 +112,9 @@ async def get_conversations(
 
 @router.get("/proactive")
 async def get_proactive_messages(
+    response: Response,
     client_id: Optional[int] = Query(None),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
     limit: int = Query(50, ge=1, le=200),
     skip: int = Query(0, ge=0),
     admin: User = Depends(get_admin_from_header),
@@ -112,14 +123,20 @@ async def get_proactive_messages(
     """
     История проактивных сообщений
     """
-    query = db.query(AIProactiveMessage)
+    query = db.query(AIProactiveMessage).options(joinedload(AIProactiveMessage.client))
     
     if client_id:
         query = query.filter(AIProactiveMessage.client_id == client_id)
     
-    messages = query.order_by(
-        AIProactiveMessage.sent_at.desc()
-    ).offset(skip).limit(limit).all()
+    try:
+        messages, next_cursor = paginate(
+            query, (AIProactiveMessage.sent_at, AIProactiveMessage.id), limit, cursor, skip
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
     
     return [
         {
@@ -6,7 +6,7 @@ from sqlalchemy.orm import Session
 from typing import Optional
 from database import get_db
 from models.user import User, Client
-from models.settings import SystemSetting
+from services.settings_service import settings_service
 from schemas import (
     ClientCreate, 
     ClientProfile,
@@ -97,13 +97,8 @@ async def register_client(
     db.add(user)
     db.flush()
     
-    credit_limit = db.query(SystemSetting).filter(
-        SystemSetting.key == "credit_limit_default"
-    ).first()
-    
-    payment_delay = db.query(SystemSetting).filter(
-        SystemSetting.key == "payment_delay_default"
-    ).first()
+    credit_limit = settings_service.get("credit_limit_default")
+    payment_delay = settings_service.get("payment_delay_default")
     
     client = Client(
         user_id=user.id,
@@ -111,8 +106,8 @@ async def register_client(
         address=client_data.address,
         bin_iin=client_data.bin_iin,
         status="pending",
-        credit_limit=float(credit_limit.value) if credit_limit else 500000.0,
-        payment_delay_days=int(payment_delay.value) if payment_delay else 14
+        credit_limit=credit_limit,
+        payment_delay_days=payment_delay
     )
     db.add(client)
     db.commit()
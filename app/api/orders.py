@@ -10,12 +10,14 @@ from models.user import User, Client
 from models.product import Product
 from models.order import Order, OrderItem, OrderHistory
 from models.bonus import BonusTransaction
-from models.settings import SystemSetting
 from schemas import Order as OrderSchema, OrderCreate, OrdersList
 from api.auth import get_current_user, get_current_client
 from api.cart import get_cart_key, carts
 from utils import generate_order_number, calculate_personal_price, calculate_bonus_amount
 from notifications import notifier
+from services.catalog_cache import catalog_cache
+from services.settings_service import settings_service
+from services import client_metrics, order_events
 
 router = APIRouter()
 
@@ -74,14 +76,12 @@ async def create_order(
         })
     
     # Проверяем минимальную сумму заказа
-    min_order = db.query(SystemSetting).filter(
-        SystemSetting.key == "min_order_amount"
-    ).first()
+    min_order = settings_service.get("min_order_amount", 0.0)
     
-    if min_order and total < float(min_order.value):
+    if min_order and total < min_order:
         raise HTTPException(
             status_code=400,
-            detail=f"Minimum order amount is {min_order.value} тенге"
+            detail=f"Minimum order amount is {min_order:g} тенге"
         )
     
     # Применяем бонусы
@@ -91,11 +91,9 @@ async def create_order(
             raise HTTPException(status_code=400, detail="Insufficient bonus balance")
         
         # Проверяем макс % оплаты бонусами
-        max_bonus_percent = db.query(SystemSetting).filter(
-            SystemSetting.key == "bonus_max_use_percent"
-        ).first()
+        max_bonus_percent = settings_service.get("bonus_max_use_percent", 30)
         
-        max_bonus_amount = total * (float(max_bonus_percent.value) / 100) if max_bonus_percent else total * 0.3
+        max_bonus_amount = total * (max_bonus_percent / 100)
         
         bonus_used = min(order_data.bonus_to_use, max_bonus_amount, client.bonus_balance)
     
@@ -150,6 +148,7 @@ async def create_order(
             description=f"Списание бонусов по заказу {order.order_number}"
         )
         db.add(bonus_tx)
+        client_metrics.bonus_recorded(db, client.id, used=bonus_used)
     
     # Увеличиваем долг
     client.debt += final_total
@@ -163,8 +162,16 @@ async def create_order(
     )
     db.add(history)
     
+    order_events.order_placed(
+        db, order,
+        lines=[(item['product_id'], item['quantity'], item['price']) for item in order_items],
+        client=client
+    )
+    
     db.commit()
     db.refresh(order)
+    # Остатки изменились - каталог нужно пересобрать
+    catalog_cache.invalidate()
     
     # Очищаем корзину
     cart_key = get_cart_key(user.id)
@@ -8,140 +8,186 @@ from dotenv import load_dotenv
 load_dotenv()
 from aiohttp import web
 import aiohttp_cors
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine, func, desc
+from sqlalchemy import func, desc, insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, selectinload
+import asyncio
+import functools
 import json
 import os
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from models.user import User, Client, SalesRepresentative
 from models.product import Product, Category
 from models.order import Order, OrderItem
 from models.bonus import BonusTransaction
 from models.settings import SystemSetting
+from database import SessionLocal, engine, get_pool_stats
+from db_executor import DBExecutor
+from pagination import keyset_page, page_size, InvalidCursor, NEXT_CURSOR_HEADER
+from services.catalog_cache import catalog_cache
+from services.settings_service import settings_service
+from services.client_search import search_clients
+from services import client_metrics, metrics, order_events, product_affinity, sales_rollup
+from services.order_numbers import order_numbers
+from services.startup import run_startup_hooks
+from services.idempotency import (
+    IDEMPOTENCY_HEADER, MAX_KEY_LENGTH, REPLAYED_HEADER, StoredResponse, order_requests,
+    request_hash
+)
+from services.static_assets import StaticAssets, etag_matches
+from services import read_models, serialization
+from services.serialization import json_response, serialization_middleware
+from services.photo_service import (
+    photo_service, photo_jobs, photo_etag, photo_url, remove_temp,
+    list_archive_images, extract_archive_entry,
+    PhotoNotFound, PhotoTooLarge, InvalidPhoto,
+    DEFAULT_VARIANT, VARIANTS as PHOTO_VARIANTS, FORMATS as PHOTO_FORMATS,
+    PHOTO_MAX_UPLOAD_MB, PHOTO_MAX_ARCHIVE_MB
+)
+from middlewares.compression import compression_middleware
+from middlewares.metrics import metrics_middleware
+from middlewares.admission import admission_middleware
+from services.admission import load_monitor
 import logging
 logger = logging.getLogger(__name__)
 
-DATABASE_URL = os.getenv("DATABASE_URL")
-if DATABASE_URL and DATABASE_URL.startswith('postgresql://'):
-    DATABASE_URL = DATABASE_URL.replace('postgresql://', 'postgresql+psycopg://')
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(bind=engine)
+
+# Пул потоков для запросов к БД: обработчики не блокируют event loop
+db_executor = DBExecutor(SessionLocal)
+
+# Статика WebApp и личного кабинета раздаётся из памяти
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+webapp_assets = StaticAssets(os.path.join(BASE_DIR, 'webapp'))
+profile_assets = StaticAssets(os.path.join(BASE_DIR, 'webapp_profile'))
+
+def db_handler(func=None, *, json_body=False):
+    """
+    Декоратор: синхронный обработчик func(db, request[, data]) выполняется
+    в пуле потоков DBExecutor с отдельной сессией
+
+    json_body=True - тело запроса читается в event loop и передаётся как data
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def handler(request):
+            if not json_body:
+                return await db_executor.run(func, request)
+            try:
+                data = await request.json()
+            except Exception as e:
+                logger.error(f"API Error: {e}")
+                return json_response({'error': str(e)}, status=500)
+            return await db_executor.run(func, request, data)
+        return handler
+    
+    if func is not None:
+        return decorator(func)
+    return decorator
 
 # ============================================
 # WEBAPP ENDPOINTS (существующие)
 # ============================================
 
 async def get_catalog(request):
-    """Получить каталог товаров и автоматически создать юзера, если его нет"""
-    db = SessionLocal()
+    """
+    Получить каталог товаров
+
+    Общая часть отдаётся из снимка catalog_cache с ETag (повторное открытие
+    WebApp получает 304). Если передан user_id - ответ, как раньше, дополняется
+    персональными полями (для старых клиентов; новые берут их из /api/catalog/me).
+    """
     try:
-        user_id = int(request.query.get('user_id')) if request.query.get('user_id') else None
-        is_first_order = False
-        
-        if user_id:
-            # Ищем юзера или создаем нового (авторегистрация)
-            user = db.query(User).filter(User.telegram_id == user_id).first()
-            if not user:
-                user = User(telegram_id=user_id, username=request.query.get('username'))
-                db.add(user)
-                db.commit()
-                db.refresh(user)
-            
-            if user.client:
-                is_first_order = not user.client.first_order_discount_used
-            else:
-                # Если юзер есть, а профиля клиента (ИП/Адрес) еще нет
-                is_first_order = True 
-
-        # Дальше стандартная загрузка каталога
-        categories = db.query(Category).filter(Category.is_active == True).order_by(Category.sort_order).all()
-        categories_data = [{'id': cat.id, 'name': cat.name, 'icon': get_category_icon(cat.name)} for cat in categories]
-        
-        products = db.query(Product).filter(Product.is_active == True, Product.stock > 0).all()
-        products_data = [{
-            'id': prod.id, 'name': prod.name, 'price': float(prod.price),
-            'stock': prod.stock, 'category_id': prod.category_id,
-            'photo_url': f'/api/photo/{prod.photo_file_id}' if prod.photo_file_id else None
-        } for prod in products]
-        
-        bonus_balance = 0
-        if user and user.client:
-            bonus_balance = float(user.client.bonus_balance)
-        
-        return web.json_response({
-            'products': products_data,
-            'categories': categories_data,
-            'is_first_order': is_first_order,
-            'needs_registration': not (user and user.client) if user_id else False,
-            'bonus_balance': bonus_balance
-        })
+        if catalog_cache.is_fresh():
+            snapshot = catalog_cache.snapshot
+        else:
+            snapshot = await db_executor.run(catalog_cache.get)
+
+        if request.query.get('user_id'):
+            user_data = await db_executor.run(_load_catalog_user, request)
+            return json_response({**snapshot.data, **user_data})
+
+        fmt = serialization.current_format()
+        body, etag = snapshot.encoded(fmt)
+        headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+        if etag_matches(request.headers.get('If-None-Match', ''), etag):
+            return web.Response(status=304, headers=headers)
+
+        return serialization.encoded_response(body, fmt, headers=headers)
     except Exception as e:
         logger.error(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
-    finally:
-        db.close()
-
-def get_category_icon(name):
-    """Получить иконку категории"""
-    icons = {
-        'Попкорн': '🍿',
-        'Чипсы': '🥔',
-        'Батончики': '🍫',
-        'Хлебцы': '🍞',
-        'Напитки': '🥤',
-        'Выпечка': '🥐'
+        return json_response({'error': str(e)}, status=500)
+
+@db_handler
+def get_catalog_user(db, request):
+    """Персональные поля каталога: бонусы, скидка на первый заказ, регистрация"""
+    try:
+        if not request.query.get('user_id'):
+            return json_response({'error': 'user_id required'}, status=400)
+
+        return json_response(_load_catalog_user(db, request))
+    except Exception as e:
+        logger.error(f"API Error: {e}")
+        return json_response({'error': str(e)}, status=500)
+
+def _load_catalog_user(db, request):
+    """Найти юзера (или создать - авторегистрация) и собрать персональные поля"""
+    user_id = int(request.query.get('user_id'))
+
+    user = db.query(User).filter(User.telegram_id == user_id).first()
+    if not user:
+        user = User(telegram_id=user_id, username=request.query.get('username'), role='client')
+        db.add(user)
+        db.commit()
+        db.refresh(user)
+
+    if user.client:
+        is_first_order = not user.client.first_order_discount_used
+    else:
+        # Если юзер есть, а профиля клиента (ИП/Адрес) еще нет
+        is_first_order = True
+
+    return {
+        'is_first_order': is_first_order,
+        'needs_registration': not user.client,
+        'bonus_balance': float(user.client.bonus_balance) if user.client else 0,
+        # Пора заказать снова - id товаров, карточки уже есть в каталоге
+        'reorder': product_affinity.reorder_suggestions(db, user.client.id) if user.client else []
     }
-    return icons.get(name, '📦')
 
 
 
-async def get_settings(request):
+@db_handler
+def get_settings(db, request):
     """Получить все настройки"""
-    db = SessionLocal()
     try:
-        settings = db.query(SystemSetting).all()
-        result = {}
-        for s in settings:
-            if s.type == 'int':
-                result[s.key] = int(s.value)
-            elif s.type == 'float':
-                result[s.key] = float(s.value)
-            elif s.type == 'bool':
-                result[s.key] = s.value.lower() == 'true'
-            else:
-                result[s.key] = s.value
-        return web.json_response(result)
+        return json_response(settings_service.all())
     except Exception as e:
         logger.error(f"Ошибка получения настроек: {e}")
-        return web.json_response({'error': str(e)}, status=500)
-    finally:
-        db.close()
+        return json_response({'error': str(e)}, status=500)
 
-async def update_setting(request):
+@db_handler(json_body=True)
+def update_setting(db, request, data):
     """Обновить настройку"""
-    db = SessionLocal()
     try:
-        data = await request.json()
         key = data.get('key')
         value = data.get('value')
         
         if not key:
-            return web.json_response({'error': 'Key required'}, status=400)
+            return json_response({'error': 'Key required'}, status=400)
         
         setting = db.query(SystemSetting).filter(SystemSetting.key == key).first()
         if not setting:
-            return web.json_response({'error': 'Setting not found'}, status=404)
+            return json_response({'error': 'Setting not found'}, status=404)
         
         setting.value = str(value)
         db.commit()
+        settings_service.changed()
         
-        return web.json_response({'success': True, 'key': key, 'value': value})
+        return json_response({'success': True, 'key': key, 'value': value})
     except Exception as e:
         db.rollback()
         logger.error(f"Ошибка обновления настройки: {e}")
-        return web.json_response({'error': str(e)}, status=500)
-    finally:
-        db.close()
+        return json_response({'error': str(e)}, status=500)
 
 async def serve_webapp(request):
     """Отдать webapp файлы"""
@@ -150,75 +196,42 @@ async def serve_webapp(request):
     if file_path == '':
         file_path = 'index.html'
     
-    try:
-        with open(f'webapp/{file_path}', 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        content_type = 'text/html'
-        if file_path.endswith('.js'):
-            content_type = 'application/javascript'
-        elif file_path.endswith('.css'):
-            content_type = 'text/css'
-        elif file_path.endswith('.json'):
-            content_type = 'application/json'
-        
-        return web.Response(text=content, content_type=content_type)
-    except FileNotFoundError:
-        return web.Response(status=404)
+    return webapp_assets.serve(request, file_path)
 
 # ============================================
 # БЛОК 1: УПРАВЛЕНИЕ ТОВАРАМИ
 # ============================================
 
-async def get_products(request):
+@db_handler
+def get_products(db, request):
     """Получить список всех товаров"""
     try:
-        db = SessionLocal()
-        
         # Фильтры
         category_id = request.query.get('category_id')
         is_active = request.query.get('is_active')
         
-        query = db.query(Product)
-        
-        if category_id:
-            query = query.filter(Product.category_id == int(category_id))
-        if is_active is not None:
-            query = query.filter(Product.is_active == (is_active.lower() == 'true'))
-        
-        products = query.order_by(Product.name).all()
-        
-        products_data = [
-            {
-                'id': p.id,
-                'name': p.name,
-                'price': float(p.price),
-                'stock': p.stock,
-                'category_id': p.category_id,
-                'is_active': p.is_active,
-                'photo_file_id': p.photo_file_id
-            }
-            for p in products
-        ]
+        products_data = read_models.product_list(
+            db,
+            category_id=int(category_id) if category_id else None,
+            is_active=(is_active.lower() == 'true') if is_active is not None else None
+        )
         
-        db.close()
-        return web.json_response(products_data)
+        return json_response(products_data)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def get_product(request):
+@db_handler
+def get_product(db, request):
     """Получить один товар"""
     try:
         product_id = int(request.match_info['id'])
-        db = SessionLocal()
         
         product = db.query(Product).filter(Product.id == product_id).first()
         
         if not product:
-            db.close()
-            return web.json_response({'error': 'Product not found'}, status=404)
+            return json_response({'error': 'Product not found'}, status=404)
         
         product_data = {
             'id': product.id,
@@ -230,19 +243,16 @@ async def get_product(request):
             'photo_file_id': product.photo_file_id
         }
         
-        db.close()
-        return web.json_response(product_data)
+        return json_response(product_data)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def create_product(request):
+@db_handler(json_body=True)
+def create_product(db, request, data):
     """Создать новый товар"""
     try:
-        data = await request.json()
-        db = SessionLocal()
-        
         product = Product(
             name=data['name'],
             price=float(data['price']),
@@ -254,6 +264,7 @@ async def create_product(request):
         db.add(product)
         db.commit()
         db.refresh(product)
+        catalog_cache.invalidate()
         
         product_data = {
             'id': product.id,
@@ -264,25 +275,22 @@ async def create_product(request):
             'is_active': product.is_active
         }
         
-        db.close()
-        return web.json_response(product_data, status=201)
+        return json_response(product_data, status=201)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def update_product(request):
+@db_handler(json_body=True)
+def update_product(db, request, data):
     """Обновить товар"""
     try:
         product_id = int(request.match_info['id'])
-        data = await request.json()
-        db = SessionLocal()
         
         product = db.query(Product).filter(Product.id == product_id).first()
         
         if not product:
-            db.close()
-            return web.json_response({'error': 'Product not found'}, status=404)
+            return json_response({'error': 'Product not found'}, status=404)
         
         if 'name' in data:
             product.name = data['name']
@@ -296,109 +304,252 @@ async def update_product(request):
             product.is_active = data['is_active']
         
         db.commit()
-        db.close()
+        catalog_cache.invalidate()
         
-        return web.json_response({'success': True})
+        return json_response({'success': True})
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def delete_product(request):
+@db_handler
+def delete_product(db, request):
     """Удалить товар (мягкое удаление)"""
     try:
         product_id = int(request.match_info['id'])
-        db = SessionLocal()
         
         product = db.query(Product).filter(Product.id == product_id).first()
         
         if not product:
-            db.close()
-            return web.json_response({'error': 'Product not found'}, status=404)
+            return json_response({'error': 'Product not found'}, status=404)
         
         product.is_active = False
         db.commit()
-        db.close()
+        catalog_cache.invalidate()
         
-        return web.json_response({'success': True})
+        return json_response({'success': True})
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 async def upload_product_photo(request):
-    """Загрузить фото товара"""
+    """Загрузить фото товара (потоково, обработка в пуле процессов)"""
+    tmp_path = None
     try:
         product_id = int(request.match_info['id'])
         
+        if not await db_executor.run(_product_exists, product_id):
+            return json_response({'error': 'Product not found'}, status=404)
+        
         reader = await request.multipart()
         field = await reader.next()
         
-        if field.name != 'photo':
-            return web.json_response({'error': 'No photo field'}, status=400)
+        if field is None or field.name != 'photo':
+            return json_response({'error': 'No photo field'}, status=400)
         
-        photo_data = await field.read()
-        
-        import tempfile
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp:
-            tmp.write(photo_data)
-            tmp_path = tmp.name
+        tmp_path = await photo_service.receive(field, PHOTO_MAX_UPLOAD_MB * 1024 * 1024)
         
         photo_file_id = f"local_{product_id}"
+        photo_hash = await photo_service.store(photo_file_id, tmp_path)
         
-        db = SessionLocal()
-        product = db.query(Product).filter(Product.id == product_id).first()
+        await db_executor.run(_set_product_photos, {product_id: (photo_file_id, photo_hash)})
         
-        if not product:
-            db.close()
-            return web.json_response({'error': 'Product not found'}, status=404)
+        return json_response({
+            'success': True,
+            'file_id': photo_file_id,
+            'photo_hash': photo_hash,
+            'photo_url': photo_url(photo_file_id, photo_hash)
+        })
         
-        product.photo_file_id = photo_file_id
-        db.commit()
-        db.close()
+    except PhotoTooLarge as e:
+        return json_response({'error': str(e)}, status=413)
+    except InvalidPhoto as e:
+        logger.warning(f"Invalid photo upload: {e}")
+        return json_response({'error': 'Некорректное изображение'}, status=400)
+    except Exception as e:
+        print(f"API Error: {e}")
+        return json_response({'error': str(e)}, status=500)
+    finally:
+        if tmp_path:
+            remove_temp(tmp_path)
+
+def _product_exists(db, product_id):
+    return db.query(Product.id).filter(Product.id == product_id).first() is not None
+
+def _set_product_photos(db, photos):
+    """
+    Привязать фото к товарам одной транзакцией (выполняется в пуле БД)
+
+    photos: {product_id: (photo_file_id, photo_hash)}
+    """
+    products = db.query(Product).filter(Product.id.in_(list(photos))).all()
+    
+    for product in products:
+        product.photo_file_id, product.photo_hash = photos[product.id]
+    
+    db.commit()
+    catalog_cache.invalidate()
+    return len(products)
+
+async def import_product_photos(request):
+    """
+    Массовая загрузка фото из zip-архива
+
+    Имя файла в архиве - id товара (123.jpg) или его точное название.
+    Архив обрабатывается фоновой задачей, прогресс -
+    GET /api/admin/products/photos/import/{job_id}
+    """
+    archive_path = None
+    try:
+        reader = await request.multipart()
+        field = await reader.next()
         
-        import os
-        os.unlink(tmp_path)
+        if field is None or field.name != 'archive':
+            return json_response({'error': 'No archive field'}, status=400)
         
-        return web.json_response({'success': True, 'file_id': photo_file_id})
+        archive_path = await photo_service.receive(field, PHOTO_MAX_ARCHIVE_MB * 1024 * 1024)
         
+        job = photo_jobs.create(field.filename or 'photos.zip')
+        job.task = asyncio.create_task(_run_photo_import(job, archive_path))
+        archive_path = None  # теперь файлом владеет задача
+        
+        return json_response(job.to_dict(), status=202)
+        
+    except PhotoTooLarge as e:
+        return json_response({'error': str(e)}, status=413)
     except Exception as e:
-        print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        logger.error(f"API Error: {e}")
+        return json_response({'error': str(e)}, status=500)
+    finally:
+        if archive_path:
+            remove_temp(archive_path)
+
+async def get_photo_import_job(request):
+    """Прогресс массовой загрузки фото"""
+    job = photo_jobs.get(request.match_info['job_id'])
+    if not job:
+        return json_response({'error': 'Job not found'}, status=404)
+    return json_response(job.to_dict())
+
+async def _run_photo_import(job, archive_path):
+    """Фоновая обработка zip-архива с фото товаров"""
+    loop = asyncio.get_running_loop()
+    max_entry = PHOTO_MAX_UPLOAD_MB * 1024 * 1024
+    photos = {}
+    
+    async def process(name, product_id):
+        tmp_path = photo_service.incoming_path()
+        try:
+            await loop.run_in_executor(None, extract_archive_entry, archive_path, name, tmp_path)
+            photo_file_id = f"local_{product_id}"
+            photos[product_id] = (photo_file_id, await photo_service.store(photo_file_id, tmp_path))
+            job.succeeded += 1
+        except InvalidPhoto:
+            job.fail(name, 'некорректное изображение')
+        except Exception as e:
+            logger.error(f"Photo import error {name}: {e}")
+            job.fail(name, str(e))
+        finally:
+            remove_temp(tmp_path)
+            job.processed += 1
+    
+    try:
+        job.status = 'running'
+        entries = await loop.run_in_executor(None, list_archive_images, archive_path, max_entry)
+        job.total = len(entries)
+        product_index = await db_executor.run(_load_product_index)
+        
+        # Не больше задач, чем процессов обработки фото
+        semaphore = asyncio.Semaphore(photo_service.workers)
+        
+        async def bounded(name, stem):
+            product_id = product_index.get(stem) or product_index.get(stem.strip().lower())
+            if not stem:
+                job.fail(name, 'файл слишком большой')
+                job.processed += 1
+            elif not product_id:
+                job.fail(name, 'товар не найден')
+                job.processed += 1
+            else:
+                async with semaphore:
+                    await process(name, product_id)
+        
+        await asyncio.gather(*(bounded(name, stem) for name, stem in entries))
+        
+        if photos:
+            await db_executor.run(_set_product_photos, photos)
+        
+        job.status = 'done'
+        logger.info(f"🖼 Photo import {job.id}: {job.succeeded}/{job.total}")
+    except Exception as e:
+        logger.error(f"Photo import {job.id} failed: {e}")
+        job.status = 'failed'
+        job.fail(job.filename, str(e))
+    finally:
+        job.finished_at = datetime.utcnow().isoformat()
+        remove_temp(archive_path)
+
+def _load_product_index(db):
+    """Сопоставление имени файла с товаром: '123' -> id, 'название' -> id"""
+    index = {}
+    for product_id, name in db.query(Product.id, Product.name).all():
+        index[str(product_id)] = product_id
+        index.setdefault(name.strip().lower(), product_id)
+    return index
+
+async def get_photo(request):
+    """
+    Фото товара: ?size=thumb|card|full, WebP если клиент его принимает
+
+    Ссылки с ?v= (хэш содержимого) и file_id Telegram не меняются -
+    их можно кэшировать навсегда.
+    """
+    file_id = request.match_info['file_id']
+    variant = request.query.get('size', DEFAULT_VARIANT)
+    if variant not in PHOTO_VARIANTS:
+        return json_response({'error': 'Unknown size'}, status=400)
+
+    fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+
+    try:
+        body = await photo_service.get(file_id, variant, fmt, request.query.get('v', ''))
+    except PhotoNotFound:
+        return web.Response(status=404)
+    except Exception as e:
+        logger.error(f"API Error: {e}")
+        return json_response({'error': str(e)}, status=500)
+
+    etag = photo_etag(body)
+    if request.query.get('v') or not file_id.startswith('local_'):
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = 'public, max-age=86400'
+    headers = {'ETag': etag, 'Cache-Control': cache_control, 'Vary': 'Accept'}
+
+    if etag_matches(request.headers.get('If-None-Match', ''), etag):
+        return web.Response(status=304, headers=headers)
+
+    return web.Response(body=body, content_type=PHOTO_FORMATS[fmt][1], headers=headers)
 
 # ============================================
 # БЛОК 2: УПРАВЛЕНИЕ КАТЕГОРИЯМИ
 # ============================================
 
-async def get_categories(request):
+@db_handler
+def get_categories(db, request):
     """Получить список категорий"""
     try:
-        db = SessionLocal()
-        categories = db.query(Category).order_by(Category.sort_order).all()
-        
-        categories_data = [
-            {
-                'id': cat.id,
-                'name': cat.name,
-                'is_active': cat.is_active,
-                'sort_order': cat.sort_order
-            }
-            for cat in categories
-        ]
-        
-        db.close()
-        return web.json_response(categories_data)
+        return json_response(read_models.category_list(db))
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def create_category(request):
+@db_handler(json_body=True)
+def create_category(db, request, data):
     """Создать категорию"""
     try:
-        data = await request.json()
-        db = SessionLocal()
-        
         max_order = db.query(func.max(Category.sort_order)).scalar() or 0
         
         category = Category(
@@ -410,6 +561,7 @@ async def create_category(request):
         db.add(category)
         db.commit()
         db.refresh(category)
+        catalog_cache.invalidate()
         
         category_data = {
             'id': category.id,
@@ -418,25 +570,22 @@ async def create_category(request):
             'sort_order': category.sort_order
         }
         
-        db.close()
-        return web.json_response(category_data, status=201)
+        return json_response(category_data, status=201)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def update_category(request):
+@db_handler(json_body=True)
+def update_category(db, request, data):
     """Обновить категорию"""
     try:
         category_id = int(request.match_info['id'])
-        data = await request.json()
-        db = SessionLocal()
         
         category = db.query(Category).filter(Category.id == category_id).first()
         
         if not category:
-            db.close()
-            return web.json_response({'error': 'Category not found'}, status=404)
+            return json_response({'error': 'Category not found'}, status=404)
         
         if 'name' in data:
             category.name = data['name']
@@ -446,55 +595,66 @@ async def update_category(request):
             category.sort_order = int(data['sort_order'])
         
         db.commit()
-        db.close()
+        catalog_cache.invalidate()
         
-        return web.json_response({'success': True})
+        return json_response({'success': True})
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 # ============================================
 # БЛОК 3: УПРАВЛЕНИЕ КЛИЕНТАМИ
 # ============================================
 
-async def get_clients(request):
-    """Получить список клиентов"""
+@db_handler
+def get_clients(db, request):
+    """
+    Получить список клиентов
+
+    Параметры: search (название, БИН/ИИН, телефон, username), status,
+    sales_rep_id, limit, cursor. Keyset-пагинация по created_at, id -
+    следующая страница по курсору из заголовка X-Next-Cursor.
+    """
     try:
-        db = SessionLocal()
-        clients = db.query(Client).order_by(desc(Client.created_at)).all()
+        sales_rep_id = request.query.get('sales_rep_id')
+        query = search_clients(
+            db,
+            search=request.query.get('search'),
+            status=request.query.get('status'),
+            sales_rep_id=int(sales_rep_id) if sales_rep_id else None
+        )
         
-        clients_data = [
-            {
-                'id': c.id,
-                'company_name': c.company_name,
-                'contact_phone': c.contact_phone,
-                'address': c.address,
-                'bonus_balance': float(c.bonus_balance),
-                'first_order_discount_used': c.first_order_discount_used,
-                'created_at': c.created_at.isoformat() if c.created_at else None
-            }
-            for c in clients
-        ]
+        clients, next_cursor = keyset_page(
+            read_models.client_rows(query),
+            (Client.created_at, Client.id),
+            page_size(request.query.get('limit'), default=50),
+            request.query.get('cursor')
+        )
+        
+        clients_data = read_models.as_dicts(clients)
         
-        db.close()
-        return web.json_response(clients_data)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return json_response(clients_data, headers=headers)
         
+    except InvalidCursor:
+        return json_response({'error': 'Invalid cursor'}, status=400)
+    except ValueError:
+        return json_response({'error': 'Invalid sales_rep_id'}, status=400)
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def get_client(request):
+@db_handler
+def get_client(db, request):
     """Получить детали клиента"""
     try:
         client_id = int(request.match_info['id'])
-        db = SessionLocal()
         
         client = db.query(Client).filter(Client.id == client_id).first()
         
         if not client:
-            db.close()
-            return web.json_response({'error': 'Client not found'}, status=404)
+            return json_response({'error': 'Client not found'}, status=404)
         
         # Получаем заказы клиента
         orders = db.query(Order).filter(Order.client_id == client_id).order_by(desc(Order.created_at)).limit(10).all()
@@ -518,25 +678,22 @@ async def get_client(request):
             ]
         }
         
-        db.close()
-        return web.json_response(client_data)
+        return json_response(client_data)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def update_client(request):
+@db_handler(json_body=True)
+def update_client(db, request, data):
     """Обновить клиента"""
     try:
         client_id = int(request.match_info['id'])
-        data = await request.json()
-        db = SessionLocal()
         
         client = db.query(Client).filter(Client.id == client_id).first()
         
         if not client:
-            db.close()
-            return web.json_response({'error': 'Client not found'}, status=404)
+            return json_response({'error': 'Client not found'}, status=404)
         
         if 'company_name' in data:
             client.company_name = data['company_name']
@@ -548,65 +705,65 @@ async def update_client(request):
             client.bonus_balance = float(data['bonus_balance'])
         
         db.commit()
-        db.close()
         
-        return web.json_response({'success': True})
+        return json_response({'success': True})
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 # ============================================
 # БЛОК 4: УПРАВЛЕНИЕ ЗАКАЗАМИ
 # ============================================
 
-async def get_orders(request):
-    """Получить список заказов"""
+@db_handler
+def get_orders(db, request):
+    """
+    Получить список заказов
+
+    Параметры: status, client_id, limit, cursor. Keyset-пагинация по
+    created_at, id - следующая страница по курсору из заголовка X-Next-Cursor.
+    """
     try:
-        db = SessionLocal()
-        
         # Фильтры
         status = request.query.get('status')
-        limit = int(request.query.get('limit', 100))
+        client_id = request.query.get('client_id')
+        limit = page_size(request.query.get('limit'), default=100)
         
-        query = db.query(Order)
+        query = read_models.order_rows(db)
         
         if status:
             query = query.filter(Order.status == status)
+        if client_id:
+            query = query.filter(Order.client_id == int(client_id))
         
-        orders = query.order_by(desc(Order.created_at)).limit(limit).all()
+        orders, next_cursor = keyset_page(
+            query, (Order.created_at, Order.id), limit, request.query.get('cursor')
+        )
         
-        orders_data = [
-            {
-                'id': o.id,
-                'client_id': o.client_id,
-                'client_name': o.client.company_name if o.client else 'Неизвестно',
-                'total_amount': float(o.total),
-                'discount_amount': float(o.discount_amount),
-                'status': o.status,
-                'created_at': o.created_at.isoformat() if o.created_at else None
-            }
-            for o in orders
-        ]
+        orders_data = read_models.as_dicts(orders)
         
-        db.close()
-        return web.json_response(orders_data)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return json_response(orders_data, headers=headers)
         
+    except InvalidCursor:
+        return json_response({'error': 'Invalid cursor'}, status=400)
+    except ValueError:
+        return json_response({'error': 'Invalid client_id'}, status=400)
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def get_order(request):
+@db_handler
+def get_order(db, request):
     """Получить детали заказа"""
     try:
         order_id = int(request.match_info['id'])
-        db = SessionLocal()
         
         order = db.query(Order).filter(Order.id == order_id).first()
         
         if not order:
-            db.close()
-            return web.json_response({'error': 'Order not found'}, status=404)
+            return json_response({'error': 'Order not found'}, status=404)
         
         items = db.query(OrderItem).filter(OrderItem.order_id == order_id).all()
         
@@ -630,134 +787,158 @@ async def get_order(request):
             ]
         }
         
-        db.close()
-        return web.json_response(order_data)
+        return json_response(order_data)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def update_order_status(request):
+@db_handler(json_body=True)
+def update_order_status(db, request, data):
     """Изменить статус заказа"""
     try:
         order_id = int(request.match_info['id'])
-        data = await request.json()
-        db = SessionLocal()
         
         order = db.query(Order).filter(Order.id == order_id).first()
         
         if not order:
-            db.close()
-            return web.json_response({'error': 'Order not found'}, status=404)
+            return json_response({'error': 'Order not found'}, status=404)
         
         new_status = data.get('status')
         if new_status not in ['pending', 'confirmed', 'delivered', 'cancelled']:
-            db.close()
-            return web.json_response({'error': 'Invalid status'}, status=400)
+            return json_response({'error': 'Invalid status'}, status=400)
         
+        old_status = order.status
         order.status = new_status
+        order_events.order_status_changed(db, order, old_status)
         db.commit()
-        db.close()
         
-        return web.json_response({'success': True})
+        return json_response({'success': True})
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 # ============================================
 # БЛОК 5: СТАТИСТИКА
 # ============================================
 
-async def get_dashboard_stats(request):
-    """Получить статистику для dashboard"""
+@db_handler
+def get_dashboard_stats(db, request):
+    """
+    Получить статистику для dashboard
+
+    Продажи читаются из витрины sales_rollup (без отменённых заказов),
+    поэтому стоимость запроса почти не зависит от периода.
+    """
     try:
-        db = SessionLocal()
-        
         # Период
         days = int(request.query.get('days', 30))
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Общая выручка
-        total_revenue = db.query(func.sum(Order.total)).filter(
-            Order.created_at >= start_date
-        ).scalar() or 0
-        
-        # Количество заказов
-        total_orders = db.query(func.count(Order.id)).filter(
-            Order.created_at >= start_date
-        ).scalar() or 0
+        totals = sales_rollup.totals(db, start_date.date())
         
         # Новые клиенты
         new_clients = db.query(func.count(Client.id)).filter(
             Client.created_at >= start_date
         ).scalar() or 0
         
-        # Топ товары (без фильтра по статусу заказа для начала)
-        top_products_query = db.query(
-            Product.name,
-            func.sum(OrderItem.quantity).label('total_qty')
-        ).join(OrderItem).join(Order).filter(
-            Order.created_at >= start_date
-        ).group_by(Product.id, Product.name).order_by(desc('total_qty')).limit(5)
+        top_products = sales_rollup.top_products(db, start_date.date())
+        top_clients = sales_rollup.top_clients(db, start_date.date())
+        top_reps = sales_rollup.top_sales_reps(db, start_date.date())
         
-        top_products = top_products_query.all()
+        # Названия - одним запросом на каждый список
+        product_names = dict(db.query(Product.id, Product.name).filter(
+            Product.id.in_([p[0] for p in top_products])
+        ).all()) if top_products else {}
+        client_names = dict(db.query(Client.id, Client.company_name).filter(
+            Client.id.in_([c[0] for c in top_clients])
+        ).all()) if top_clients else {}
+        rep_names = dict(db.query(SalesRepresentative.id, SalesRepresentative.name).filter(
+            SalesRepresentative.id.in_([r[0] for r in top_reps])
+        ).all()) if top_reps else {}
         
-        # Топ клиенты
-        top_clients_query = db.query(
-            Client.company_name,
-            func.sum(Order.total).label('total_spent')
-        ).join(Order).filter(
-            Order.created_at >= start_date
-        ).group_by(Client.id, Client.company_name).order_by(desc('total_spent')).limit(5)
-        
-        top_clients = top_clients_query.all()
+        total_revenue = totals['revenue']
+        total_orders = totals['orders']
         
         stats_data = {
-            'total_revenue': float(total_revenue),
+            'total_revenue': total_revenue,
             'total_orders': total_orders,
             'new_clients': new_clients,
             'avg_order': float(total_revenue / total_orders) if total_orders > 0 else 0,
             'top_products': [
-                {'name': p[0] if p[0] else 'Без названия', 'quantity': int(p[1]) if p[1] else 0}
+                {'name': product_names.get(p[0]) or 'Без названия', 'quantity': int(p[1] or 0)}
                 for p in top_products
             ],
             'top_clients': [
-                {'name': c[0] if c[0] else 'Без имени', 'total': float(c[1]) if c[1] else 0}
+                {'name': client_names.get(c[0]) or 'Без имени', 'total': float(c[1] or 0)}
                 for c in top_clients
+            ],
+            'top_sales_reps': [
+                {'name': rep_names.get(r[0]) or 'Без имени', 'total': float(r[1] or 0), 'orders': int(r[2] or 0)}
+                for r in top_reps
             ]
         }
         
-        db.close()
-        return web.json_response(stats_data)
+        return json_response(stats_data)
         
     except Exception as e:
         import traceback
         print(f"API Error in get_dashboard_stats: {e}")
         print(traceback.format_exc())
-        db.close()
-        return web.json_response({'error': str(e)}, status=500)
-
-# ============================================
-# БЛОК 6: НАСТРОЙКИ
-# ============================================
-
-        # Пока возвращаем успех
-        
-        return web.json_response({'success': True})
-        
-    except Exception as e:
-        print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
+
+def _admin_error(db, request):
+    """
+    Проверка администратора по заголовку Authorization (telegram_id), как
+    get_admin_from_header в api/admin.py; None - доступ разрешён
+    """
+    authorization = request.headers.get('Authorization')
+    if not authorization:
+        return json_response({'error': 'Authorization required'}, status=401)
+    try:
+        telegram_id = int(authorization)
+    except ValueError:
+        return json_response({'error': 'Invalid authorization format'}, status=401)
+
+    role = db.query(User.role).filter(User.telegram_id == telegram_id).scalar()
+    if role is None:
+        return json_response({'error': 'User not found'}, status=404)
+    if role not in ('admin', 'manager'):
+        return json_response({'error': 'Admin access required'}, status=403)
+    return None
+
+@db_handler
+def get_db_pool_stats(db, request):
+    """Состояние пула соединений с БД (для подбора DB_POOL_SIZE, только для администраторов)"""
+    error = _admin_error(db, request)
+    if error is not None:
+        return error
+    stats = get_pool_stats()
+    stats['executor_workers'] = db_executor.max_workers
+    return json_response(stats)
+
+async def get_metrics(request):
+    """Метрики в формате Prometheus (Bearer METRICS_TOKEN)"""
+    if not metrics.is_authorized(request.headers.get('Authorization')):
+        return json_response({'error': 'Unauthorized'}, status=401)
+    return web.Response(
+        body=metrics.render().encode(),
+        headers={'Content-Type': metrics.CONTENT_TYPE}
+    )
+
+async def get_health(request):
+    """Проверка живости для балансировщика (какой воркер ответил - в worker)"""
+    return json_response({'status': 'ok', 'worker': os.getenv('WORKER_NAME', 'api'), 'pid': os.getpid()})
 
 # ============================================
 # ТОРГОВЫЕ ПРЕДСТАВИТЕЛИ (существующие)
 # ============================================
 
-async def get_sales_reps(request):
+@db_handler
+def get_sales_reps(db, request):
     """Получить всех торговых представителей"""
     try:
-        db = SessionLocal()
         reps = db.query(SalesRepresentative).all()
         
         reps_data = [
@@ -771,25 +952,22 @@ async def get_sales_reps(request):
             for rep in reps
         ]
         
-        db.close()
-        return web.json_response(reps_data)
+        return json_response(reps_data)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def update_sales_rep(request):
+@db_handler(json_body=True)
+def update_sales_rep(db, request, data):
     """Обновить торгового представителя"""
     try:
         rep_id = int(request.match_info['id'])
-        data = await request.json()
         
-        db = SessionLocal()
         rep = db.query(SalesRepresentative).filter(SalesRepresentative.id == rep_id).first()
         
         if not rep:
-            db.close()
-            return web.json_response({'error': 'Not found'}, status=404)
+            return json_response({'error': 'Not found'}, status=404)
         
         rep.name = data.get('name', rep.name)
         rep.telegram_id = data.get('telegram_id')
@@ -797,21 +975,17 @@ async def update_sales_rep(request):
         rep.is_active = data.get('is_active', False)
         
         db.commit()
-        db.close()
         
-        return web.json_response({'success': True})
+        return json_response({'success': True})
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def add_sales_rep(request):
+@db_handler(json_body=True)
+def add_sales_rep(db, request, data):
     """Добавить торгового представителя"""
     try:
-        data = await request.json()
-        
-        db = SessionLocal()
-        
         rep = SalesRepresentative(
             name=data['name'],
             telegram_id=data.get('telegram_id'),
@@ -831,12 +1005,11 @@ async def add_sales_rep(request):
             'is_active': rep.is_active
         }
         
-        db.close()
-        return web.json_response(rep_data, status=201)
+        return json_response(rep_data, status=201)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 # ============================================
 # СОЗДАНИЕ ПРИЛОЖЕНИЯ И МАРШРУТЫ
@@ -847,23 +1020,21 @@ async def add_sales_rep(request):
 # ЛИЧНЫЙ КАБИНЕТ КЛИЕНТА - API ENDPOINTS
 # ============================================
 
-async def get_client_profile(request):
+@db_handler
+def get_client_profile(db, request):
     """Получить профиль клиента"""
     try:
         user_id = int(request.query.get('user_id'))
-        db = SessionLocal()
         
         user = db.query(User).filter(User.telegram_id == user_id).first()
         if not user or not user.client:
-            db.close()
-            return web.json_response({'error': 'Client not found'}, status=404)
+            return json_response({'error': 'Client not found'}, status=404)
         
         client = user.client
+        metrics = client_metrics.summary(db, client.id)
         
         # Определяем статус
-        total_spent = db.query(func.sum(Order.total)).filter(
-            Order.client_id == client.id
-        ).scalar() or 0
+        total_spent = metrics['total_spent']
         
         if total_spent >= 500000:
             status = 'platinum'
@@ -878,16 +1049,6 @@ async def get_client_profile(request):
             status = 'bronze'
             status_name = 'Бронзовый'
         
-        # Количество заказов
-        orders_count = db.query(func.count(Order.id)).filter(
-            Order.client_id == client.id
-        ).scalar() or 0
-        
-        # Экономия
-        total_discount = db.query(func.sum(Order.discount_amount)).filter(
-            Order.client_id == client.id
-        ).scalar() or 0
-        
         profile_data = {
             'company_name': client.company_name,
             'phone': client.contact_phone,
@@ -895,42 +1056,50 @@ async def get_client_profile(request):
             'bonus_balance': float(client.bonus_balance),
             'status': status,
             'status_name': status_name,
-            'orders_count': orders_count,
-            'total_spent': float(total_spent),
-            'total_saved': float(total_discount)
+            'orders_count': metrics['total_orders'],
+            'total_spent': total_spent,
+            'total_saved': metrics['total_saved']
         }
         
-        db.close()
-        return web.json_response(profile_data)
+        return json_response(profile_data)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def get_client_orders(request):
-    """Получить заказы клиента"""
+@db_handler
+def get_client_orders(db, request):
+    """
+    Получить заказы клиента (keyset-пагинация по created_at, id)
+
+    Следующая страница - ?cursor= из заголовка X-Next-Cursor.
+    Позиции и товары подгружаются пакетно, без запроса на каждый заказ.
+    """
     try:
         user_id = int(request.query.get('user_id'))
-        limit = int(request.query.get('limit', 20))
+        limit = page_size(request.query.get('limit'))
         status = request.query.get('status')
         
-        db = SessionLocal()
-        
         user = db.query(User).filter(User.telegram_id == user_id).first()
         if not user or not user.client:
-            db.close()
-            return web.json_response({'error': 'Client not found'}, status=404)
+            return json_response({'error': 'Client not found'}, status=404)
         
-        query = db.query(Order).filter(Order.client_id == user.client.id)
+        query = (
+            db.query(Order)
+            .options(selectinload(Order.items).joinedload(OrderItem.product))
+            .filter(Order.client_id == user.client.id)
+        )
         
         if status:
             query = query.filter(Order.status == status)
         
-        orders = query.order_by(desc(Order.created_at)).limit(limit).all()
+        orders, next_cursor = keyset_page(
+            query, (Order.created_at, Order.id), limit, request.query.get('cursor')
+        )
         
         orders_data = []
         for order in orders:
-            items = db.query(OrderItem).filter(OrderItem.order_id == order.id).all()
+            items = order.items
             
             orders_data.append({
                 'id': order.id,
@@ -950,23 +1119,24 @@ async def get_client_orders(request):
                 ]
             })
         
-        db.close()
-        return web.json_response(orders_data)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return json_response(orders_data, headers=headers)
         
+    except InvalidCursor:
+        return json_response({'error': 'Invalid cursor'}, status=400)
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def repeat_order(request):
+@db_handler
+def repeat_order(db, request):
     """Повторить заказ - возвращает товары для добавления в корзину"""
     try:
         order_id = int(request.match_info['id'])
-        db = SessionLocal()
         
         order = db.query(Order).filter(Order.id == order_id).first()
         if not order:
-            db.close()
-            return web.json_response({'error': 'Order not found'}, status=404)
+            return json_response({'error': 'Order not found'}, status=404)
         
         items = db.query(OrderItem).filter(OrderItem.order_id == order_id).all()
         
@@ -980,127 +1150,89 @@ async def repeat_order(request):
                     'quantity': item.quantity
                 })
         
-        db.close()
-        return web.json_response({'cart': cart_items})
+        return json_response({'cart': cart_items})
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def get_client_favorites(request):
+@db_handler
+def get_client_favorites(db, request):
     """Получить избранные товары клиента"""
     try:
         user_id = int(request.query.get('user_id'))
-        db = SessionLocal()
         
         user = db.query(User).filter(User.telegram_id == user_id).first()
         if not user or not user.client:
-            db.close()
-            return web.json_response({'error': 'Client not found'}, status=404)
+            return json_response({'error': 'Client not found'}, status=404)
         
         # Топ 10 товаров по количеству заказов
-        top_products = db.query(
-            Product.id,
-            Product.name,
-            Product.price,
-            Product.stock,
-            func.sum(OrderItem.quantity).label('total_ordered')
-        ).join(OrderItem).join(Order).filter(
-            Order.client_id == user.client.id,
-            Product.is_active == True
-        ).group_by(Product.id, Product.name, Product.price, Product.stock).order_by(
-            desc('total_ordered')
-        ).limit(10).all()
+        top_products = product_affinity.favorites(db, user.client.id, limit=10)
         
         favorites = [
             {
-                'product_id': p[0],
-                'name': p[1],
-                'price': float(p[2]),
-                'stock': p[3],
-                'total_ordered': p[4]
+                'product_id': product.id,
+                'name': product.name,
+                'price': float(product.price),
+                'stock': product.stock,
+                'total_ordered': total_ordered
             }
-            for p in top_products
+            for product, total_ordered in top_products
         ]
         
-        db.close()
-        return web.json_response(favorites)
+        return json_response(favorites)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def get_client_stats(request):
+@db_handler
+def get_client_stats(db, request):
     """Получить статистику клиента"""
     try:
         user_id = int(request.query.get('user_id'))
-        db = SessionLocal()
         
         user = db.query(User).filter(User.telegram_id == user_id).first()
         if not user or not user.client:
-            db.close()
-            return web.json_response({'error': 'Client not found'}, status=404)
+            return json_response({'error': 'Client not found'}, status=404)
         
         client = user.client
         
         # Общая статистика
-        total_orders = db.query(func.count(Order.id)).filter(
-            Order.client_id == client.id
-        ).scalar() or 0
-        
-        total_spent = db.query(func.sum(Order.total)).filter(
-            Order.client_id == client.id
-        ).scalar() or 0
-        
-        total_saved = db.query(func.sum(Order.discount_amount)).filter(
-            Order.client_id == client.id
-        ).scalar() or 0
-        
-        avg_order = float(total_spent / total_orders) if total_orders > 0 else 0
+        metrics = client_metrics.summary(db, client.id)
         
         # Топ 5 товаров
-        top_products = db.query(
-            Product.name,
-            func.sum(OrderItem.quantity).label('total_qty')
-        ).join(OrderItem).join(Order).filter(
-            Order.client_id == client.id
-        ).group_by(Product.id, Product.name).order_by(
-            desc('total_qty')
-        ).limit(5).all()
+        top_products = product_affinity.favorites(db, client.id, limit=5, active_only=False)
         
         stats_data = {
-            'total_orders': total_orders,
-            'total_spent': float(total_spent),
-            'total_saved': float(total_saved),
-            'avg_order': avg_order,
+            'total_orders': metrics['total_orders'],
+            'total_spent': metrics['total_spent'],
+            'total_saved': metrics['total_saved'],
+            'avg_order': metrics['avg_order'],
             'top_products': [
-                {'name': p[0], 'quantity': p[1]}
-                for p in top_products
+                {'name': product.name, 'quantity': quantity}
+                for product, quantity in top_products
             ]
         }
         
-        db.close()
-        return web.json_response(stats_data)
+        return json_response(stats_data)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def submit_feedback(request):
+@db_handler(json_body=True)
+def submit_feedback(db, request, data):
     """Отправить отзыв/идею"""
     try:
-        data = await request.json()
         user_id = int(data.get('user_id'))
         feedback_type = data.get('type')  # 'feedback', 'idea', 'complaint'
         text = data.get('text')
         rating = data.get('rating')
         
-        db = SessionLocal()
-        
         user = db.query(User).filter(User.telegram_id == user_id).first()
         if not user or not user.client:
-            db.close()
-            return web.json_response({'error': 'Client not found'}, status=404)
+            return json_response({'error': 'Client not found'}, status=404)
         
         # Начисляем бонусы
         bonus = 500 if feedback_type == 'feedback' else 1000 if feedback_type == 'idea' else 0
@@ -1111,8 +1243,7 @@ async def submit_feedback(request):
         
         # TODO: Сохранить отзыв в БД (добавить таблицу Feedback)
         
-        db.close()
-        return web.json_response({
+        return json_response({
             'success': True,
             'bonus_added': bonus,
             'message': f'Спасибо! +{bonus}₸ бонусов начислено'
@@ -1120,7 +1251,7 @@ async def submit_feedback(request):
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 async def get_current_survey(request):
     """Получить текущий опрос для клиента"""
@@ -1163,26 +1294,23 @@ async def get_current_survey(request):
             ]
         }
         
-        return web.json_response(survey)
+        return json_response(survey)
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
-async def submit_survey(request):
+@db_handler(json_body=True)
+def submit_survey(db, request, data):
     """Отправить заполненный опрос"""
     try:
-        data = await request.json()
         user_id = int(data.get('user_id'))
         survey_id = data.get('survey_id')
         answers = data.get('answers')
         
-        db = SessionLocal()
-        
         user = db.query(User).filter(User.telegram_id == user_id).first()
         if not user or not user.client:
-            db.close()
-            return web.json_response({'error': 'Client not found'}, status=404)
+            return json_response({'error': 'Client not found'}, status=404)
         
         # Начисляем бонусы
         user.client.bonus_balance += 1000
@@ -1190,8 +1318,7 @@ async def submit_survey(request):
         
         # TODO: Сохранить ответы в БД
         
-        db.close()
-        return web.json_response({
+        return json_response({
             'success': True,
             'bonus_added': 1000,
             'message': 'Спасибо за участие! +1000₸ бонусов'
@@ -1199,7 +1326,7 @@ async def submit_survey(request):
         
     except Exception as e:
         print(f"API Error: {e}")
-        return web.json_response({'error': str(e)}, status=500)
+        return json_response({'error': str(e)}, status=500)
 
 async def serve_profile_webapp(request):
     """Отдать файлы личного кабинета"""
@@ -1208,26 +1335,127 @@ async def serve_profile_webapp(request):
     if file_path == '':
         file_path = 'index.html'
     
+    return profile_assets.serve(request, file_path)
+
+
+def _order_response(result: dict) -> dict:
+    return {
+        'success': True,
+        'order_id': result['order_id'],
+        'total': int(result['final_total']),
+        'bonus_earned': result['bonus_earned'],
+        'bonus_used': int(result['bonus_used'])
+    }
+
+def _replay_response(stored: StoredResponse, fingerprint: str):
+    """Ответ на повтор запроса с тем же Idempotency-Key"""
+    if stored.request_hash != fingerprint:
+        return json_response(
+            {'success': False, 'error': 'Idempotency-Key уже использован для другого заказа'}, status=422
+        )
+    return json_response(serialization.loads(stored.body), status=stored.status, headers={REPLAYED_HEADER: 'true'})
+
+async def _stored_order_response(key: str):
+    """Готовый ответ по ключу: память, выполняющийся запрос, БД"""
+    stored = order_requests.cached(key)
+    if stored is None and order_requests.inflight(key) is not None:
+        # Повтор пришёл, пока первый запрос ещё оформляется
+        stored = await asyncio.shield(order_requests.inflight(key))
+    if stored is None:
+        stored = await db_executor.run(order_requests.lookup, key)
+    return stored
+
+async def create_order_from_webapp(request):
+    """
+    Создать заказ из WebApp с поддержкой бонусов
+
+    С заголовком Idempotency-Key повтор запроса (обрыв сети) возвращает
+    ответ исходного заказа, не оформляя его заново.
+    """
+    try:
+        data = await request.json()
+    except Exception as e:
+        logger.error(f"Ошибка создания заказа: {e}")
+        return json_response({'error': str(e)}, status=500)
+
+    idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+    fingerprint = None
+    if idempotency_key:
+        if len(idempotency_key) > MAX_KEY_LENGTH:
+            return json_response({'success': False, 'error': 'Слишком длинный Idempotency-Key'}, status=400)
+        fingerprint = request_hash(data)
+        stored = await _stored_order_response(idempotency_key)
+        if stored is not None:
+            return _replay_response(stored, fingerprint)
+        inflight = order_requests.begin(idempotency_key)
+
+    stored = None
     try:
-        with open(f'webapp_profile/{file_path}', 'r', encoding='utf-8') as f:
-            content = f.read()
+        result = await db_executor.run(_place_webapp_order, data, idempotency_key, fingerprint)
+        if isinstance(result, StoredResponse):
+            # Тот же ключ одновременно оформил другой процесс
+            stored = result
+            return _replay_response(result, fingerprint)
+        if isinstance(result, web.Response):
+            return result
+        stored = result.get('stored_response')
+    finally:
+        if idempotency_key:
+            order_requests.finish(idempotency_key, inflight, stored)
+
+    # Отправляем уведомление админу
+    try:
+        from bot import bot
+        import os
+        admin_id = int(os.getenv('ADMIN_TELEGRAM_ID', '473294026'))
+
+        items_text = '\n'.join([f"• {item['product_name']} x{item['quantity']} = {int(item['subtotal']):,}₸"
+                               for item in result['items']])
+
+        message = (
+            f"🔔 <b>Новый заказ #{result['order_id']}</b>\n\n"
+            f"👤 Клиент: {result['company_name']}\n"
+            f"📞 Телефон: {result['contact_phone']}\n"
+            f"📍 Адрес: {result['address']}\n"
+        )
         
-        content_type = 'text/html'
-        if file_path.endswith('.js'):
-            content_type = 'application/javascript'
-        elif file_path.endswith('.css'):
-            content_type = 'text/css'
+        if result['delivery_date']:
+            message += f"📅 Дата доставки: {result['delivery_date']}\n"
         
-        return web.Response(text=content, content_type=content_type)
-    except FileNotFoundError:
-        return web.Response(status=404)
+        message += f"\n<b>Товары:</b>\n{items_text}\n\n"
+        message += f"💰 Сумма товаров: {int(result['subtotal']):,}₸\n"
+        
+        if result['bonus_used'] > 0:
+            message += f"💎 Оплачено бонусами: -{int(result['bonus_used']):,}₸\n"
+        
+        message += f"💵 <b>К оплате: {int(result['final_total']):,}₸</b>\n"
+        message += f"💳 Способ: {result['payment_method']}\n"
+        
+        if result['bonus_earned'] > 0:
+            message += f"\n🎁 Клиенту начислено бонусов: +{result['bonus_earned']:,}₸"
+        
+        if result['notes']:
+            message += f"\n\n📝 Комментарий: {result['notes']}"
 
+        await bot.send_message(admin_id, message, parse_mode='HTML')
+    except Exception as notify_error:
+        logger.error(f"Не удалось отправить уведомление: {notify_error}")
 
-async def create_order_from_webapp(request):
-    """Создать заказ из WebApp с поддержкой бонусов"""
-    db = SessionLocal()
+    return json_response(_order_response(result))
+
+def _place_webapp_order(db, data, idempotency_key=None, fingerprint=None):
+    """
+    Транзакция оформления заказа (выполняется в пуле БД)
+    Возвращает данные для уведомления или web.Response с ошибкой
+
+    С idempotency_key ответ сохраняется в той же транзакции; если ключ
+    одновременно занял другой процесс - возвращается его StoredResponse.
+
+    Число запросов не зависит от размера корзины: клиент, товары одним
+    IN-запросом, заказ, позиции и бонусные операции пакетными INSERT,
+    одно UPDATE баланса. Настройки бонусов берутся из settings_service.
+    """
     try:
-        data = await request.json()
         user_id = int(data.get('user_id'))
         cart = data.get('cart', {})
         payment_method = data.get('payment_method', 'cash')
@@ -1235,24 +1463,33 @@ async def create_order_from_webapp(request):
         delivery_date = data.get('delivery_date')
         bonus_used = float(data.get('bonus_used', 0))
 
-        user = db.query(User).filter(User.telegram_id == user_id).first()
+        user = (
+            db.query(User)
+            .options(joinedload(User.client))
+            .filter(User.telegram_id == user_id)
+            .first()
+        )
         if not user or not user.client:
-            return web.json_response({'success': False, 'error': 'Пользователь не найден'}, status=404)
+            return json_response({'success': False, 'error': 'Пользователь не найден'}, status=404)
 
         client = user.client
-        # Загружаем настройки бонусов из БД
-        bonus_earn_setting = db.query(SystemSetting).filter(SystemSetting.key == 'bonus_earn_percent').first()
-        bonus_max_setting = db.query(SystemSetting).filter(SystemSetting.key == 'bonus_max_use_percent').first()
-        BONUS_EARN_PERCENT = int(bonus_earn_setting.value) if bonus_earn_setting else 3
-        
-        BONUS_MAX_USE_PERCENT = int(bonus_max_setting.value) if bonus_max_setting else 70
+        # Настройки бонусов из кэша (без запросов к БД)
+        BONUS_EARN_PERCENT = settings_service.get('bonus_earn_percent')
+        BONUS_MAX_USE_PERCENT = settings_service.get('bonus_max_use_percent')
+
+        # Все товары корзины одним запросом
+        quantities = {int(product_id): int(quantity) for product_id, quantity in cart.items()}
+        products = {
+            product.id: product
+            for product in db.query(Product.id, Product.name, Product.price).filter(Product.id.in_(list(quantities)))
+        } if quantities else {}
 
         # Рассчитываем total на основе корзины
         subtotal = 0
         order_items_list = []
 
-        for product_id, quantity in cart.items():
-            product = db.query(Product).filter(Product.id == int(product_id)).first()
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
             if product:
                 price = float(product.price)
                 item_total = price * quantity
@@ -1274,10 +1511,12 @@ async def create_order_from_webapp(request):
         # Рассчитываем бонусы к начислению (от итоговой суммы после вычета бонусов)
         bonus_earned = int(final_total * (BONUS_EARN_PERCENT / 100))
 
-        # Создаём заказ
-        import random
-        order_number = f"ORD-{random.randint(10000, 99999)}"
-        
+        # Создаём заказ (номер из блока процесса - без запроса к БД и без коллизий)
+        order_number = order_numbers.next()
+
+        if isinstance(delivery_date, str) and delivery_date:
+            delivery_date = date.fromisoformat(delivery_date[:10])
+
         order = Order(
             order_number=order_number,
             client_id=client.id,
@@ -1285,125 +1524,89 @@ async def create_order_from_webapp(request):
             bonus_used=bonus_used,
             final_total=final_total,
             status='new',
-            delivery_date=delivery_date,
+            delivery_date=delivery_date or None,
             comment=notes
         )
         db.add(order)
         db.flush()
 
-        # Создаём позиции заказа
-        for item_data in order_items_list:
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=item_data['product_id'],
-                product_name=item_data['product_name'],
-                quantity=item_data['quantity'],
-                price=item_data['price'],
-                subtotal=item_data['subtotal']
-            )
-            db.add(order_item)
+        # Позиции заказа - один пакетный INSERT
+        if order_items_list:
+            db.execute(insert(OrderItem), [{'order_id': order.id, **item} for item in order_items_list])
 
-        # Списываем использованные бонусы
-        if bonus_used > 0:
-            client.bonus_balance -= bonus_used
-            
-            bonus_transaction = BonusTransaction(
-                client_id=client.id,
-                amount=bonus_used,
-                type='spend',
-                description=f'Оплата заказа #{order.id}'
-            )
-            db.add(bonus_transaction)
+        order_events.order_placed(
+            db, order,
+            lines=[(item['product_id'], item['quantity'], item['price']) for item in order_items_list],
+            client=client
+        )
 
-        # Начисляем новые бонусы
+        # Бонусные операции: списание и начисление одним INSERT
+        bonus_transactions = []
+        if bonus_used > 0:
+            bonus_transactions.append({
+                'client_id': client.id,
+                'order_id': order.id,
+                'amount': bonus_used,
+                'type': 'spend',
+                'description': f'Оплата заказа #{order.id}',
+                'expires_at': None
+            })
         if bonus_earned > 0:
-            client.bonus_balance += bonus_earned
-            
-            bonus_transaction = BonusTransaction(
-                client_id=client.id,
-                amount=bonus_earned,
-                type='earn',
-                description=f'Начисление за заказ #{order.id}',
-                expires_at=datetime.utcnow() + timedelta(days=30)  # 30 дней срок
-            )
-            db.add(bonus_transaction)
-
-        db.commit()
-        db.refresh(order)
-
-        # Отправляем уведомление админу
-        try:
-            from bot import bot
-            import os
-            admin_id = int(os.getenv('ADMIN_TELEGRAM_ID', '473294026'))
-
-            items_text = '\n'.join([f"• {item['product_name']} x{item['quantity']} = {int(item['subtotal']):,}₸"
-                                   for item in order_items_list])
-
-            message = (
-                f"🔔 <b>Новый заказ #{order.id}</b>\n\n"
-                f"👤 Клиент: {client.company_name}\n"
-                f"📞 Телефон: {client.contact_phone}\n"
-                f"📍 Адрес: {client.address}\n"
+            bonus_transactions.append({
+                'client_id': client.id,
+                'order_id': order.id,
+                'amount': bonus_earned,
+                'type': 'earn',
+                'description': f'Начисление за заказ #{order.id}',
+                'expires_at': datetime.utcnow() + timedelta(days=30)  # 30 дней срок
+            })
+        if bonus_transactions:
+            db.execute(insert(BonusTransaction), bonus_transactions)
+            client_metrics.bonus_recorded(db, client.id, earned=bonus_earned, used=bonus_used)
+
+            # Баланс меняем одним UPDATE относительно текущего значения в БД
+            db.query(Client).filter(Client.id == client.id).update(
+                {Client.bonus_balance: Client.bonus_balance - bonus_used + bonus_earned},
+                synchronize_session=False
             )
-            
-            if delivery_date:
-                message += f"📅 Дата доставки: {delivery_date}\n"
-            
-            message += f"\n<b>Товары:</b>\n{items_text}\n\n"
-            message += f"💰 Сумма товаров: {int(subtotal):,}₸\n"
-            
-            if bonus_used > 0:
-                message += f"💎 Оплачено бонусами: -{int(bonus_used):,}₸\n"
-            
-            message += f"💵 <b>К оплате: {int(final_total):,}₸</b>\n"
-            message += f"💳 Способ: {payment_method}\n"
-            
-            if bonus_earned > 0:
-                message += f"\n🎁 Клиенту начислено бонусов: +{bonus_earned:,}₸"
-            
-            if notes:
-                message += f"\n\n📝 Комментарий: {notes}"
-
-            await bot.send_message(admin_id, message, parse_mode='HTML')
-        except Exception as notify_error:
-            logger.error(f"Не удалось отправить уведомление: {notify_error}")
 
-        return web.json_response({
-            'success': True,
+        # Данные для уведомления собираем до commit (после него атрибуты сбрасываются)
+        result = {
             'order_id': order.id,
-            'total': int(final_total),
+            'company_name': client.company_name,
+            'contact_phone': client.contact_phone,
+            'address': client.address,
+            'items': order_items_list,
+            'subtotal': subtotal,
+            'bonus_used': bonus_used,
             'bonus_earned': bonus_earned,
-            'bonus_used': int(bonus_used)
-        })
+            'final_total': final_total,
+            'payment_method': payment_method,
+            'delivery_date': delivery_date.isoformat() if delivery_date else None,
+            'notes': notes
+        }
+        if idempotency_key:
+            result['stored_response'] = order_requests.save(
+                db, idempotency_key, fingerprint, 200, serialization.dumps(_order_response(result)).decode()
+            )
+
+        db.commit()
+        return result
+    except IntegrityError as e:
+        db.rollback()
+        stored = order_requests.lookup(db, idempotency_key) if idempotency_key else None
+        if stored is not None:
+            return stored
+        logger.error(f"Ошибка создания заказа: {e}")
+        return json_response({'error': str(e)}, status=500)
     except Exception as e:
-        if db:
-            db.rollback()
+        db.rollback()
         logger.error(f"Ошибка создания заказа: {e}")
-        return web.json_response({'error': str(e)}, status=500)
-    finally:
-        db.close()
-    data = await request.json()
-    db = SessionLocal()
-    try:
-        user = db.query(User).filter(User.telegram_id == data['user_id']).first()
-        if user:
-            from models.user import Client
-            client = user.client
-            if not client:
-                client = Client(user_id=user.id)
-                db.add(client)
-            
-            client.company_name = data['company_name']
-            client.address = data['address']
-            client.contact_phone = data['contact_phone']
-            db.commit()
-            return web.json_response({'success': True})
-    finally:
-        db.close()
-async def init_settings_api(request):
+        return json_response({'error': str(e)}, status=500)
+
+@db_handler
+def init_settings_api(db, request):
     """Инициализация настроек"""
-    db = SessionLocal()
     try:
         settings = [
             {'key': 'bonus_earn_percent', 'value': '3', 'type': 'int', 'description': 'Процент начисления бонусов'},
@@ -1431,16 +1634,14 @@ async def init_settings_api(request):
                 db.add(SystemSetting(**s))
                 added.append(s['key'])
         db.commit()
-        return web.json_response({'success': True, 'added': added})
+        settings_service.changed()
+        return json_response({'success': True, 'added': added})
     except Exception as e:
         db.rollback()
-        return web.json_response({'error': str(e)}, status=500)
-    finally:
-        db.close()
-async def update_client_profile_api(request):
+        return json_response({'error': str(e)}, status=500)
+@db_handler(json_body=True)
+def update_client_profile_api(db, request, data):
     """Обновление профиля клиента из WebApp"""
-    data = await request.json()
-    db = SessionLocal()
     try:
         user = db.query(User).filter(User.telegram_id == data['user_id']).first()
         if user:
@@ -1455,18 +1656,16 @@ async def update_client_profile_api(request):
             client.contact_phone = data['contact_phone']
             db.commit()
             
-            return web.json_response({'success': True})
+            return json_response({'success': True})
         else:
-            return web.json_response({'success': False, 'error': 'User not found'}, status=404)
+            return json_response({'success': False, 'error': 'User not found'}, status=404)
     except Exception as e:
         db.rollback()
         logger.error(f"Profile update error: {e}")
-        return web.json_response({'success': False, 'error': str(e)}, status=500)
-    finally:
-        db.close()
-def create_app():
+        return json_response({'success': False, 'error': str(e)}, status=500)
+def create_app(startup_hooks: bool = True):
     """Создаём приложение и регистрируем ВСЕ роуты"""
-    app = web.Application()
+    app = web.Application(middlewares=[metrics_middleware, serialization_middleware, admission_middleware, compression_middleware])
     
     # CORS настройки
     cors = aiohttp_cors.setup(app, defaults={
@@ -1480,12 +1679,17 @@ def create_app():
 
     # WEBAPP ENDPOINTS
     app.router.add_get('/api/catalog', get_catalog)
+    app.router.add_get('/api/catalog/me', get_catalog_user)
     app.router.add_post('/api/orders/create', create_order_from_webapp)
     app.router.add_post('/api/client/profile/update', update_client_profile_api)
+    app.router.add_get('/api/photo/{file_id}', get_photo)
 
     # ADMIN - Категории и Продукты
     app.router.add_get('/api/admin/products', get_products)
     app.router.add_post('/api/admin/products', create_product)
+    app.router.add_post('/api/admin/products/{id}/photo', upload_product_photo)
+    app.router.add_post('/api/admin/products/photos/import', import_product_photos)
+    app.router.add_get('/api/admin/products/photos/import/{job_id}', get_photo_import_job)
     app.router.add_get('/api/admin/categories', get_categories)
     app.router.add_post('/api/admin/categories', create_category)
     app.router.add_put('/api/admin/categories/{id}', update_category)
@@ -1502,6 +1706,9 @@ def create_app():
 
     # ADMIN - Остальное
     app.router.add_get('/api/admin/stats/dashboard', get_dashboard_stats)
+    app.router.add_get('/api/admin/stats/db_pool', get_db_pool_stats)
+    app.router.add_get('/metrics', get_metrics)
+    app.router.add_get('/health', get_health)
     app.router.add_get('/api/admin/settings', get_settings)
     app.router.add_get('/api/admin/sales_reps', get_sales_reps)
     app.router.add_post('/api/admin/sales_reps', add_sales_rep)
@@ -1525,7 +1732,7 @@ def create_app():
     app.router.add_post("/api/settings", update_setting)
     app.router.add_post("/api/settings/init", init_settings_api)
 
-    app.router.add_static('/admin', 'static/admin', name='admin')
+    app.router.add_static('/admin', os.path.join(BASE_DIR, 'static', 'admin'), name='admin')
     app.router.add_get('/', serve_webapp)
     app.router.add_get('/{path:.*}', serve_webapp)
     
@@ -1533,6 +1740,24 @@ def create_app():
     for route in list(app.router.routes()):
         cors.add(route)
 
+    async def start_services(app):
+        webapp_assets.load()
+        profile_assets.load()
+        settings_service.start_listener()
+        load_monitor.start()
+        if startup_hooks:
+            await asyncio.get_running_loop().run_in_executor(None, run_startup_hooks, engine)
+
+    app.on_startup.append(start_services)
+
+    async def shutdown_executors(app):
+        await load_monitor.stop()
+        db_executor.shutdown(wait=False)
+        photo_service.shutdown()
+        settings_service.stop_listener()
+
+    app.on_cleanup.append(shutdown_executors)
+
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,9 @@
+"""
+Бенчмарки производительности API
+
+Запуск из каталога app:
+    python -m benchmarks.catalog_under_load
+    python -m benchmarks.loadtest --output before.json
+    python -m benchmarks.serialization
+    python -m benchmarks.hydration
+"""
@@ -0,0 +1,87 @@
+"""
+p99 латентности /api/catalog под параллельной нагрузкой /api/admin/stats/dashboard
+
+Сравнивает два режима в одном процессе:
+    inline   - запросы к БД выполняются прямо в event loop (как было раньше)
+    executor - запросы к БД выполняются в пуле потоков DBExecutor
+
+Запуск из каталога app:
+    python -m benchmarks.catalog_under_load --duration 10 --dashboard-concurrency 4
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import prepare_environment, seed_database, summarize
+
+
+async def _worker(session, base_url, path, deadline, latencies):
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        async with session.get(base_url + path) as response:
+            await response.read()
+        latencies.append(time.perf_counter() - started)
+
+
+async def run_mode(app_factory, executor, workers: int, args, telegram_id: int) -> dict:
+    """Один прогон: N клиентов каталога + M обновлений дашборда"""
+    from aiohttp import ClientSession
+    from aiohttp.test_utils import TestServer
+
+    executor.shutdown()
+    executor.max_workers = workers
+
+    server = TestServer(app_factory())
+    await server.start_server()
+    base_url = str(server.make_url(''))
+
+    catalog_latencies = []
+    dashboard_latencies = []
+    try:
+        async with ClientSession() as session:
+            deadline = time.perf_counter() + args.duration
+            tasks = [
+                _worker(session, base_url, f'/api/catalog?user_id={telegram_id}', deadline, catalog_latencies)
+                for _ in range(args.catalog_concurrency)
+            ]
+            tasks += [
+                _worker(session, base_url, '/api/admin/stats/dashboard?days=365', deadline, dashboard_latencies)
+                for _ in range(args.dashboard_concurrency)
+            ]
+            await asyncio.gather(*tasks)
+    finally:
+        await server.close()
+
+    return {
+        'catalog': summarize(catalog_latencies),
+        'dashboard': summarize(dashboard_latencies)
+    }
+
+
+async def main(args):
+    prepare_environment(args.database_url)
+    dataset = seed_database(products=args.products, clients=args.clients, orders=args.orders)
+
+    import api_server
+
+    results = {}
+    for mode, workers in (('inline', 0), ('executor', args.workers)):
+        results[mode] = await run_mode(
+            api_server.create_app, api_server.db_executor, workers, args, dataset['telegram_ids'][0]
+        )
+
+    print(json.dumps({'params': vars(args), 'results': results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='По умолчанию временный SQLite')
+    parser.add_argument('--duration', type=float, default=10.0, help='Секунд на режим')
+    parser.add_argument('--catalog-concurrency', type=int, default=8)
+    parser.add_argument('--dashboard-concurrency', type=int, default=4)
+    parser.add_argument('--workers', type=int, default=10, help='Размер пула DBExecutor')
+    parser.add_argument('--products', type=int, default=300)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=30000)
+    asyncio.run(main(parser.parse_args()))
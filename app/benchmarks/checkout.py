@@ -0,0 +1,74 @@
+"""
+Латентность оформления заказа из WebApp в зависимости от размера корзины
+
+Для корзин из 1, 10, 50, 200 позиций выполняет транзакцию
+_place_webapp_order и считает время и число SQL-запросов на заказ.
+
+Запуск из каталога app:
+    python -m benchmarks.checkout --iterations 50
+"""
+import argparse
+import json
+import random
+import time
+
+from benchmarks.common import prepare_environment, seed_database, summarize
+
+
+def main(args):
+    prepare_environment(args.database_url)
+    dataset = seed_database(products=max(args.sizes) * 2, clients=args.clients, orders=args.orders)
+
+    from sqlalchemy import event
+    from database import SessionLocal, engine
+    import api_server
+
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    rnd = random.Random(7)
+    results = {}
+    for size in args.sizes:
+        latencies = []
+        per_checkout = []
+        for i in range(args.iterations):
+            cart = {str(pid): rnd.randint(1, 10) for pid in rnd.sample(dataset['product_ids'], size)}
+            data = {
+                'user_id': dataset['telegram_ids'][i % len(dataset['telegram_ids'])],
+                'cart': cart,
+                'bonus_used': 100,
+                'payment_method': 'cash'
+            }
+
+            db = SessionLocal()
+            statements.clear()
+            started = time.perf_counter()
+            try:
+                result = api_server._place_webapp_order(db, data)
+            finally:
+                db.close()
+            latencies.append(time.perf_counter() - started)
+            per_checkout.append(len(statements))
+
+            if not isinstance(result, dict):
+                raise RuntimeError(f"checkout failed: {result.text}")
+
+        results[f'{size}_lines'] = {
+            **summarize(latencies),
+            'statements': max(per_checkout)
+        }
+
+    print(json.dumps({'params': vars(args), 'results': results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='По умолчанию временный SQLite')
+    parser.add_argument('--iterations', type=int, default=30, help='Заказов на каждый размер корзины')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1, 10, 50, 200])
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--orders', type=int, default=1000)
+    main(parser.parse_args())
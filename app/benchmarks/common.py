@@ -0,0 +1,174 @@
+"""
+Общие утилиты бенчмарков: окружение, тестовые данные, перцентили
+"""
+import math
+import os
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+
+def prepare_environment(database_url: str = None) -> str:
+    """
+    Настроить переменные окружения ДО импорта api_server/database
+
+    По умолчанию используется временный SQLite-файл.
+    """
+    if database_url is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="happysnack_bench_"), "bench.db")
+        database_url = f"sqlite:///{db_path}"
+
+    os.environ["DATABASE_URL"] = database_url
+    os.environ.setdefault("BOT_TOKEN", "0:benchmark")
+    os.environ.setdefault("WEBAPP_URL", "http://localhost")
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("ADMIN_TELEGRAM_IDS", "1")
+    os.environ.setdefault("ADMIN_TELEGRAM_ID", "1")
+    return database_url
+
+
+def seed_database(products: int = 200, clients: int = 50, orders: int = 5000, seed: int = 42) -> dict:
+    """
+    Создать таблицы и заполнить БД тестовыми данными
+
+    Returns:
+        dict с telegram_id клиентов и id товаров для сценариев
+    """
+    from sqlalchemy import insert
+    from database import Base, engine
+    from models.user import User, Client
+    from models.product import Product, Category
+    from models.order import Order, OrderItem
+    from models.bonus import BonusTransaction
+    from models.settings import SystemSetting
+    from models.ai_log import AIConversation, AIProactiveMessage
+    from models.analytics import AnalyticsEvent, ClientMetrics
+    from models.idempotency import IdempotencyKey
+
+    rnd = random.Random(seed)
+    Base.metadata.create_all(bind=engine)
+
+    now = datetime.utcnow()
+    category_names = ['Попкорн', 'Чипсы', 'Батончики', 'Хлебцы', 'Напитки', 'Выпечка']
+
+    with engine.begin() as conn:
+        conn.execute(insert(Category), [
+            {'id': i + 1, 'name': name, 'sort_order': i, 'is_active': True}
+            for i, name in enumerate(category_names)
+        ])
+        conn.execute(insert(Product), [
+            {
+                'id': i + 1,
+                'name': f'Товар {i + 1}',
+                'category_id': rnd.randint(1, len(category_names)),
+                'price': float(rnd.randint(200, 5000)),
+                'stock': rnd.randint(1, 500),
+                'is_active': True,
+                'sort_order': 0,
+                'created_at': now,
+                'updated_at': now
+            }
+            for i in range(products)
+        ])
+        conn.execute(insert(User), [
+            {
+                'id': i + 1,
+                'telegram_id': 1_000_000 + i,
+                'username': f'client{i}',
+                'role': 'client',
+                'is_active': True,
+                'created_at': now,
+                'last_active': now
+            }
+            for i in range(clients)
+        ])
+        conn.execute(insert(Client), [
+            {
+                'id': i + 1,
+                'user_id': i + 1,
+                'company_name': f'ИП Клиент {i + 1}',
+                'address': 'Алматы',
+                'contact_phone': f'+7701{i:07d}',
+                'status': 'active',
+                'bonus_balance': 10_000.0,
+                'credit_limit': 10_000_000.0,
+                'debt': 0.0,
+                'discount_percent': 0.0,
+                'first_order_discount_used': True,
+                'created_at': now - timedelta(days=rnd.randint(0, 365))
+            }
+            for i in range(clients)
+        ])
+        conn.execute(insert(SystemSetting), [
+            {'key': 'bonus_earn_percent', 'value': '3', 'type': 'int'},
+            {'key': 'bonus_max_use_percent', 'value': '70', 'type': 'int'},
+            {'key': 'min_order_amount', 'value': '10000', 'type': 'int'},
+        ])
+
+        order_rows = []
+        item_rows = []
+        item_id = 1
+        for order_id in range(1, orders + 1):
+            created_at = now - timedelta(minutes=rnd.randint(0, 60 * 24 * 365))
+            total = 0.0
+            for _ in range(rnd.randint(1, 5)):
+                product_id = rnd.randint(1, products)
+                quantity = rnd.randint(1, 20)
+                price = float(rnd.randint(200, 5000))
+                item_rows.append({
+                    'id': item_id,
+                    'order_id': order_id,
+                    'product_id': product_id,
+                    'product_name': f'Товар {product_id}',
+                    'quantity': quantity,
+                    'price': price,
+                    'subtotal': price * quantity
+                })
+                item_id += 1
+                total += price * quantity
+            order_rows.append({
+                'id': order_id,
+                'order_number': f'BENCH-{order_id}',
+                'client_id': rnd.randint(1, clients),
+                'total': total,
+                'bonus_used': 0.0,
+                'discount_amount': 0.0,
+                'final_total': total,
+                'status': rnd.choice(['new', 'confirmed', 'delivered', 'cancelled']),
+                'created_at': created_at,
+                'updated_at': created_at
+            })
+        conn.execute(insert(Order), order_rows)
+        conn.execute(insert(OrderItem), item_rows)
+
+        # Заказы вставлены в обход order_events - агрегаты собираем целиком
+        from services import client_metrics, product_affinity, sales_rollup
+        sales_rollup.rebuild(conn)
+        client_metrics.reconcile(conn)
+        product_affinity.rebuild(conn)
+
+    return {
+        'telegram_ids': [1_000_000 + i for i in range(clients)],
+        'product_ids': list(range(1, products + 1))
+    }
+
+
+def percentile(values: list, p: float) -> float:
+    """Перцентиль (nearest-rank), values в любом порядке"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def summarize(latencies: list) -> dict:
+    """Сводка латентностей в миллисекундах"""
+    ms = [x * 1000 for x in latencies]
+    return {
+        'count': len(ms),
+        'p50_ms': round(percentile(ms, 50), 2),
+        'p95_ms': round(percentile(ms, 95), 2),
+        'p99_ms': round(percentile(ms, 99), 2),
+        'max_ms': round(max(ms), 2) if ms else 0.0
+    }
@@ -0,0 +1,565 @@
+"""
+Генератор синтетических данных для проверки на больших объёмах
+
+Создаёт реалистичный магазин: категории и товары (популярность по Ципфу),
+торговых представителей и менеджеров, клиентов с пользователями (активность
+по Парето, регистрация растянута по периоду), заказы с позициями (статус
+зависит от возраста заказа), бонусные операции (приветственный бонус,
+начисления за доставленные заказы, списания), события аналитики и
+переписку с AI-ассистентом. Затем собирает агрегаты (витрина продаж,
+метрики клиентов, избранное) и индекс поиска клиентов.
+
+Результат детерминирован: одинаковые --seed, --now и параметры дают
+одинаковые данные. Загрузка идёт пачками по --batch строк в отдельных транзакциях:
+COPY на PostgreSQL, executemany на SQLite. После загрузки на PostgreSQL
+сбрасываются последовательности id.
+
+Запуск из каталога app (БД должна быть пустой, --reset пересоздаёт таблицы):
+    python -m benchmarks.generate_dataset --database-url sqlite:///./scale.db --reset
+    python -m benchmarks.generate_dataset --database-url postgresql+psycopg://... \\
+        --products 5000 --clients 50000 --orders 2000000
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import time
+from bisect import bisect_right
+from datetime import datetime, timedelta
+from itertools import accumulate, islice
+
+from benchmarks.common import prepare_environment
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_NAMES = [
+    'Попкорн', 'Чипсы', 'Батончики', 'Хлебцы', 'Напитки', 'Выпечка', 'Орехи', 'Сухофрукты',
+    'Печенье', 'Конфеты', 'Шоколад', 'Сухарики', 'Снеки', 'Вафли', 'Мармелад', 'Соки',
+]
+PRODUCT_WORDS = ['Классика', 'Сырный', 'Солёный', 'Карамель', 'Острый', 'Мини', 'Макси', 'Семейный', 'Био', 'Хрустящий']
+CITIES = ['Алматы', 'Астана', 'Шымкент', 'Караганда', 'Актобе', 'Тараз', 'Павлодар']
+COMPANY_FORMS = ['ИП', 'ТОО']
+
+ACTIVE_STATUSES = ('new', 'confirmed', 'preparing', 'delivering')
+# Заказы старше этого срока уже завершены (доставлены или отменены)
+SETTLED_AFTER = timedelta(days=3)
+CANCEL_RATE = 0.08
+BONUS_EARN_PERCENT = 3
+BONUS_SPEND_RATE = 0.2
+BONUS_MAX_USE_PERCENT = 70
+WELCOME_BONUS = 5000
+
+AI_QUESTIONS = [
+    'Что есть из новинок?', 'Когда доставка?', 'Хочу повторить прошлый заказ',
+    'Какие чипсы самые популярные?', 'Есть скидки на батончики?', 'Сколько бонусов у меня?',
+]
+AI_ANSWERS = [
+    'Посмотрите новинки в каталоге - добавили несколько вкусов.',
+    'Доставка на следующий рабочий день после подтверждения.',
+    'Собрал корзину по прошлому заказу, проверьте количество.',
+    'Чаще всего берут классические и сырные чипсы.',
+]
+PROACTIVE_REASONS = ['Давно не заказывал', 'Пора пополнить запас', 'Новинка в любимой категории']
+
+
+class BulkLoader:
+    """Пакетная загрузка строк: COPY на PostgreSQL, executemany на SQLite"""
+
+    def __init__(self, engine, batch_size: int):
+        self.engine = engine
+        self.dialect = engine.dialect.name
+        self.batch_size = batch_size
+        self.connection = engine.raw_connection()
+        self.cursor = self.connection.cursor()
+        self.use_copy = self.dialect == 'postgresql' and hasattr(self.cursor, 'copy')
+        self.paramstyle = engine.dialect.paramstyle
+        if self.dialect == 'sqlite':
+            # Только на время загрузки этим соединением
+            self.cursor.execute('PRAGMA synchronous = OFF')
+            self.cursor.execute('PRAGMA cache_size = -200000')
+
+    def _placeholders(self, columns) -> str:
+        if self.paramstyle == 'qmark':
+            return ', '.join('?' for _ in columns)
+        if self.paramstyle == 'numeric':
+            return ', '.join(f':{i + 1}' for i in range(len(columns)))
+        return ', '.join('%s' for _ in columns)
+
+    def write(self, table: str, columns, rows):
+        """Записать пачку строк (без commit)"""
+        if not rows:
+            return
+        column_list = ', '.join(columns)
+        if self.use_copy:
+            with self.cursor.copy(f'COPY {table} ({column_list}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+        else:
+            self.cursor.executemany(
+                f'INSERT INTO {table} ({column_list}) VALUES ({self._placeholders(columns)})', rows
+            )
+
+    def commit(self):
+        self.connection.commit()
+
+    def load(self, table: str, columns, rows) -> int:
+        """Загрузить поток строк пачками по batch_size, каждая - своя транзакция"""
+        total = 0
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.write(table, columns, batch)
+            self.commit()
+            total += len(batch)
+        return total
+
+    def update(self, sql: str, rows):
+        """executemany UPDATE пачками (параметры в стиле ?)"""
+        if self.paramstyle != 'qmark':
+            sql = sql.replace('?', '%s')
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            self.cursor.executemany(sql, batch)
+            self.commit()
+
+    def reset_sequences(self, tables):
+        """PostgreSQL: id вставлены явно - сдвинуть последовательности на max(id)"""
+        if self.dialect != 'postgresql':
+            return
+        for table in tables:
+            self.cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                f"COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM {table}"
+            )
+        self.commit()
+
+    def close(self):
+        self.cursor.close()
+        self.connection.close()
+
+
+class WeightedPicker:
+    """Выбор id по весам за O(log n); hi ограничивает выбор первыми hi элементами"""
+
+    def __init__(self, ids, weights):
+        self.ids = list(ids)
+        self.cumulative = list(accumulate(weights))
+
+    def pick(self, rnd: random.Random, hi: int = None) -> int:
+        hi = len(self.ids) if hi is None else max(1, min(hi, len(self.ids)))
+        index = bisect_right(self.cumulative, rnd.random() * self.cumulative[hi - 1], 0, hi - 1)
+        return self.ids[index]
+
+
+class DatasetGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.now = args.now
+        self.start = self.now - timedelta(days=args.days)
+        self.span = (self.now - self.start).total_seconds()
+        self.bonus_balance = {}
+
+    def rnd(self, name: str) -> random.Random:
+        # Отдельный генератор на таблицу: изменение одной не сдвигает остальные
+        return random.Random(f'{self.args.seed}:{name}')
+
+    # ---------- Справочники ----------
+
+    def categories(self):
+        for i in range(self.args.categories):
+            name = CATEGORY_NAMES[i % len(CATEGORY_NAMES)]
+            if i >= len(CATEGORY_NAMES):
+                name = f'{name} {i // len(CATEGORY_NAMES) + 1}'
+            yield (i + 1, name, i, True)
+
+    def products(self):
+        rnd = self.rnd('products')
+        self.product_prices = {}
+        for i in range(self.args.products):
+            product_id = i + 1
+            price = float(rnd.randint(20, 500) * 10)
+            self.product_prices[product_id] = price
+            created_at = self.start + timedelta(seconds=rnd.uniform(0, self.span * 0.8))
+            yield (
+                product_id,
+                f'{rnd.choice(PRODUCT_WORDS)} {product_id}',
+                rnd.randint(1, self.args.categories),
+                price,
+                f'{rnd.choice([50, 70, 100, 150, 250])} г',
+                rnd.randint(0, 1000),
+                rnd.random() > 0.05,
+                0,
+                created_at,
+                created_at,
+            )
+        # Популярность по Ципфу, порядок рангов случайный
+        ranks = list(range(1, self.args.products + 1))
+        rnd.shuffle(ranks)
+        self.product_picker = WeightedPicker(range(1, self.args.products + 1), [1 / r ** 0.9 for r in ranks])
+
+    def sales_reps(self):
+        for i in range(self.args.sales_reps):
+            yield (i + 1, f'Торговый {i + 1}', 200_000_000 + i, f'+7702{i:07d}', True)
+
+    def staff_users(self):
+        # Сначала администратор, затем менеджеры
+        yield (1, 100_000_001, 'admin', None, 'admin', True, self.start, self.now)
+        for i in range(self.args.managers):
+            user_id = i + 2
+            yield (user_id, 100_000_000 + user_id, f'manager{i + 1}', None, 'manager', True, self.start, self.now)
+
+    @property
+    def first_client_user_id(self) -> int:
+        return self.args.managers + 2
+
+    # ---------- Клиенты ----------
+
+    def _client_created_at(self, index: int) -> datetime:
+        # Регистраций больше в начале периода, но они идут до конца
+        share = (index / max(self.args.clients - 1, 1)) ** 2
+        return self.start + timedelta(seconds=self.span * share)
+
+    def client_users(self):
+        rnd = self.rnd('users')
+        for i in range(self.args.clients):
+            user_id = self.first_client_user_id + i
+            created_at = self._client_created_at(i)
+            yield (
+                user_id, 100_000_000 + user_id, f'client{i + 1}' if rnd.random() > 0.3 else None,
+                f'+7701{i:07d}', 'client', True, created_at,
+                created_at + timedelta(seconds=rnd.uniform(0, (self.now - created_at).total_seconds())),
+            )
+
+    def clients(self):
+        rnd = self.rnd('clients')
+        self.client_status = {}
+        self.client_manager = {}
+        weights = []
+        for i in range(self.args.clients):
+            client_id = i + 1
+            created_at = self._client_created_at(i)
+            roll = rnd.random()
+            status = 'active' if roll < 0.9 else ('pending' if roll < 0.97 else 'blocked')
+            manager_id = rnd.randint(2, self.args.managers + 1) if self.args.managers and rnd.random() < 0.6 else None
+            sales_rep_id = rnd.randint(1, self.args.sales_reps) if self.args.sales_reps and rnd.random() < 0.9 else None
+            self.client_status[client_id] = status
+            self.client_manager[client_id] = manager_id
+            # Активность по Парето; неактивные клиенты не заказывают
+            weights.append(rnd.paretovariate(1.5) if status == 'active' else 0.0)
+            if status == 'active':
+                self.bonus_balance[client_id] = float(WELCOME_BONUS)
+            yield (
+                client_id, self.first_client_user_id + i,
+                f'{rnd.choice(COMPANY_FORMS)} Магазин {client_id}',
+                f'{rnd.choice(CITIES)}, ул. {rnd.randint(1, 300)}',
+                f'{rnd.randint(10 ** 11, 10 ** 12 - 1)}',
+                f'+7701{i:07d}',
+                manager_id, status, 0.0, 0.0, 5_000_000.0, 0.0, 0, None, sales_rep_id, True,
+                created_at, created_at + timedelta(hours=rnd.randint(1, 48)) if status == 'active' else None,
+            )
+        if not any(weights):
+            weights = [1.0] * len(weights)
+        self.client_picker = WeightedPicker(range(1, self.args.clients + 1), weights)
+
+    # ---------- Заказы ----------
+
+    def orders(self, loader):
+        """Заказы, позиции и бонусные операции - пачками, в порядке внешних ключей"""
+        args = self.args
+        rnd = self.rnd('orders')
+        bonus_id = 1
+        item_id = 1
+        order_rows, item_rows, bonus_rows = [], [], []
+
+        for client_id, status in self.client_status.items():
+            if status == 'active':
+                created_at = self._client_created_at(client_id - 1)
+                bonus_rows.append((
+                    bonus_id, client_id, float(WELCOME_BONUS), 'earn', None, 'Приветственный бонус', None, created_at
+                ))
+                bonus_id += 1
+
+        for order_id in range(1, args.orders + 1):
+            # id растут вместе со временем, как в живой базе
+            offset = self.span * (order_id - 0.5) / args.orders
+            created_at = self.start + timedelta(seconds=offset + rnd.uniform(-30, 30))
+            # Клиент, зарегистрированный к моменту заказа
+            registered = int(args.clients * (offset / self.span) ** 0.5) + 1
+            client_id = self.client_picker.pick(rnd, registered)
+
+            total = 0.0
+            lines = min(1 + int(rnd.expovariate(1 / 3)), args.max_items)
+            products = {self.product_picker.pick(rnd) for _ in range(lines)}
+            for product_id in products:
+                quantity = rnd.randint(1, 20)
+                price = self.product_prices[product_id]
+                item_rows.append((item_id, order_id, product_id, f'Товар {product_id}', quantity, price, price * quantity))
+                item_id += 1
+                total += price * quantity
+
+            age = self.now - created_at
+            if age > SETTLED_AFTER:
+                status = 'cancelled' if rnd.random() < CANCEL_RATE else 'delivered'
+            else:
+                status = rnd.choice(ACTIVE_STATUSES)
+
+            balance = self.bonus_balance.get(client_id, 0.0)
+            bonus_used = 0.0
+            if balance > 0 and rnd.random() < BONUS_SPEND_RATE:
+                bonus_used = float(int(min(balance, total * BONUS_MAX_USE_PERCENT / 100)))
+            final_total = total - bonus_used
+
+            if bonus_used:
+                balance -= bonus_used
+                bonus_rows.append((
+                    bonus_id, client_id, -bonus_used, 'spend', order_id, f'Оплата заказа #{order_id}', None, created_at
+                ))
+                bonus_id += 1
+            if status == 'delivered':
+                earned = float(int(final_total * BONUS_EARN_PERCENT / 100))
+                if earned:
+                    balance += earned
+                    bonus_rows.append((
+                        bonus_id, client_id, earned, 'earn', order_id, f'Кешбэк за заказ #{order_id}',
+                        created_at + timedelta(days=365), created_at
+                    ))
+                    bonus_id += 1
+            self.bonus_balance[client_id] = balance
+
+            order_rows.append((
+                order_id, f'ORD-{order_id:07d}', client_id, self.client_manager.get(client_id),
+                total, bonus_used, 0.0, final_total, status,
+                f'{CITIES[client_id % len(CITIES)]}, ул. {client_id % 300 + 1}',
+                created_at, created_at,
+                created_at + timedelta(hours=rnd.randint(12, 48)) if status == 'delivered' else None,
+            ))
+
+            if len(order_rows) >= loader.batch_size:
+                self._flush_orders(loader, order_rows, item_rows, bonus_rows)
+
+        self._flush_orders(loader, order_rows, item_rows, bonus_rows)
+        return item_id - 1, bonus_id - 1
+
+    @staticmethod
+    def _flush_orders(loader, order_rows, item_rows, bonus_rows):
+        loader.write('orders', ORDER_COLUMNS, order_rows)
+        loader.write('order_items', ORDER_ITEM_COLUMNS, item_rows)
+        loader.write('bonus_transactions', BONUS_COLUMNS, bonus_rows)
+        loader.commit()
+        order_rows.clear()
+        item_rows.clear()
+        bonus_rows.clear()
+
+    # ---------- Аналитика и AI ----------
+
+    def analytics_events(self):
+        rnd = self.rnd('analytics')
+        event_id = 1
+        for i in range(self.args.clients):
+            client_id = i + 1
+            user_id = self.first_client_user_id + i
+            telegram_id = 100_000_000 + user_id
+            created_at = self._client_created_at(i)
+            funnel = ['start', 'registration_started', 'registration_completed']
+            if self.client_status[client_id] == 'active':
+                funnel.append('client_approved')
+            extra = max(0, int(rnd.expovariate(1 / max(self.args.events_per_client - len(funnel), 1))))
+            timestamps = [created_at + timedelta(minutes=step) for step in range(len(funnel))]
+            remaining = max((self.now - created_at).total_seconds(), 1)
+            timestamps += sorted(created_at + timedelta(seconds=rnd.uniform(0, remaining)) for _ in range(extra))
+            for event_type, at in zip(funnel + ['start'] * extra, timestamps):
+                yield (event_id, event_type, telegram_id, f'client{i + 1}', json.dumps({'source': 'generator'}), at)
+                event_id += 1
+
+    def ai_conversations(self):
+        rnd = self.rnd('ai_conversations')
+        for conversation_id in range(1, self.args.ai_conversations + 1):
+            offset = rnd.uniform(0, self.span)
+            registered = int(self.args.clients * (offset / self.span) ** 0.5) + 1
+            yield (
+                conversation_id, self.client_picker.pick(rnd, registered),
+                rnd.choice(AI_QUESTIONS), rnd.choice(AI_ANSWERS),
+                self.start + timedelta(seconds=offset),
+            )
+
+    def ai_proactive_messages(self):
+        rnd = self.rnd('ai_proactive')
+        for message_id in range(1, self.args.ai_proactive + 1):
+            offset = rnd.uniform(0, self.span)
+            registered = int(self.args.clients * (offset / self.span) ** 0.5) + 1
+            was_read = rnd.random() < 0.7
+            yield (
+                message_id, self.client_picker.pick(rnd, registered), rnd.choice(PROACTIVE_REASONS), None,
+                'Добрый день! Не пора ли пополнить запас снеков?', self.start + timedelta(seconds=offset),
+                was_read, was_read and rnd.random() < 0.3, False, None,
+            )
+
+
+CATEGORY_COLUMNS = ('id', 'name', 'sort_order', 'is_active')
+PRODUCT_COLUMNS = (
+    'id', 'name', 'category_id', 'price', 'weight', 'stock', 'is_active', 'sort_order', 'created_at', 'updated_at'
+)
+SALES_REP_COLUMNS = ('id', 'name', 'telegram_id', 'phone', 'is_active')
+USER_COLUMNS = ('id', 'telegram_id', 'username', 'phone', 'role', 'is_active', 'created_at', 'last_active')
+CLIENT_COLUMNS = (
+    'id', 'user_id', 'company_name', 'address', 'bin_iin', 'contact_phone', 'manager_id', 'status',
+    'discount_percent', 'bonus_balance', 'credit_limit', 'debt', 'payment_delay_days', 'delivery_zone',
+    'sales_rep_id', 'first_order_discount_used', 'created_at', 'approved_at',
+)
+ORDER_COLUMNS = (
+    'id', 'order_number', 'client_id', 'manager_id', 'total', 'bonus_used', 'discount_amount', 'final_total',
+    'status', 'delivery_address', 'created_at', 'updated_at', 'delivered_at',
+)
+ORDER_ITEM_COLUMNS = ('id', 'order_id', 'product_id', 'product_name', 'quantity', 'price', 'subtotal')
+BONUS_COLUMNS = ('id', 'client_id', 'amount', 'type', 'order_id', 'description', 'expires_at', 'created_at')
+ANALYTICS_COLUMNS = ('id', 'event_type', 'telegram_id', 'username', 'event_metadata', 'created_at')
+AI_CONVERSATION_COLUMNS = ('id', 'client_id', 'user_message', 'ai_response', 'created_at')
+AI_PROACTIVE_COLUMNS = (
+    'id', 'client_id', 'reason', 'ai_analysis', 'message_text', 'sent_at',
+    'was_read', 'client_responded', 'resulted_in_order', 'order_id',
+)
+
+SEQUENCE_TABLES = (
+    'categories', 'products', 'sales_representatives', 'users', 'clients', 'orders', 'order_items',
+    'bonus_transactions', 'analytics_events', 'ai_conversations', 'ai_proactive_messages',
+)
+
+
+def _prepare_schema(engine, reset: bool):
+    from sqlalchemy import select, text
+    from database import Base
+    from models.user import User
+    # Регистрируем все таблицы в Base.metadata
+    from models.ai_log import AIConversation, AIProactiveMessage  # noqa: F401
+    from models.analytics import AnalyticsEvent, ClientMetrics, SalesRollup, ClientProductAffinity  # noqa: F401
+    from models.bonus import BonusTransaction  # noqa: F401
+    from models.idempotency import IdempotencyKey  # noqa: F401
+    from models.order import Order, OrderItem  # noqa: F401
+    from models.product import Product, Category  # noqa: F401
+    from models.settings import SystemSetting  # noqa: F401
+
+    if reset:
+        with engine.begin() as conn:
+            if engine.dialect.name == 'sqlite':
+                conn.execute(text('DROP TABLE IF EXISTS clients_fts'))
+        Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+    with engine.connect() as conn:
+        if conn.execute(select(User.id).limit(1)).first() is not None:
+            raise SystemExit('База не пуста: используйте пустую БД или --reset')
+
+
+def _build_derived(engine, skip_aggregates: bool):
+    from sqlalchemy import text
+    from services import client_metrics, product_affinity, sales_rollup
+    from services.client_search import ensure_search_index
+    from services.order_numbers import ensure_counter
+
+    if not skip_aggregates:
+        for name, build in (
+            ('sales_rollup', sales_rollup.rebuild),
+            ('client_metrics', client_metrics.reconcile),
+            ('client_product_affinity', product_affinity.rebuild),
+        ):
+            started = time.perf_counter()
+            with engine.begin() as conn:
+                build(conn)
+            logger.info(f"📊 {name}: {time.perf_counter() - started:.1f}s")
+
+    ensure_search_index(engine)
+    # Номера заказов ORD-{id} заняты - счётчик продолжает после них
+    ensure_counter(engine)
+    with engine.begin() as conn:
+        conn.execute(text('ANALYZE'))
+
+
+def main(args):
+    logging.basicConfig(level=logging.INFO, format='%(levelname)s:%(name)s:%(message)s')
+    database_url = prepare_environment(args.database_url or os.getenv('DATABASE_URL'))
+    from database import engine
+
+    _prepare_schema(engine, args.reset)
+    generator = DatasetGenerator(args)
+    loader = BulkLoader(engine, args.batch)
+    counts = {}
+    started = time.perf_counter()
+
+    def step(name, columns, rows):
+        step_started = time.perf_counter()
+        counts[name] = loader.load(name, columns, rows)
+        logger.info(f"✅ {name}: {counts[name]} rows, {time.perf_counter() - step_started:.1f}s")
+
+    try:
+        step('categories', CATEGORY_COLUMNS, generator.categories())
+        step('products', PRODUCT_COLUMNS, generator.products())
+        step('sales_representatives', SALES_REP_COLUMNS, generator.sales_reps())
+        step('users', USER_COLUMNS, generator.staff_users())
+        counts['users'] += loader.load('users', USER_COLUMNS, generator.client_users())
+        step('clients', CLIENT_COLUMNS, generator.clients())
+
+        orders_started = time.perf_counter()
+        counts['order_items'], counts['bonus_transactions'] = generator.orders(loader)
+        counts['orders'] = args.orders
+        logger.info(
+            f"✅ orders: {args.orders} orders, {counts['order_items']} items, "
+            f"{counts['bonus_transactions']} bonus transactions, {time.perf_counter() - orders_started:.1f}s"
+        )
+
+        # Баланс бонусов = сумма операций клиента
+        loader.update(
+            'UPDATE clients SET bonus_balance = ? WHERE id = ?',
+            ((balance, client_id) for client_id, balance in generator.bonus_balance.items())
+        )
+
+        step('analytics_events', ANALYTICS_COLUMNS, generator.analytics_events())
+        step('ai_conversations', AI_CONVERSATION_COLUMNS, generator.ai_conversations())
+        step('ai_proactive_messages', AI_PROACTIVE_COLUMNS, generator.ai_proactive_messages())
+        loader.reset_sequences(SEQUENCE_TABLES)
+    finally:
+        loader.close()
+
+    _build_derived(engine, args.skip_aggregates)
+
+    result = {
+        'database': database_url.split(':', 1)[0],
+        'seed': args.seed,
+        'rows': counts,
+        'elapsed_s': round(time.perf_counter() - started, 1),
+    }
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return result
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='По умолчанию DATABASE_URL, иначе временный SQLite')
+    parser.add_argument('--reset', action='store_true', help='Удалить и создать таблицы заново')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--days', type=int, default=730, help='Период истории заказов')
+    parser.add_argument('--now', type=datetime.fromisoformat,
+                        default=datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0),
+                        help='Конец периода (ISO); по умолчанию начало текущих суток UTC')
+    parser.add_argument('--categories', type=int, default=40)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--sales-reps', type=int, default=200)
+    parser.add_argument('--managers', type=int, default=20)
+    parser.add_argument('--clients', type=int, default=50000)
+    parser.add_argument('--orders', type=int, default=2000000)
+    parser.add_argument('--max-items', type=int, default=15, help='Максимум позиций в заказе')
+    parser.add_argument('--events-per-client', type=int, default=8, help='Событий аналитики на клиента в среднем')
+    parser.add_argument('--ai-conversations', type=int, default=200000)
+    parser.add_argument('--ai-proactive', type=int, default=20000)
+    parser.add_argument('--batch', type=int, default=50000, help='Строк в одной транзакции')
+    parser.add_argument('--skip-aggregates', action='store_true', help='Не собирать агрегаты после загрузки')
+    return parser
+
+
+if __name__ == '__main__':
+    main(build_parser().parse_args())
@@ -0,0 +1,154 @@
+"""
+Стоимость гидратации ORM на списках API
+
+Для каждого списка сравнивает два способа собрать ответ в одной сессии:
+
+    orm         - загрузить сущности (db.query(Model)) и скопировать поля в dict,
+                  как обработчики делали раньше
+    projection  - выбрать только нужные колонки (services/read_models)
+
+Списки: товары админки, категории, страница клиентов, страница заказов
+(с именем клиента), данные снимка каталога. Каждая итерация - новая
+сессия, чтобы identity map не переиспользовался между замерами.
+
+Запуск из каталога app:
+    python -m benchmarks.hydration --products 3000 --clients 2000 --iterations 50
+"""
+import argparse
+import json
+import time
+
+from benchmarks.common import prepare_environment, seed_database, summarize
+
+
+def orm_cases(page: int) -> dict:
+    from sqlalchemy.orm import joinedload
+
+    from models.order import Order
+    from models.product import Category, Product
+    from models.user import Client
+    from services.photo_service import photo_url
+
+    def products(db):
+        return [{
+            'id': p.id, 'name': p.name, 'price': float(p.price), 'stock': p.stock,
+            'category_id': p.category_id, 'is_active': p.is_active, 'photo_file_id': p.photo_file_id
+        } for p in db.query(Product).order_by(Product.name).all()]
+
+    def categories(db):
+        return [{
+            'id': c.id, 'name': c.name, 'is_active': c.is_active, 'sort_order': c.sort_order
+        } for c in db.query(Category).order_by(Category.sort_order).all()]
+
+    def clients(db):
+        rows = db.query(Client).order_by(Client.created_at.desc(), Client.id.desc()).limit(page).all()
+        return [{
+            'id': c.id, 'company_name': c.company_name, 'bin_iin': c.bin_iin,
+            'contact_phone': c.contact_phone, 'address': c.address, 'status': c.status,
+            'sales_rep_id': c.sales_rep_id, 'bonus_balance': float(c.bonus_balance or 0),
+            'debt': float(c.debt or 0), 'first_order_discount_used': c.first_order_discount_used,
+            'created_at': c.created_at.isoformat() if c.created_at else None
+        } for c in rows]
+
+    def orders(db):
+        rows = (
+            db.query(Order).options(joinedload(Order.client))
+            .order_by(Order.created_at.desc(), Order.id.desc()).limit(page).all()
+        )
+        return [{
+            'id': o.id, 'client_id': o.client_id,
+            'client_name': o.client.company_name if o.client else 'Неизвестно',
+            'total_amount': float(o.total), 'discount_amount': float(o.discount_amount),
+            'status': o.status, 'created_at': o.created_at.isoformat() if o.created_at else None
+        } for o in rows]
+
+    def catalog(db):
+        categories = db.query(Category).filter(Category.is_active == True).order_by(Category.sort_order).all()
+        products = db.query(Product).filter(Product.is_active == True, Product.stock > 0).all()
+        return {
+            'categories': [{'id': c.id, 'name': c.name} for c in categories],
+            'products': [{
+                'id': p.id, 'name': p.name, 'price': float(p.price), 'stock': p.stock,
+                'category_id': p.category_id,
+                'photo_url': photo_url(p.photo_file_id, p.photo_hash) if p.photo_file_id else None
+            } for p in products]
+        }
+
+    return {'products': products, 'categories': categories, 'clients': clients, 'orders': orders, 'catalog': catalog}
+
+
+def projection_cases(page: int) -> dict:
+    from models.order import Order
+    from models.user import Client
+    from services import read_models
+    from services.photo_service import photo_url
+
+    def clients(db):
+        query = read_models.client_rows(db.query(Client))
+        return read_models.as_dicts(query.order_by(Client.created_at.desc(), Client.id.desc()).limit(page).all())
+
+    def orders(db):
+        query = read_models.order_rows(db)
+        return read_models.as_dicts(query.order_by(Order.created_at.desc(), Order.id.desc()).limit(page).all())
+
+    def catalog(db):
+        categories, products = read_models.catalog_rows(db)
+        return {
+            'categories': [{'id': c.id, 'name': c.name} for c in categories],
+            'products': [{
+                'id': p.id, 'name': p.name, 'price': p.price, 'stock': p.stock,
+                'category_id': p.category_id,
+                'photo_url': photo_url(p.photo_file_id, p.photo_hash) if p.photo_file_id else None
+            } for p in products]
+        }
+
+    return {
+        'products': read_models.product_list,
+        'categories': read_models.category_list,
+        'clients': clients,
+        'orders': orders,
+        'catalog': catalog,
+    }
+
+
+def measure(func, iterations: int):
+    from database import SessionLocal
+
+    latencies = []
+    rows = 0
+    for _ in range(iterations):
+        db = SessionLocal()
+        try:
+            started = time.perf_counter()
+            result = func(db)
+            latencies.append(time.perf_counter() - started)
+        finally:
+            db.close()
+        rows = len(result['products']) if isinstance(result, dict) else len(result)
+    return {**summarize(latencies), 'rows': rows}
+
+
+def main(args):
+    prepare_environment(args.database_url)
+    seed_database(products=args.products, clients=args.clients, orders=args.orders)
+
+    variants = {'orm': orm_cases(args.page_size), 'projection': projection_cases(args.page_size)}
+    results = {}
+    for name in variants['orm']:
+        results[name] = {variant: measure(cases[name], args.iterations) for variant, cases in variants.items()}
+        orm_p50 = results[name]['orm']['p50_ms']
+        projection_p50 = results[name]['projection']['p50_ms']
+        results[name]['speedup_p50'] = round(orm_p50 / projection_p50, 2) if projection_p50 else None
+
+    print(json.dumps({'params': vars(args), 'results': results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='По умолчанию временный SQLite')
+    parser.add_argument('--iterations', type=int, default=30, help='Замеров каждого списка')
+    parser.add_argument('--page-size', type=int, default=200, help='Строк на странице клиентов/заказов')
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--orders', type=int, default=5000)
+    main(parser.parse_args())
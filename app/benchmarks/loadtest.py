@@ -0,0 +1,242 @@
+"""
+Нагрузочный тест aiohttp API на смешанных сценариях
+
+Поднимает api_server.create_app() на локальном порту поверх заполненной БД
+(временный SQLite или --database-url) и запускает N виртуальных
+пользователей. Каждый пользователь в цикле выбирает сценарий по весам:
+
+    webapp   - открыть WebApp (/api/catalog/me), каталог, оформить заказ
+    admin    - обновление админки: дашборд, последние заказы, клиенты
+    history  - пролистать историю заказов клиента и список заказов в админке
+               по курсору X-Next-Cursor
+
+Результат - JSON с пропускной способностью и p50/p95/p99 по каждому
+эндпоинту (шаблон пути), чтобы сравнивать прогоны между коммитами.
+Уведомления в Telegram при оформлении заказа отключены (--notify включает),
+rate limit тоже (--rate-limit включает): пользователей мало, а запросов много.
+
+Запуск из каталога app:
+    python -m benchmarks.loadtest --concurrency 16 --duration 30 --output before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from collections import defaultdict
+
+from benchmarks.common import prepare_environment, seed_database, summarize
+
+SCENARIOS = ('webapp', 'admin', 'history')
+
+
+class Recorder:
+    """Латентности и статусы по эндпоинтам"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.scenarios = defaultdict(int)
+        self.enabled = True
+
+    async def request(self, session, method: str, url: str, endpoint: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            async with session.request(method, url, **kwargs) as response:
+                body = await response.read()
+                status = response.status
+                headers = response.headers
+        except Exception as e:
+            body, status, headers = b'', type(e).__name__, {}
+        if self.enabled:
+            self.latencies[endpoint].append(time.perf_counter() - started)
+            self.statuses[endpoint][str(status)] += 1
+        return status, headers, body
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            statuses = dict(self.statuses[endpoint])
+            errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+            endpoints[endpoint] = {
+                **summarize(self.latencies[endpoint]),
+                'rps': round(len(self.latencies[endpoint]) / elapsed, 2),
+                'errors': errors,
+                'statuses': statuses,
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            'elapsed_s': round(elapsed, 2),
+            'requests': total,
+            'throughput_rps': round(total / elapsed, 2) if elapsed else 0.0,
+            'scenarios': dict(self.scenarios),
+            'endpoints': endpoints,
+        }
+
+
+class VirtualUser:
+    def __init__(self, base_url: str, recorder: Recorder, dataset: dict, rnd: random.Random, args):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.dataset = dataset
+        self.rnd = rnd
+        self.args = args
+        self.telegram_id = rnd.choice(dataset['telegram_ids'])
+        # Rate limit различает клиентов по адресу - у каждого пользователя свой, как за прокси
+        address = f'10.{self.telegram_id >> 16 & 255}.{self.telegram_id >> 8 & 255}.{self.telegram_id & 255}'
+        self.headers = {'X-Forwarded-For': address}
+
+    async def _get(self, session, path: str, endpoint: str, **kwargs):
+        return await self.recorder.request(
+            session, 'GET', self.base_url + path, endpoint, headers=self.headers, **kwargs
+        )
+
+    async def webapp(self, session):
+        await self._get(session, f'/api/catalog/me?user_id={self.telegram_id}', 'GET /api/catalog/me')
+        await self._get(session, '/api/catalog', 'GET /api/catalog')
+        if self.rnd.random() >= self.args.checkout_ratio:
+            return
+        products = self.rnd.sample(self.dataset['product_ids'], self.rnd.randint(3, 8))
+        cart = {str(product_id): self.rnd.randint(3, 10) for product_id in products}
+        await self.recorder.request(
+            session, 'POST', self.base_url + '/api/orders/create', 'POST /api/orders/create',
+            json={'user_id': self.telegram_id, 'cart': cart, 'bonus_used': 0, 'payment_method': 'cash'},
+            headers=self.headers
+        )
+
+    async def admin(self, session):
+        await self._get(session, '/api/admin/stats/dashboard?days=30', 'GET /api/admin/stats/dashboard')
+        await self._get(session, '/api/admin/orders?limit=50', 'GET /api/admin/orders')
+        await self._get(session, '/api/admin/clients?limit=50', 'GET /api/admin/clients')
+
+    async def history(self, session):
+        await self._scroll(
+            session, f'/api/client/orders?user_id={self.telegram_id}&limit=10', 'GET /api/client/orders'
+        )
+        await self._scroll(session, '/api/admin/orders?limit=50', 'GET /api/admin/orders (scroll)')
+
+    async def _scroll(self, session, path: str, endpoint: str):
+        cursor = None
+        for _ in range(self.args.scroll_pages):
+            url = path + (f'&cursor={cursor}' if cursor else '')
+            status, headers, _ = await self._get(session, url, endpoint)
+            cursor = headers.get('X-Next-Cursor')
+            if status != 200 or not cursor:
+                return
+
+    async def run(self, session, deadline: float, weights: dict):
+        names = list(weights)
+        values = [weights[name] for name in names]
+        while time.perf_counter() < deadline:
+            scenario = self.rnd.choices(names, values)[0]
+            if self.recorder.enabled:
+                self.recorder.scenarios[scenario] += 1
+            await getattr(self, scenario)(session)
+            if self.args.think_time:
+                await asyncio.sleep(self.rnd.uniform(0, self.args.think_time))
+
+
+def parse_mix(value: str) -> dict:
+    """'webapp=6,admin=1,history=3' -> {'webapp': 6.0, ...}"""
+    weights = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario: {name} (expected {', '.join(SCENARIOS)})")
+        weights[name] = float(weight or 1)
+    return {name: weight for name, weight in weights.items() if weight > 0}
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return None
+
+
+def _silence_notifications():
+    """Оформление заказа шлёт уведомление админу через Bot API - в тесте не нужно"""
+    import bot
+
+    async def send_message(*args, **kwargs):
+        return None
+
+    bot.bot.send_message = send_message
+
+
+async def main(args):
+    database_url = prepare_environment(args.database_url)
+    dataset = seed_database(products=args.products, clients=args.clients, orders=args.orders, seed=args.seed)
+
+    # Бюджеты services/admission читаются при импорте api_server
+    os.environ['RATE_LIMIT_ENABLED'] = 'true' if args.rate_limit else 'false'
+    os.environ['RATE_LIMIT_PROXY_HOPS'] = '1'
+    import api_server
+    if not args.notify:
+        _silence_notifications()
+
+    from aiohttp import ClientSession, TCPConnector
+    from aiohttp.test_utils import TestServer
+
+    server = TestServer(api_server.create_app())
+    await server.start_server()
+    base_url = str(server.make_url('')).rstrip('/')
+
+    recorder = Recorder()
+    rnd = random.Random(args.seed)
+    users = [
+        VirtualUser(base_url, recorder, dataset, random.Random(rnd.random()), args)
+        for _ in range(args.concurrency)
+    ]
+    try:
+        async with ClientSession(connector=TCPConnector(limit=args.concurrency)) as session:
+            if args.warmup:
+                recorder.enabled = False
+                deadline = time.perf_counter() + args.warmup
+                await asyncio.gather(*(user.run(session, deadline, args.mix) for user in users))
+                recorder.enabled = True
+
+            started = time.perf_counter()
+            deadline = started + args.duration
+            await asyncio.gather(*(user.run(session, deadline, args.mix) for user in users))
+            elapsed = time.perf_counter() - started
+    finally:
+        await server.close()
+
+    result = {
+        'revision': git_revision(),
+        'database': database_url.split(':', 1)[0],
+        'params': {**vars(args), 'mix': args.mix},
+        'results': recorder.report(elapsed),
+    }
+    output = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='По умолчанию временный SQLite')
+    parser.add_argument('--concurrency', type=int, default=16, help='Виртуальных пользователей')
+    parser.add_argument('--duration', type=float, default=30.0, help='Секунд замера')
+    parser.add_argument('--warmup', type=float, default=3.0, help='Секунд прогрева (не учитываются)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix('webapp=6,admin=1,history=3'),
+                        help='Веса сценариев: webapp=6,admin=1,history=3')
+    parser.add_argument('--checkout-ratio', type=float, default=0.3, help='Доля открытий WebApp с заказом')
+    parser.add_argument('--scroll-pages', type=int, default=4, help='Страниц истории за сценарий')
+    parser.add_argument('--think-time', type=float, default=0.0, help='Пауза пользователя, до N секунд')
+    parser.add_argument('--products', type=int, default=300)
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--orders', type=int, default=30000)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--notify', action='store_true', help='Отправлять уведомления о заказах в Telegram')
+    parser.add_argument('--rate-limit', action='store_true', help='Включить rate limit и сброс нагрузки API')
+    parser.add_argument('--output', default=None, help='Сохранить JSON в файл')
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,98 @@
+"""
+Кодирование ответов API: стандартный json, orjson и MessagePack
+
+Собирает настоящие ответы (снимок каталога, список заказов админки,
+история заказов клиента, дашборд) через api_server.create_app() поверх
+заполненной БД и кодирует каждый всеми доступными бэкендами
+services/serialization. Считает время одного кодирования и размер тела.
+
+Запуск из каталога app:
+    python -m benchmarks.serialization --products 1000 --iterations 500
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from benchmarks.common import percentile, prepare_environment, seed_database
+
+
+async def collect_payloads(args, dataset) -> dict:
+    """Ответы эндпоинтов в виде Python-объектов (как их отдают обработчики)"""
+    import api_server
+    from aiohttp.test_utils import TestClient, TestServer
+
+    telegram_id = dataset['telegram_ids'][0]
+    paths = {
+        'catalog': '/api/catalog',
+        'admin_orders': f'/api/admin/orders?limit={args.page_size}',
+        'client_orders': f'/api/client/orders?user_id={telegram_id}&limit={args.page_size}',
+        'dashboard': '/api/admin/stats/dashboard?days=30',
+    }
+    client = TestClient(TestServer(api_server.create_app()))
+    await client.start_server()
+    try:
+        payloads = {}
+        for name, path in paths.items():
+            response = await client.get(path, headers={'Accept': 'application/json'})
+            if response.status != 200:
+                raise RuntimeError(f"{path}: HTTP {response.status}")
+            payloads[name] = json.loads(await response.read())
+        return payloads
+    finally:
+        await client.close()
+
+
+def backends() -> dict:
+    from services import serialization
+
+    available = {'json': serialization._stdlib_dumps}
+    if serialization.orjson is not None:
+        available['orjson'] = lambda data: serialization.orjson.dumps(
+            data, default=serialization._default, option=serialization.ORJSON_OPTIONS
+        )
+    if serialization.msgpack is not None:
+        available['msgpack'] = serialization.packb
+    return available
+
+
+def measure(encode, payload, iterations: int) -> dict:
+    """Время одного кодирования в микросекундах (ответы маленькие - ms мало)"""
+    latencies = []
+    body = encode(payload)
+    for _ in range(iterations):
+        started = time.perf_counter()
+        encode(payload)
+        latencies.append((time.perf_counter() - started) * 1_000_000)
+    return {
+        'p50_us': round(percentile(latencies, 50), 1),
+        'p95_us': round(percentile(latencies, 95), 1),
+        'p99_us': round(percentile(latencies, 99), 1),
+        'bytes': len(body),
+    }
+
+
+def main(args):
+    prepare_environment(args.database_url)
+    dataset = seed_database(products=args.products, clients=args.clients, orders=args.orders)
+    payloads = asyncio.run(collect_payloads(args, dataset))
+
+    results = {}
+    for name, payload in payloads.items():
+        results[name] = {backend: measure(encode, payload, args.iterations) for backend, encode in backends().items()}
+        baseline = results[name]['json']['p50_us']
+        for stats in results[name].values():
+            stats['speedup_p50'] = round(baseline / stats['p50_us'], 2) if stats['p50_us'] else None
+
+    print(json.dumps({'params': vars(args), 'results': results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', default=None, help='По умолчанию временный SQLite')
+    parser.add_argument('--iterations', type=int, default=300, help='Кодирований каждого ответа')
+    parser.add_argument('--page-size', type=int, default=100, help='Заказов на странице списков')
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--orders', type=int, default=3000)
+    main(parser.parse_args())
@@ -23,19 +23,22 @@ from aiogram.types import (
     ReplyKeyboardRemove,
     WebAppInfo
 )
-from sqlalchemy import create_engine, BigInteger, func
+from sqlalchemy import BigInteger, func
 from sqlalchemy.orm import sessionmaker
 
 # Добавляем путь к модулям
 sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
 
-from database import Base, SessionLocal
+from database import Base, SessionLocal, engine
 from models.user import User, Client, SalesRepresentative
 from ai_agent import SalesAssistant
 from models.product import Product, Category
 from models.order import Order, OrderItem
 from models.bonus import BonusTransaction
 from models.analytics import AnalyticsEvent, ClientMetrics
+from services import client_metrics, order_events, product_affinity
+from services.order_numbers import order_numbers
+from middlewares.bot import QueryScopeMiddleware
 
 # Настройка логирования
 logging.basicConfig(
@@ -48,7 +51,6 @@ logger = logging.getLogger(__name__)
 from config import settings
 TOKEN = settings.BOT_TOKEN
 ADMIN_IDS = [int(x) for x in os.getenv("ADMIN_IDS", "").split(",") if x]
-DATABASE_URL = os.getenv("DATABASE_URL")
 WEBAPP_URL = os.getenv("WEBAPP_URL", "https://your-domain.com")
 ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "true").lower() == "true"
 
@@ -57,15 +59,15 @@ bot = Bot(token=TOKEN)
 storage = MemoryStorage()
 dp = Dispatcher(storage=storage)
 
+# Учёт SQL-запросов на апдейт (QUERY_DIAGNOSTICS: N+1 и медленные запросы)
+query_scope_middleware = QueryScopeMiddleware()
+dp.message.middleware(query_scope_middleware)
+dp.callback_query.middleware(query_scope_middleware)
+
 # AI ассистент
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 sales_assistant = SalesAssistant(api_key=ANTHROPIC_API_KEY) if ANTHROPIC_API_KEY else None
 
-# Инициализация БД
-# Принудительно используем psycopg3 драйвер
-if DATABASE_URL and DATABASE_URL.startswith('postgresql://'):
-    DATABASE_URL = DATABASE_URL.replace('postgresql://', 'postgresql+psycopg://')
-engine = create_engine(DATABASE_URL)
 
 # Модель торговых представителей
 from sqlalchemy import Column, Integer, String, Boolean
@@ -646,6 +648,7 @@ async def callback_approve_client(callback: types.CallbackQuery):
             description="Welcome бонус при регистрации"
         )
         db.add(bonus_transaction)
+        client_metrics.bonus_recorded(db, client.id, earned=5000.0)
         
         db.commit()
         
@@ -1161,11 +1164,8 @@ async def callback_repeat_order(callback: types.CallbackQuery):
             await callback.answer("❌ Заказ не найден", show_alert=True)
             return
 
-        import random
-        new_order_number = f"ORD-{random.randint(10000, 99999)}"
-        
         new_order = Order(
-            order_number=new_order_number,
+            order_number=order_numbers.next(),
             client_id=user.client.id,
             total=original_order.total,
             final_total=original_order.final_total,
@@ -1188,6 +1188,11 @@ async def callback_repeat_order(callback: types.CallbackQuery):
             db.add(new_item)
             items_text += f"• {item.product_name} x{item.quantity}\n"
 
+        order_events.order_placed(
+            db, new_order,
+            lines=[(item.product_id, item.quantity, item.price) for item in original_order.items],
+            client=user.client
+        )
         db.commit()
 
         await callback.message.answer(
@@ -1287,22 +1292,16 @@ async def callback_client_stats(callback: types.CallbackQuery):
 
         client = user.client
         
-        total_orders = db.query(Order).filter(Order.client_id == client.id).count()
-        
-        total_spent = db.query(func.sum(Order.final_total)).filter(
-            Order.client_id == client.id
-        ).scalar() or 0
-        
-        avg_order = total_spent / total_orders if total_orders > 0 else 0
+        metrics = client_metrics.summary(db, client.id)
+        total_orders = metrics['total_orders']
+        # Сколько клиент заплатил - за вычетом бонусов (final_total)
+        total_spent = metrics['total_paid']
+        avg_order = metrics['avg_paid']
         
-        top_products = db.query(
-            OrderItem.product_name,
-            func.sum(OrderItem.quantity).label('total_qty')
-        ).join(Order).filter(
-            Order.client_id == client.id
-        ).group_by(OrderItem.product_name).order_by(
-            func.sum(OrderItem.quantity).desc()
-        ).limit(3).all()
+        top_products = [
+            (product.name, qty)
+            for product, qty in product_affinity.favorites(db, client.id, limit=3, active_only=False)
+        ]
 
         text = (
             f"📊 <b>Ваша статистика</b>\n\n"
@@ -1,10 +1,22 @@
 """
 Конфигурация базы данных
+
+Единый engine и пул соединений на процесс: бот, aiohttp API и FastAPI
+импортируют engine/SessionLocal отсюда, а не создают свои.
 """
-from sqlalchemy import create_engine
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, exc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import os
+from sqlalchemy.pool import QueuePool
+
+import query_scope
+
+logger = logging.getLogger(__name__)
 
 # Для продакшена используем PostgreSQL, для локалки - SQLite
 DATABASE_URL = os.getenv(
@@ -20,14 +32,101 @@ if "postgres" in DATABASE_URL:
     # На всякий случай убираем дубликаты
     DATABASE_URL = DATABASE_URL.replace("postgresql+psycopg+psycopg://", "postgresql+psycopg://")
 
-# Настройки подключения
-if "postgresql" in DATABASE_URL:
-    engine = create_engine(DATABASE_URL)
-else:
-    engine = create_engine(
-        DATABASE_URL,
-        connect_args={"check_same_thread": False}
-    )
+# Настройки пула соединений
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+# Render/облачные прокси рвут простаивающие соединения - пересоздаём заранее
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+
+class PoolStats:
+    """Статистика ожидания соединений из пула"""
+
+    # Вес нового замера в скользящем среднем
+    EWMA_ALPHA = 0.2
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_ewma = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.acquisitions += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+            self.wait_ewma += self.EWMA_ALPHA * (seconds - self.wait_ewma)
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                'acquisitions': self.acquisitions,
+                'timeouts': self.timeouts,
+                'wait_total_ms': round(self.wait_total * 1000, 2),
+                'wait_avg_ms': round(self.wait_total / self.acquisitions * 1000, 3) if self.acquisitions else 0.0,
+                'wait_max_ms': round(self.wait_max * 1000, 2),
+                'wait_recent_ms': round(self.wait_ewma * 1000, 3)
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, который замеряет время получения соединения"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record_timeout()
+            raise
+        finally:
+            pool_stats.record_wait(time.perf_counter() - started)
+
+
+def create_db_engine(url: str = DATABASE_URL, **overrides):
+    """
+    Фабрика engine с настройками пула из окружения
+
+    Используется всеми точками входа; вызывать повторно нужно только
+    для отдельных инструментов (миграции, генераторы данных).
+    """
+    options = {
+        'pool_pre_ping': DB_POOL_PRE_PING,
+        'pool_recycle': DB_POOL_RECYCLE,
+    }
+
+    if url.startswith("sqlite"):
+        options['connect_args'] = {"check_same_thread": False}
+
+    # In-memory SQLite живёт в одном соединении - свой пул там не нужен
+    if ":memory:" not in url:
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+        )
+
+    options.update(overrides)
+    db_engine = create_engine(url, **options)
+    # Число запросов и время в БД на HTTP-запрос (метрики, диагностика)
+    query_scope.install(db_engine)
+    return db_engine
+
+
+engine = create_db_engine()
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
@@ -38,3 +137,36 @@ def get_db():
         yield db
     finally:
         db.close()
+
+def get_pool_stats() -> dict:
+    """Текущее состояние пула соединений (для подбора размеров)"""
+    pool = engine.pool
+    stats = {'pool_class': type(pool).__name__}
+
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'max_overflow': DB_MAX_OVERFLOW,
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+        })
+
+    stats.update(pool_stats.snapshot())
+    return stats
+
+def upsert_insert(db):
+    """
+    insert() с поддержкой ON CONFLICT для диалекта db
+
+    db - Session или Connection. None, если диалект не PostgreSQL/SQLite -
+    тогда вызывающий делает UPDATE + INSERT сам.
+    """
+    dialect = (db.get_bind() if hasattr(db, 'get_bind') else db).dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
@@ -0,0 +1,68 @@
+"""
+Выполнение синхронных запросов к БД вне event loop
+
+aiohttp-обработчики и бот работают в одном event loop, а SQLAlchemy-сессии
+синхронные. Любой медленный запрос (например, агрегаты дашборда) блокирует
+всех остальных. DBExecutor выносит работу с БД в ограниченный пул потоков:
+каждая задача получает собственную сессию, которая закрывается по завершении.
+
+Задача выполняется в копии contextvars вызывающего кода - так до неё
+доходит область учёта запросов (query_scope) текущего HTTP-запроса.
+"""
+import asyncio
+import contextvars
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class DBExecutor:
+    """Ограниченный пул потоков с сессией на задачу"""
+
+    def __init__(self, session_factory, max_workers: int = None):
+        if max_workers is None:
+            max_workers = int(os.getenv("DB_EXECUTOR_WORKERS", "10"))
+        self.session_factory = session_factory
+        self.max_workers = max_workers
+        self._executor = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="db"
+            )
+        return self._executor
+
+    def _run_with_session(self, func, args, kwargs):
+        db = self.session_factory()
+        try:
+            return func(db, *args, **kwargs)
+        finally:
+            db.close()
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Выполнить func(db, *args, **kwargs) в пуле потоков
+
+        При DB_EXECUTOR_WORKERS=0 функция выполняется прямо в event loop
+        (старое поведение, нужно для сравнения в бенчмарках).
+        """
+        if self.max_workers <= 0:
+            return self._run_with_session(func, args, kwargs)
+
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        return await loop.run_in_executor(
+            self.executor, context.run, self._run_with_session, func, args, kwargs
+        )
+
+    def shutdown(self, wait: bool = True):
+        """Остановить пул (при завершении приложения)"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+            logger.info("🛑 DB executor stopped")
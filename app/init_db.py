@@ -8,6 +8,8 @@ from models.order import Order, OrderItem
 from models.bonus import BonusTransaction
 from models.ai_log import AIConversation, AIProactiveMessage
 from models.ai_settings import AIAgentSettings
+from models.analytics import AnalyticsEvent, ClientMetrics, SalesRollup, ClientProductAffinity
+from models.idempotency import IdempotencyKey
 from datetime import time
 
 def init_database():
@@ -1,10 +1,15 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 # Убираем app. префиксы!
 from config import settings
 from api import router as api_router
+from services.settings_service import settings_service
+from services.startup import run_startup_hooks
+from database import engine
+from middlewares.metrics import MetricsMiddleware
+from services import metrics
 
 app = FastAPI(
     title="HappySnack Shop API",
@@ -23,6 +28,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Время ответа, статусы и SQL-запросы по роутам (/metrics)
+app.add_middleware(MetricsMiddleware)
+
 # Подключение статики
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -39,4 +47,25 @@ async def root():
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(authorization: str = Header(None)):
+    """Метрики в формате Prometheus (Bearer METRICS_TOKEN)"""
+    if not metrics.is_authorized(authorization):
+        raise HTTPException(status_code=401, detail="Unauthorized")
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.on_event("startup")
+async def start_settings_listener():
+    # Изменения настроек из других процессов (бот/WebApp API)
+    settings_service.start_listener()
+
+@app.on_event("startup")
+async def run_database_hooks():
+    # Индексы, счётчики и витрины, которых нет после create_all
+    run_startup_hooks(engine)
+
+@app.on_event("shutdown")
+async def stop_settings_listener():
+    settings_service.stop_listener()
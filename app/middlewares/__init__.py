@@ -0,0 +1,3 @@
+"""
+Middleware для aiohttp API сервера, FastAPI и бота
+"""
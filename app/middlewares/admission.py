@@ -0,0 +1,62 @@
+"""
+Rate limit и сброс нагрузки для aiohttp API (services/admission)
+
+Стоит после metrics_middleware: отклонённые запросы тоже попадают в
+метрики (статусы 429/503) и в http_requests_rejected_total.
+"""
+from aiohttp import web
+
+from services import metrics
+from services.serialization import json_response
+from services.admission import (
+    ADMISSION_RETRY_AFTER, RATE_LIMIT_ENABLED, RATE_LIMIT_PROXY_HOPS, load_monitor, policy_for, rate_limiter,
+    retry_after
+)
+
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def _client_key(request) -> str:
+    """
+    Адрес клиента
+
+    user_id и Authorization не проверяются, поэтому ключом не служат.
+    Прокси дописывает адрес своего клиента в конец X-Forwarded-For - берём
+    запись RATE_LIMIT_PROXY_HOPS с конца, а не первую (её задаёт клиент).
+    """
+    if RATE_LIMIT_PROXY_HOPS:
+        forwarded = [hop.strip() for hop in request.headers.get('X-Forwarded-For', '').split(',') if hop.strip()]
+        if len(forwarded) >= RATE_LIMIT_PROXY_HOPS:
+            return forwarded[-RATE_LIMIT_PROXY_HOPS]
+    return request.remote or ''
+
+
+def _reject(route: str, reason: str, status: int, seconds: float, error: str):
+    metrics.http_requests_rejected_total.inc('aiohttp', route, reason)
+    return json_response(
+        {'success': False, 'error': error}, status=status,
+        headers={'Retry-After': retry_after(seconds)}
+    )
+
+
+@web.middleware
+async def admission_middleware(request, handler):
+    if not RATE_LIMIT_ENABLED:
+        return await handler(request)
+
+    resource = request.match_info.route.resource
+    route = resource.canonical if resource is not None else UNMATCHED_ROUTE
+    policy = policy_for(route)
+    if policy is None:
+        return await handler(request)
+
+    if policy.shed:
+        reason = load_monitor.overload_reason()
+        if reason is not None:
+            return _reject(route, reason, 503, ADMISSION_RETRY_AFTER, 'Сервер перегружен, попробуйте позже')
+
+    wait = rate_limiter.acquire(_client_key(request), policy)
+    if wait:
+        return _reject(route, 'rate_limit', 429, wait, 'Слишком много запросов, попробуйте позже')
+
+    return await handler(request)
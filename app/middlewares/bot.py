@@ -0,0 +1,28 @@
+"""
+Middleware для aiogram-бота
+
+QueryScopeMiddleware открывает query_scope на каждый апдейт: SQL-запросы
+обработчика считаются отдельно, а в режиме QUERY_DIAGNOSTICS в лог попадают
+N+1 и медленные запросы с именем обработчика.
+"""
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from query_scope import query_scope
+
+
+class QueryScopeMiddleware(BaseMiddleware):
+    """Подключается как inner middleware: dp.message.middleware(QueryScopeMiddleware())"""
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        callback = getattr(data.get('handler'), 'callback', None)
+        name = getattr(callback, '__qualname__', None) or type(event).__name__
+        with query_scope(f"bot {type(event).__name__} ({name})"):
+            return await handler(event, data)
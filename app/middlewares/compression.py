@@ -0,0 +1,183 @@
+"""
+Сжатие ответов aiohttp (gzip / brotli)
+
+- Кодировка выбирается по Accept-Encoding, сжимаются только текстовые типы
+  от COMPRESSION_MIN_SIZE байт
+- Ответы с ETag (снимок каталога, файлы webapp) сжимаются один раз в пуле
+  потоков и дальше берутся из LRU-кэша по (ETag, кодировка); одновременные
+  запросы ждут одно сжатие. Максимальный уровень - только для тел до
+  COMPRESSION_BEST_SIZE: brotli q11 на мегабайтном каталоге идёт секунды
+- Большие динамические ответы сжимаются в пуле потоков, чтобы не
+  блокировать event loop
+"""
+import asyncio
+import gzip
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from aiohttp import web
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен - тогда только gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+# Тела больше этого размера сжимаются вне event loop
+COMPRESSION_EXECUTOR_SIZE = int(os.getenv("COMPRESSION_EXECUTOR_SIZE", "65536"))
+COMPRESSION_CACHE_SIZE = int(os.getenv("COMPRESSION_CACHE_SIZE", "64"))
+# Ответы с ETag до этого размера сжимаются с максимальным уровнем
+COMPRESSION_BEST_SIZE = int(os.getenv("COMPRESSION_BEST_SIZE", "131072"))
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/msgpack',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+)
+
+# Уровни: для кэшируемых ответов сжимаем сильнее - это делается один раз;
+# cached_large - кэшируемые тела больше COMPRESSION_BEST_SIZE (каталог 900 КБ:
+# brotli q11 ~1.9 с, q6 ~25 мс при разнице в размере ~20%)
+GZIP_LEVEL = {'cached': 9, 'cached_large': 6, 'dynamic': 6}
+BROTLI_QUALITY = {'cached': 11, 'cached_large': 6, 'dynamic': 4}
+
+
+def choose_encoding(accept_encoding: str):
+    """Выбрать кодировку по Accept-Encoding (br предпочтительнее gzip)"""
+    accepted = {}
+    for part in accept_encoding.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name] = q
+
+    for encoding in ('br', 'gzip'):
+        if encoding == 'br' and brotli is None:
+            continue
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress(body: bytes, encoding: str, mode: str = 'dynamic') -> bytes:
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY[mode])
+    return gzip.compress(body, compresslevel=GZIP_LEVEL[mode])
+
+
+def cached_mode(size: int) -> str:
+    return 'cached' if size <= COMPRESSION_BEST_SIZE else 'cached_large'
+
+
+class CompressedCache:
+    """LRU сжатых тел по (ETag, кодировка) и сжатия, которые ещё идут"""
+
+    def __init__(self, max_entries: int = COMPRESSION_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+            return body
+
+    def put(self, key, body: bytes):
+        with self._lock:
+            self._items[key] = body
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def compress(self, key, body: bytes, encoding: str) -> asyncio.Future:
+        """
+        Future со сжатым телом (вызывать из event loop, если get() вернул None)
+
+        Сжатие всегда идёт в пуле потоков; пока оно не закончилось, запросы
+        с тем же ключом получают тот же future, а не сжимают тело заново.
+        """
+        future = self._pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(None, compress, body, encoding, cached_mode(len(body)))
+            self._pending[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    def _finish(self, key, future):
+        self._pending.pop(key, None)
+        if not future.cancelled() and future.exception() is None:
+            self.put(key, future.result())
+
+
+compressed_cache = CompressedCache()
+
+
+def _is_compressible(response) -> bool:
+    if not isinstance(response, web.Response) or response.status != 200:
+        return False
+    if response.headers.get('Content-Encoding'):
+        return False
+    body = response.body
+    if not isinstance(body, (bytes, bytearray)) or len(body) < COMPRESSION_MIN_SIZE:
+        return False
+    return response.content_type.startswith(COMPRESSIBLE_TYPES)
+
+
+async def _compress_async(body: bytes, encoding: str, mode: str) -> bytes:
+    if len(body) < COMPRESSION_EXECUTOR_SIZE:
+        return compress(body, encoding, mode)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, compress, body, encoding, mode)
+
+
+@web.middleware
+async def compression_middleware(request, handler):
+    """Сжать ответ, если клиент это поддерживает"""
+    response = await handler(request)
+
+    if request.method == 'HEAD' or not _is_compressible(response):
+        return response
+
+    response.headers.add('Vary', 'Accept-Encoding')
+    encoding = choose_encoding(request.headers.get('Accept-Encoding', ''))
+    if encoding is None:
+        return response
+
+    body = bytes(response.body)
+    etag = response.headers.get('ETag')
+    if etag:
+        key = (etag, encoding)
+        compressed = compressed_cache.get(key)
+        if compressed is None:
+            # shield: отменённый запрос не должен отменять сжатие для остальных
+            compressed = await asyncio.shield(compressed_cache.compress(key, body, encoding))
+    else:
+        compressed = await _compress_async(body, encoding, 'dynamic')
+
+    if len(compressed) >= len(body):
+        return response
+
+    # Сжатое представление байтово отличается - ETag становится слабым
+    if etag and not etag.startswith('W/'):
+        response.headers['ETag'] = 'W/' + etag
+    response.body = compressed
+    response.headers['Content-Encoding'] = encoding
+    response.headers.pop('Content-Length', None)
+    return response
@@ -0,0 +1,96 @@
+"""
+Метрики HTTP-запросов: время ответа, статус, запросы в работе, SQL на запрос
+
+- metrics_middleware - для aiohttp (api_server.create_app)
+- MetricsMiddleware - ASGI, для FastAPI (main.app)
+
+Запрос выполняется внутри query_scope, поэтому число SQL-запросов и время
+в БД попадают в метрики того же роута (и в отчёт QUERY_DIAGNOSTICS). Метка route - шаблон роута
+('/api/admin/orders/{id}'), а не сам путь, чтобы число рядов не росло.
+"""
+import time
+
+from aiohttp import web
+
+from query_scope import query_scope
+from services import metrics
+
+UNMATCHED_ROUTE = 'unmatched'
+
+
+def _aiohttp_route(request) -> str:
+    resource = request.match_info.route.resource
+    return resource.canonical if resource is not None else UNMATCHED_ROUTE
+
+
+def _handler_name(handler) -> str:
+    return getattr(handler, '__qualname__', None) or type(handler).__name__
+
+
+def _asgi_route(scope) -> str:
+    # Роутер FastAPI кладёт найденный роут в scope после сопоставления
+    return getattr(scope.get('route'), 'path', None) or UNMATCHED_ROUTE
+
+
+@web.middleware
+async def metrics_middleware(request, handler):
+    """Замерить запрос к aiohttp-серверу"""
+    route = _aiohttp_route(request)
+    status = 500
+    scope = None
+    started = time.perf_counter()
+    metrics.http_requests_in_flight.inc('aiohttp')
+    try:
+        name = f"{request.method} {route} ({_handler_name(request.match_info.handler)})"
+        with query_scope(name) as scope:
+            response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        metrics.http_requests_in_flight.dec('aiohttp')
+        metrics.observe_request(
+            'aiohttp', request.method, route, status, time.perf_counter() - started, scope
+        )
+
+
+class MetricsMiddleware:
+    """ASGI middleware для FastAPI: app.add_middleware(MetricsMiddleware)"""
+
+    def __init__(self, app, app_name: str = 'fastapi'):
+        self.app = app
+        self.app_name = app_name
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        metrics.http_requests_in_flight.inc(self.app_name)
+        query = None
+        try:
+            with query_scope(f"{scope['method']} {scope.get('path', '')}") as query:
+                try:
+                    await self.app(scope, receive, send_wrapper)
+                finally:
+                    endpoint = scope.get('endpoint')
+                    query.name = f"{scope['method']} {_asgi_route(scope)}" + (
+                        f" ({_handler_name(endpoint)})" if endpoint is not None else ''
+                    )
+        finally:
+            metrics.http_requests_in_flight.dec(self.app_name)
+            route = _asgi_route(scope)
+            metrics.observe_request(
+                self.app_name, scope['method'], route, status, time.perf_counter() - started, query
+            )
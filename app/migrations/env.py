@@ -18,6 +18,8 @@ from models.product import Category, Product, ProductRecommendation
 from models.order import Order, OrderItem, OrderHistory
 from models.settings import SystemSetting
 from models.bonus import BonusTransaction
+from models.analytics import AnalyticsEvent, ClientMetrics, SalesRollup, ClientProductAffinity
+from models.idempotency import IdempotencyKey
 
 # this is the Alembic Config object
 config = context.config
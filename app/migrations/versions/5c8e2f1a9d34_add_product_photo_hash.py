@@ -0,0 +1,24 @@
+"""Add products.photo_hash
+
+Revision ID: 5c8e2f1a9d34
+Revises: bb3c2b9e1fe0
+Create Date: 2026-10-17 20:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8e2f1a9d34'
+down_revision = 'bb3c2b9e1fe0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('photo_hash', sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'photo_hash')
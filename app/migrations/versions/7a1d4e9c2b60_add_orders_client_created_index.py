@@ -0,0 +1,24 @@
+"""Add orders (client_id, created_at) index
+
+Revision ID: 7a1d4e9c2b60
+Revises: 5c8e2f1a9d34
+Create Date: 2026-10-17 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a1d4e9c2b60'
+down_revision = '5c8e2f1a9d34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_orders_client_id_created_at', 'orders', ['client_id', 'created_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_client_id_created_at', table_name='orders')
@@ -0,0 +1,39 @@
+"""Add client list indexes and search index
+
+Revision ID: 9e4b7c1f3a28
+Revises: 7a1d4e9c2b60
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from services.client_search import create_search_index, PG_TRGM_INDEXES
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b7c1f3a28'
+down_revision = '7a1d4e9c2b60'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_clients_status_created_at', 'clients', ['status', 'created_at'])
+    op.create_index('ix_clients_sales_rep_id_created_at', 'clients', ['sales_rep_id', 'created_at'])
+    # pg_trgm GIN-индексы на PostgreSQL, FTS5 + триггеры на SQLite; ошибка
+    # (нет pg_trgm или прав на него) останавливает миграцию с настоящей причиной
+    create_search_index(op.get_bind())
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        for name, _, _ in PG_TRGM_INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+    elif bind.dialect.name == 'sqlite':
+        for trigger in ('clients_fts_ai', 'clients_fts_au', 'clients_fts_ad', 'clients_fts_users_au'):
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS clients_fts")
+    op.drop_index('ix_clients_sales_rep_id_created_at', table_name='clients')
+    op.drop_index('ix_clients_status_created_at', table_name='clients')
@@ -0,0 +1,35 @@
+"""Add order number sequence and counter table
+
+Revision ID: a8d4f2e6b193
+Revises: f3b8d2c6e091
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from services import order_numbers
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4f2e6b193'
+down_revision = 'f3b8d2c6e091'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'order_number_counters',
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('value', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+    # PostgreSQL - последовательность, остальные - строка счётчика; обе выше существующих заказов
+    order_numbers.ensure_counter(op.get_bind())
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(f"DROP SEQUENCE IF EXISTS {order_numbers.SEQUENCE_NAME}")
+    op.drop_table('order_number_counters')
@@ -0,0 +1,36 @@
+"""Add composite indexes for admin list pagination
+
+Revision ID: b2f6d8a4e157
+Revises: 9e4b7c1f3a28
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2f6d8a4e157'
+down_revision = '9e4b7c1f3a28'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = (
+    ('ix_orders_status_created_at', 'orders', ['status', 'created_at']),
+    ('ix_orders_manager_id_status_created_at', 'orders', ['manager_id', 'status', 'created_at']),
+    ('ix_ai_conversations_created_at', 'ai_conversations', ['created_at']),
+    ('ix_ai_conversations_client_id_created_at', 'ai_conversations', ['client_id', 'created_at']),
+    ('ix_ai_proactive_messages_sent_at', 'ai_proactive_messages', ['sent_at']),
+    ('ix_ai_proactive_messages_client_id_sent_at', 'ai_proactive_messages', ['client_id', 'sent_at']),
+)
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
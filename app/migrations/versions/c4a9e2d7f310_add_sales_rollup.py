@@ -0,0 +1,48 @@
+"""Add sales_rollup table
+
+Revision ID: c4a9e2d7f310
+Revises: b2f6d8a4e157
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from services import sales_rollup
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4a9e2d7f310'
+down_revision = 'b2f6d8a4e157'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'sales_rollup',
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('sales_rep_id', sa.Integer(), nullable=False),
+        sa.Column('manager_id', sa.Integer(), nullable=False),
+        sa.Column('quantity', sa.Integer(), nullable=False),
+        sa.Column('revenue', sa.Float(), nullable=False),
+        sa.Column('net_revenue', sa.Float(), nullable=False),
+        sa.Column('order_count', sa.Integer(), nullable=False),
+        sa.Column('bonus_used', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('day', 'product_id', 'client_id', 'sales_rep_id', 'manager_id')
+    )
+    op.create_index('ix_sales_rollup_sales_rep_id_day', 'sales_rollup', ['sales_rep_id', 'day'])
+    op.create_index('ix_sales_rollup_product_id_day', 'sales_rollup', ['product_id', 'day'])
+    op.create_index('ix_clients_created_at', 'clients', ['created_at'])
+
+    # Заполняем из существующих заказов
+    sales_rollup.rebuild(op.get_bind())
+
+
+def downgrade() -> None:
+    op.drop_index('ix_clients_created_at', table_name='clients')
+    op.drop_index('ix_sales_rollup_product_id_day', table_name='sales_rollup')
+    op.drop_index('ix_sales_rollup_sales_rep_id_day', table_name='sales_rollup')
+    op.drop_table('sales_rollup')
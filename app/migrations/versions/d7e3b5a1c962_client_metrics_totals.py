@@ -0,0 +1,71 @@
+"""Maintain client_metrics: total_discount, unique client_id
+
+Revision ID: d7e3b5a1c962
+Revises: c4a9e2d7f310
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e3b5a1c962'
+down_revision = 'c4a9e2d7f310'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    # Таблица могла быть создана через create_all, а могло не быть её вовсе
+    if 'client_metrics' not in inspector.get_table_names():
+        op.create_table(
+            'client_metrics',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('client_id', sa.Integer(), nullable=False),
+            sa.Column('telegram_id', sa.BigInteger(), nullable=False),
+            sa.Column('first_start_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('registration_started_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('registration_completed_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('first_approved_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('first_order_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('last_order_at', sa.DateTime(timezone=True), nullable=True),
+            sa.Column('total_orders', sa.Integer(), nullable=True),
+            sa.Column('total_spent', sa.BigInteger(), nullable=True),
+            sa.Column('total_discount', sa.BigInteger(), nullable=True),
+            sa.Column('total_bonus_earned', sa.Integer(), nullable=True),
+            sa.Column('total_bonus_used', sa.Integer(), nullable=True),
+            sa.Column('current_cashback_percent', sa.Integer(), nullable=True),
+            sa.Column('referral_code', sa.String(length=50), nullable=True),
+            sa.Column('utm_source', sa.String(length=100), nullable=True),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+            sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index('ix_client_metrics_id', 'client_metrics', ['id'])
+        op.create_index('ix_client_metrics_telegram_id', 'client_metrics', ['telegram_id'])
+    else:
+        columns = {c['name'] for c in inspector.get_columns('client_metrics')}
+        if 'total_discount' not in columns:
+            op.add_column('client_metrics', sa.Column('total_discount', sa.BigInteger(), nullable=True))
+        indexes = {i['name'] for i in inspector.get_indexes('client_metrics')}
+        if 'ix_client_metrics_client_id' in indexes:
+            op.drop_index('ix_client_metrics_client_id', table_name='client_metrics')
+
+    # Одна строка на клиента - нужна для INSERT ... ON CONFLICT (client_id).
+    # Старый индекс не был уникальным: из дублей оставляем строку с меньшим id
+    op.execute(
+        "DELETE FROM client_metrics WHERE id NOT IN "
+        "(SELECT MIN(id) FROM client_metrics GROUP BY client_id)"
+    )
+    op.create_index('ix_client_metrics_client_id', 'client_metrics', ['client_id'], unique=True)
+
+    # Заполнение - в f6a2d8c4e517 вместе с колонками, добавленными там
+
+
+def downgrade() -> None:
+    op.drop_index('ix_client_metrics_client_id', table_name='client_metrics')
+    op.create_index('ix_client_metrics_client_id', 'client_metrics', ['client_id'])
+    op.drop_column('client_metrics', 'total_discount')
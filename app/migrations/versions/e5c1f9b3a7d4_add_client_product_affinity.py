@@ -0,0 +1,46 @@
+"""Add client_product_affinity table
+
+Revision ID: e5c1f9b3a7d4
+Revises: d7e3b5a1c962
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from services import product_affinity
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c1f9b3a7d4'
+down_revision = 'd7e3b5a1c962'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'client_product_affinity',
+        sa.Column('client_id', sa.Integer(), nullable=False),
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('total_quantity', sa.Integer(), nullable=False),
+        sa.Column('order_count', sa.Integer(), nullable=False),
+        sa.Column('first_purchased_at', sa.DateTime(), nullable=True),
+        sa.Column('last_purchased_at', sa.DateTime(), nullable=True),
+        sa.Column('avg_interval_days', sa.Float(), nullable=True),
+        sa.Column('reorder_due_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('client_id', 'product_id')
+    )
+    op.create_index('ix_client_product_affinity_client_id_total_quantity', 'client_product_affinity',
+                    ['client_id', 'total_quantity'])
+    op.create_index('ix_client_product_affinity_client_id_reorder_due_at', 'client_product_affinity',
+                    ['client_id', 'reorder_due_at'])
+
+    # Заполняем из существующих заказов
+    product_affinity.rebuild(op.get_bind())
+
+
+def downgrade() -> None:
+    op.drop_index('ix_client_product_affinity_client_id_reorder_due_at', table_name='client_product_affinity')
+    op.drop_index('ix_client_product_affinity_client_id_total_quantity', table_name='client_product_affinity')
+    op.drop_table('client_product_affinity')
@@ -0,0 +1,25 @@
+"""Add bonus_transactions (client_id, type) index
+
+Revision ID: f3b8d2c6e091
+Revises: e5c1f9b3a7d4
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8d2c6e091'
+down_revision = 'e5c1f9b3a7d4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Без него пересчёт метрик клиентов сканирует все бонусные операции на каждого клиента
+    op.create_index('ix_bonus_transactions_client_id_type', 'bonus_transactions', ['client_id', 'type'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_bonus_transactions_client_id_type', table_name='bonus_transactions')
@@ -0,0 +1,61 @@
+"""client_metrics: total_paid, bonus totals in tiyn
+
+Revision ID: f6a2d8c4e517
+Revises: b5e9c3d7f204
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6a2d8c4e517'
+down_revision = 'b5e9c3d7f204'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('client_metrics', sa.Column('total_paid', sa.BigInteger(), nullable=True))
+    # Бонусы теперь в тиынах, как суммы заказов
+    with op.batch_alter_table('client_metrics') as batch:
+        batch.alter_column('total_bonus_earned', type_=sa.BigInteger(), existing_type=sa.Integer())
+        batch.alter_column('total_bonus_used', type_=sa.BigInteger(), existing_type=sa.Integer())
+
+    # Заполнение без кода приложения: каждая сумма округляется до тиына
+    # отдельно, как в services/client_metrics.py; отменённые заказы не входят
+    op.execute("""
+        UPDATE client_metrics SET
+            total_paid = (
+                SELECT COALESCE(SUM(CAST(ROUND(COALESCE(o.final_total, 0) * 100) AS BIGINT)), 0)
+                FROM orders o
+                WHERE o.client_id = client_metrics.client_id AND o.status <> 'cancelled'
+            ),
+            total_discount = (
+                SELECT COALESCE(SUM(CAST(ROUND(COALESCE(o.discount_amount, 0) * 100) AS BIGINT)), 0)
+                FROM orders o
+                WHERE o.client_id = client_metrics.client_id AND o.status <> 'cancelled'
+            ),
+            total_bonus_earned = (
+                SELECT COALESCE(SUM(CAST(ROUND(COALESCE(b.amount, 0) * 100) AS BIGINT)), 0)
+                FROM bonus_transactions b
+                WHERE b.client_id = client_metrics.client_id AND b.type = 'earn'
+            ),
+            total_bonus_used = (
+                SELECT COALESCE(SUM(CAST(ROUND(ABS(COALESCE(b.amount, 0)) * 100) AS BIGINT)), 0)
+                FROM bonus_transactions b
+                WHERE b.client_id = client_metrics.client_id AND b.type = 'spend'
+            )
+    """)
+
+
+def downgrade() -> None:
+    op.execute(
+        "UPDATE client_metrics SET total_bonus_earned = total_bonus_earned / 100, "
+        "total_bonus_used = total_bonus_used / 100"
+    )
+    with op.batch_alter_table('client_metrics') as batch:
+        batch.alter_column('total_bonus_earned', type_=sa.Integer(), existing_type=sa.BigInteger())
+        batch.alter_column('total_bonus_used', type_=sa.Integer(), existing_type=sa.BigInteger())
+    op.drop_column('client_metrics', 'total_paid')
@@ -1,7 +1,7 @@
 """
 Модели для логирования AI-агента
 """
-from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Float, Text, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -19,6 +19,12 @@ class AIConversation(Base):
     # Relationships
     client = relationship("Client", backref="ai_conversations")
 
+    __table_args__ = (
+        # История диалогов в дашборде: keyset по дате, с фильтром по клиенту и без
+        Index('ix_ai_conversations_created_at', 'created_at'),
+        Index('ix_ai_conversations_client_id_created_at', 'client_id', 'created_at'),
+    )
+
 class AIProactiveMessage(Base):
     """Проактивные сообщения от AI"""
     __tablename__ = "ai_proactive_messages"
@@ -38,4 +44,9 @@ class AIProactiveMessage(Base):
     
     # Relationships
     client = relationship("Client", backref="ai_proactive_messages")
-    order = relationship("Order", backref="ai_proactive_messages")
\ No newline at end of file
+    order = relationship("Order", backref="ai_proactive_messages")
+
+    __table_args__ = (
+        Index('ix_ai_proactive_messages_sent_at', 'sent_at'),
+        Index('ix_ai_proactive_messages_client_id_sent_at', 'client_id', 'sent_at'),
+    )
@@ -1,7 +1,7 @@
 """
 Модели для аналитики и метрик
 """
-from sqlalchemy import Column, Integer, String, BigInteger, DateTime, JSON
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, Date, Float, JSON, Index
 from sqlalchemy.sql import func
 from database import Base
 from datetime import datetime
@@ -18,11 +18,15 @@ class AnalyticsEvent(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
 class ClientMetrics(Base):
-    """Метрики клиента для аналитики"""
+    """
+    Метрики клиента для аналитики
+
+    Заказы и бонусы ведёт services/client_metrics.py, без отменённых заказов.
+    """
     __tablename__ = "client_metrics"
     
     id = Column(Integer, primary_key=True, index=True)
-    client_id = Column(Integer, nullable=False, index=True)
+    client_id = Column(Integer, nullable=False, unique=True, index=True)
     telegram_id = Column(BigInteger, nullable=False, index=True)
     
     # Временные метки ключевых событий
@@ -35,11 +39,13 @@ class ClientMetrics(Base):
     
     # Метрики заказов
     total_orders = Column(Integer, default=0)
-    total_spent = Column(BigInteger, default=0)  # в тиынах
+    total_spent = Column(BigInteger, default=0)  # в тиынах, сумма заказов до бонусов
+    total_paid = Column(BigInteger, default=0)  # в тиынах, к оплате (final_total)
+    total_discount = Column(BigInteger, default=0)  # в тиынах
     
     # Метрики бонусов
-    total_bonus_earned = Column(Integer, default=0)
-    total_bonus_used = Column(Integer, default=0)
+    total_bonus_earned = Column(BigInteger, default=0)  # в тиынах
+    total_bonus_used = Column(BigInteger, default=0)  # в тиынах
     current_cashback_percent = Column(Integer, default=3)  # начальный 3%
     
     # Дополнительные данные
@@ -47,4 +53,59 @@ class ClientMetrics(Base):
     utm_source = Column(String(100))
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
\ No newline at end of file
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+
+class SalesRollup(Base):
+    """
+    Продажи по дням (витрина для дашбордов)
+
+    Ключ: день, товар, клиент, торговый, менеджер. Строка с product_id = 0 -
+    итог по заказам (выручка, число заказов, бонусы), остальные - по товарам.
+    Отменённые заказы не учитываются. Обновляется services/sales_rollup.py
+    в транзакции заказа, пересобирается rebuild_aggregates.py.
+    """
+    __tablename__ = "sales_rollup"
+
+    day = Column(Date, primary_key=True)
+    product_id = Column(Integer, primary_key=True, default=0)  # 0 - итог по заказам
+    client_id = Column(Integer, primary_key=True)
+    sales_rep_id = Column(Integer, primary_key=True, default=0)  # 0 - без торгового
+    manager_id = Column(Integer, primary_key=True, default=0)  # 0 - без менеджера
+
+    quantity = Column(Integer, nullable=False, default=0)
+    revenue = Column(Float, nullable=False, default=0.0)  # сумма заказов / позиций
+    net_revenue = Column(Float, nullable=False, default=0.0)  # к оплате (final_total)
+    order_count = Column(Integer, nullable=False, default=0)
+    bonus_used = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        Index('ix_sales_rollup_sales_rep_id_day', 'sales_rep_id', 'day'),
+        Index('ix_sales_rollup_product_id_day', 'product_id', 'day'),
+    )
+
+
+class ClientProductAffinity(Base):
+    """
+    Что и как часто покупает клиент (избранное и «пора заказать»)
+
+    Строка на пару клиент × товар, обновляется services/product_affinity.py
+    при оформлении заказа. Средний интервал между покупками считается как
+    (last - first) / (order_count - 1).
+    """
+    __tablename__ = "client_product_affinity"
+
+    client_id = Column(Integer, primary_key=True)
+    product_id = Column(Integer, primary_key=True)
+
+    total_quantity = Column(Integer, nullable=False, default=0)
+    order_count = Column(Integer, nullable=False, default=0)  # в скольких заказах был товар
+    first_purchased_at = Column(DateTime)
+    last_purchased_at = Column(DateTime)
+    avg_interval_days = Column(Float)  # None - куплен один раз
+    reorder_due_at = Column(DateTime)  # last_purchased_at + средний интервал
+
+    __table_args__ = (
+        Index('ix_client_product_affinity_client_id_total_quantity', 'client_id', 'total_quantity'),
+        Index('ix_client_product_affinity_client_id_reorder_due_at', 'client_id', 'reorder_due_at'),
+    )
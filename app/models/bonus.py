@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -17,4 +17,9 @@ class BonusTransaction(Base):
     
     # Relationships
     client = relationship("Client", back_populates="bonus_transactions")
-    order = relationship("Order")
\ No newline at end of file
+    order = relationship("Order")
+
+    __table_args__ = (
+        # Бонусы клиента по типу: метрики клиента (reconcile), история операций
+        Index('ix_bonus_transactions_client_id_type', 'client_id', 'type'),
+    )
\ No newline at end of file
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from datetime import datetime
+from database import Base
+
+class IdempotencyKey(Base):
+    """
+    Ответы на запросы с заголовком Idempotency-Key (services/idempotency)
+
+    Строка пишется в той же транзакции, что и результат запроса (заказ),
+    поэтому повтор либо находит готовый ответ, либо запрос ещё не выполнен.
+    """
+    __tablename__ = "idempotency_keys"
+
+    scope = Column(String(50), primary_key=True)  # 'orders.create'
+    key = Column(String(100), primary_key=True)
+    request_hash = Column(String(64), nullable=False)  # sha256 тела запроса
+    status_code = Column(Integer, nullable=False)
+    response_body = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # Очистка просроченных ключей
+        Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
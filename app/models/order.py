@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Text, Date
+from sqlalchemy import Column, Integer, BigInteger, String, Float, DateTime, ForeignKey, Text, Date, Index, Sequence
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -27,6 +27,24 @@ class Order(Base):
     items = relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
     history = relationship("OrderHistory", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # История заказов клиента: фильтр по клиенту + keyset по дате
+        Index('ix_orders_client_id_created_at', 'client_id', 'created_at'),
+        # Списки заказов в админке: фильтр по статусу / менеджеру + keyset по дате
+        Index('ix_orders_status_created_at', 'status', 'created_at'),
+        Index('ix_orders_manager_id_status_created_at', 'manager_id', 'status', 'created_at'),
+    )
+
+# Номера заказов (services/order_numbers): последовательность на PostgreSQL,
+# таблица-счётчик на остальных БД. create_all создаёт последовательность
+# только там, где они поддерживаются.
+order_number_seq = Sequence('order_number_seq', metadata=Base.metadata)
+
+class OrderNumberCounter(Base):
+    __tablename__ = "order_number_counters"
+    name = Column(String(50), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)  # последний выданный номер
+
 class OrderItem(Base):
     __tablename__ = "order_items"
     id = Column(Integer, primary_key=True, index=True)
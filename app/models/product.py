@@ -26,6 +26,7 @@ class Product(Base):
     package_size = Column(String, nullable=True)
     stock = Column(Integer, default=0)
     photo_file_id = Column(String, nullable=True)
+    photo_hash = Column(String(64), nullable=True)  # sha256 загруженного фото
     is_active = Column(Boolean, default=True)
     sort_order = Column(Integer, default=0)
     created_at = Column(DateTime, default=datetime.utcnow)
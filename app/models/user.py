@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, BigInteger, String, Float, Boolean, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -66,6 +66,14 @@ class Client(Base):
     sales_rep = relationship("SalesRepresentative", back_populates="clients")
     orders = relationship("Order", back_populates="client")
     bonus_transactions = relationship("BonusTransaction", back_populates="client")
+
+    __table_args__ = (
+        # Список клиентов в админке: фильтр + keyset по дате
+        Index('ix_clients_status_created_at', 'status', 'created_at'),
+        Index('ix_clients_sales_rep_id_created_at', 'sales_rep_id', 'created_at'),
+        # Новые клиенты за период на дашборде
+        Index('ix_clients_created_at', 'created_at'),
+    )
 class SalesRepresentative(Base):
     __tablename__ = 'sales_representatives'
     
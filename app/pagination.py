@@ -0,0 +1,111 @@
+"""
+Keyset-пагинация списков
+
+Вместо OFFSET следующая страница выбирается условием
+(created_at, id) < (значения последней строки), поэтому страница N
+стоит столько же, сколько первая, если есть подходящий индекс.
+
+Курсор - непрозрачная строка (base64 от JSON с ключом последней строки),
+клиент просто передаёт её обратно в ?cursor=.
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+# Заголовок, в котором aiohttp-обработчики отдают курсор следующей страницы
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Курсор повреждён или от другого списка"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict) and 'dt' in value:
+        return datetime.fromisoformat(value['dt'])
+    return value
+
+
+def encode_cursor(values) -> str:
+    """Ключ последней строки -> курсор"""
+    raw = json.dumps([_encode_value(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> tuple:
+    """Курсор -> ключ; size - ожидаемое число колонок"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+    if not isinstance(values, list) or len(values) != size:
+        raise InvalidCursor('cursor does not match this list')
+    try:
+        return tuple(_decode_value(v) for v in values)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursor(str(e))
+
+
+def page_size(value, default: int = 20) -> int:
+    """Размер страницы из параметра запроса, в пределах 1..MAX_PAGE_SIZE"""
+    try:
+        limit = int(value) if value not in (None, '') else default
+    except (TypeError, ValueError):
+        limit = default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def keyset_page(query, columns, limit: int, cursor: str = None, descending: bool = True):
+    """
+    Одна страница запроса по ключу columns (например created_at, id)
+
+    Последняя колонка должна быть уникальной (обычно id), чтобы порядок
+    был однозначным.
+
+    Returns:
+        (rows, next_cursor) - next_cursor None, если страниц больше нет
+    """
+    key = tuple_(*columns)
+    if cursor:
+        values = decode_cursor(cursor, len(columns))
+        query = query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+
+    return _fetch_page(query, columns, limit, descending)
+
+
+def paginate(query, columns, limit: int, cursor: str = None, skip: int = 0, descending: bool = True):
+    """
+    keyset_page с поддержкой старого параметра skip
+
+    skip (OFFSET) используется, только если курсор не передан - для
+    клиентов API, которые ещё листают по номеру страницы. Курсор
+    следующей страницы возвращается в обоих случаях, так что после
+    первой страницы можно перейти на keyset.
+    """
+    if cursor or not skip:
+        return keyset_page(query, columns, limit, cursor, descending)
+
+    return _fetch_page(query, columns, limit, descending, offset=skip)
+
+
+def _fetch_page(query, columns, limit: int, descending: bool, offset: int = 0):
+    """Выбрать limit + 1 строк: лишняя строка значит, что есть следующая страница"""
+    order = [column.desc() if descending else column.asc() for column in columns]
+    rows = query.order_by(*order).offset(offset or None).limit(limit + 1).all()
+
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor([getattr(last, column.key) for column in columns])
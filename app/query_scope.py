@@ -0,0 +1,208 @@
+"""
+Учёт SQL-запросов в рамках одного HTTP-запроса (или апдейта бота)
+
+Middleware открывает область (query_scope), обработчики работают как
+раньше, а хуки engine (before/after_cursor_execute) добавляют в текущую
+область число выполненных запросов и время в БД. Область хранится в
+contextvar, поэтому видна и из потоков DBExecutor (он копирует контекст).
+
+Режим диагностики (QUERY_DIAGNOSTICS=true) дополнительно запоминает форму
+каждого запроса и по завершении обработчика пишет в лог:
+- N+1 - одна и та же форма запроса QUERY_REPEAT_THRESHOLD и более раз
+  (ленивая загрузка связей в цикле: user.client, order.items, ...)
+- медленные запросы дольше QUERY_SLOW_MS
+вместе с именем обработчика и стеком кода приложения, откуда пришёл запрос.
+
+QUERY_BUDGET > 0 - лимит запросов на обработчик: запрос сверх лимита
+падает с QueryBudgetExceeded (для тестов и стендов, не для продакшена).
+"""
+import contextvars
+import logging
+import os
+import re
+import time
+import traceback
+from collections import Counter
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+QUERY_DIAGNOSTICS = os.getenv("QUERY_DIAGNOSTICS", "false").lower() == "true"
+QUERY_REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+QUERY_SLOW_MS = float(os.getenv("QUERY_SLOW_MS", "200"))
+QUERY_BUDGET = int(os.getenv("QUERY_BUDGET", "0"))
+
+# Кадры стека из этих путей не показываем - только код приложения
+_LIBRARY_PATHS = ('site-packages', 'dist-packages', os.sep + 'lib' + os.sep + 'python')
+_STACK_LIMIT = 6
+
+_current = contextvars.ContextVar('query_scope', default=None)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """Обработчик выполнил больше SQL-запросов, чем разрешено"""
+
+
+class QueryScope:
+    """Запросы к БД одного обработчика"""
+
+    __slots__ = ('name', 'statements', 'db_time', 'budget')
+
+    def __init__(self, name: str, budget: int = 0):
+        self.name = name
+        self.statements = 0
+        self.db_time = 0.0
+        self.budget = budget
+
+    def check_budget(self, statement: str):
+        if self.budget and self.statements >= self.budget:
+            raise QueryBudgetExceeded(
+                f"{self.name}: query budget {self.budget} exceeded by: {_shorten(statement)}"
+            )
+
+    def record(self, statement: str, duration: float):
+        self.statements += 1
+        self.db_time += duration
+
+    def report(self):
+        pass
+
+
+class DiagnosticScope(QueryScope):
+    """QueryScope, который ищет N+1 и медленные запросы"""
+
+    __slots__ = ('shapes', 'first_seen', 'slow')
+
+    def __init__(self, name: str, budget: int = 0):
+        super().__init__(name, budget)
+        self.shapes = Counter()
+        self.first_seen = {}
+        self.slow = []
+
+    def record(self, statement: str, duration: float):
+        super().record(statement, duration)
+        shape = statement_shape(statement)
+        self.shapes[shape] += 1
+        if shape not in self.first_seen:
+            self.first_seen[shape] = _app_stack()
+        if duration * 1000 >= QUERY_SLOW_MS:
+            self.slow.append((duration, shape, _app_stack()))
+
+    def repeated(self, threshold: int = None) -> list:
+        """[(форма, сколько раз)] - кандидаты в N+1"""
+        threshold = threshold or QUERY_REPEAT_THRESHOLD
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def report(self):
+        for shape, count in self.repeated():
+            logger.warning(
+                f"🔁 N+1 in {self.name}: {count}× {_shorten(shape)}\n{self.first_seen[shape]}"
+            )
+        for duration, shape, stack in self.slow:
+            logger.warning(
+                f"🐢 Slow query in {self.name}: {duration * 1000:.0f} ms {_shorten(shape)}\n{stack}"
+            )
+
+
+_PARAM_LIST = re.compile(r'\(\s*(\?|%\(\w+\)s|%s|\$\d+)(\s*,\s*(\?|%\(\w+\)s|%s|\$\d+))*\s*\)')
+_PARAM = re.compile(r'%\(\w+\)s|\$\d+|%s')
+_SPACES = re.compile(r'\s+')
+
+
+def statement_shape(statement: str) -> str:
+    """Форма запроса: без различий в именах параметров и длине IN (...)"""
+    shape = _PARAM_LIST.sub('(?)', statement)
+    shape = _PARAM.sub('?', shape)
+    return _SPACES.sub(' ', shape).strip()
+
+
+def _shorten(statement: str, limit: int = 300) -> str:
+    statement = _SPACES.sub(' ', statement).strip()
+    return statement if len(statement) <= limit else statement[:limit] + '…'
+
+
+def _app_stack() -> str:
+    frames = [
+        frame for frame in traceback.extract_stack()[:-3]
+        if not any(part in frame.filename for part in _LIBRARY_PATHS)
+        and not frame.filename.endswith(('query_scope.py', 'db_executor.py'))
+    ]
+    return ''.join(traceback.format_list(frames[-_STACK_LIMIT:])).rstrip()
+
+
+def current_scope():
+    """Текущая область или None (вне запроса)"""
+    return _current.get()
+
+
+@contextmanager
+def query_scope(name: str, diagnostics: bool = None, budget: int = None):
+    """
+    Открыть область учёта запросов на время блока
+
+    diagnostics / budget по умолчанию берутся из QUERY_DIAGNOSTICS / QUERY_BUDGET
+    """
+    diagnostics = QUERY_DIAGNOSTICS if diagnostics is None else diagnostics
+    budget = QUERY_BUDGET if budget is None else budget
+    scope = (DiagnosticScope if diagnostics else QueryScope)(name, budget)
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+        try:
+            scope.report()
+        except Exception as e:
+            logger.error(f"❌ Query diagnostics report failed: {e}")
+
+
+@contextmanager
+def query_budget(limit: int):
+    """Ограничить число запросов в текущей области (в тестах)"""
+    scope = _current.get()
+    if scope is None:
+        with query_scope('query_budget', budget=limit) as scope:
+            yield scope
+        return
+    previous, scope.budget = scope.budget, scope.statements + limit
+    try:
+        yield scope
+    finally:
+        scope.budget = previous
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    scope = _current.get()
+    if scope is not None:
+        scope.check_budget(statement)
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    scope = _current.get()
+    if scope is None:
+        return
+    started = conn.info.get('query_started')
+    if not started:
+        return
+    scope.record(statement, time.perf_counter() - started.pop())
+
+
+def _handle_error(exception_context):
+    # Запрос упал - снимаем его метку времени, иначе стек разъедется
+    if isinstance(exception_context.original_exception, QueryBudgetExceeded):
+        return
+    connection = exception_context.connection
+    started = connection.info.get('query_started') if connection is not None else None
+    if started and _current.get() is not None:
+        started.pop()
+
+
+def install(engine):
+    """Подключить учёт к engine (повторный вызов ничего не делает)"""
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+        event.listen(engine, 'handle_error', _handle_error)
@@ -0,0 +1,44 @@
+"""
+Пересборка агрегатов из заказов
+
+Витрина продаж (sales_rollup), метрики клиентов (client_metrics) и
+избранное клиентов (client_product_affinity) обновляются вместе с
+заказами; этот скрипт нужен для первого заполнения и если агрегаты
+разошлись с заказами (ручные правки в БД, смена торгового у клиента).
+Ночную сверку метрик клиентов делает планировщик supervisor.py; при
+запуске через start_all.py планировщика нет - запускайте скрипт по cron.
+
+Запуск из каталога app:
+    python rebuild_aggregates.py             # всё
+    python rebuild_aggregates.py --days 30   # витрину продаж - только за 30 дней
+"""
+import argparse
+from datetime import datetime, timedelta
+
+from database import engine
+from services import client_metrics, product_affinity, sales_rollup
+
+
+def rebuild_aggregates(days: int = None):
+    date_from = (datetime.utcnow() - timedelta(days=days)).date() if days else None
+
+    print("🔄 Rebuilding sales rollup...")
+    with engine.begin() as conn:
+        sales_rollup.rebuild(conn, date_from)
+    print("✅ Sales rollup rebuilt")
+
+    print("🔄 Reconciling client metrics...")
+    drifted = client_metrics.reconcile_all(engine)
+    print(f"✅ Client metrics reconciled, fixed: {drifted}")
+
+    print("🔄 Rebuilding product affinity...")
+    with engine.begin() as conn:
+        product_affinity.rebuild(conn)
+    print("✅ Product affinity rebuilt")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=int, default=None, help='Пересобрать только последние N дней')
+    args = parser.parse_args()
+    rebuild_aggregates(args.days)
@@ -8,10 +8,12 @@ from datetime import datetime, time
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 
-from database import SessionLocal
+from database import SessionLocal, engine
 from models.user import User, Client
 from ai_agent import sales_assistant
 from notifications import notifier
+from services import client_metrics
+from services.idempotency import purge_expired
 
 logger = logging.getLogger(__name__)
 
@@ -96,6 +98,31 @@ class ProactiveMessenger:
         finally:
             db.close()
     
+    async def reconcile_client_metrics(self):
+        """
+        Сверка метрик клиентов с заказами (исправляет расхождения)
+
+        Планировщик запускает только supervisor.py; при запуске через
+        start_all.py сверку делает rebuild_aggregates.py (по cron хостинга).
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, client_metrics.reconcile_all, engine)
+        except Exception as e:
+            logger.error(f"Error in client metrics reconciliation: {e}")
+    
+    async def purge_idempotency_keys(self):
+        """
+        Удаление просроченных ключей идемпотентности заказов
+
+        Без планировщика их удаляет оформление заказа (IdempotencyStore.save)
+        """
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, purge_expired, engine)
+        except Exception as e:
+            logger.error(f"Error in idempotency keys purge: {e}")
+    
     async def test_run(self):
         """
         Тестовый запуск (вызывается вручную)
@@ -120,6 +147,24 @@ class ProactiveMessenger:
             replace_existing=True
         )
         
+        # Сверка метрик клиентов - ночью, когда заказов нет
+        self.scheduler.add_job(
+            self.reconcile_client_metrics,
+            CronTrigger(hour=3, minute=0),
+            id='client_metrics_reconcile',
+            name='Client Metrics Reconciliation',
+            replace_existing=True
+        )
+        
+        # Просроченные ключи идемпотентности - раз в час
+        self.scheduler.add_job(
+            self.purge_idempotency_keys,
+            CronTrigger(minute=15),
+            id='idempotency_keys_purge',
+            name='Idempotency Keys Purge',
+            replace_existing=True
+        )
+        
         logger.info("📅 Scheduler configured: Daily at 10:00 AM")
         
         self.scheduler.start()
@@ -0,0 +1,174 @@
+"""
+Ограничение частоты запросов и сброс нагрузки (aiohttp API)
+
+1. Rate limit - token bucket на пару (клиент, группа роутов). Клиент -
+   адрес соединения: user_id и Authorization задаёт сам клиент, и ключ по
+   ним обходится подменой. За прокси (Render) адрес берётся из записи
+   X-Forwarded-For, которую дописал прокси (RATE_LIMIT_PROXY_HOPS с
+   конца), - первые записи присылает клиент. У каждой группы свой бюджет:
+   rate токенов в секунду и burst - запас на всплеск. Нет токена - 429 +
+   Retry-After.
+2. Admission control - когда пул соединений ждёт дольше
+   ADMISSION_POOL_WAIT_MS или event loop запаздывает дольше
+   ADMISSION_LOOP_LAG_MS, роуты с shed=True (дашборд, статистика)
+   получают 503 + Retry-After. Оформление заказа не сбрасывается никогда.
+
+Ведра живут в памяти процесса: при нескольких воркерах бюджет действует
+на воркер. Клиенты за одним NAT делят бюджет.
+"""
+import asyncio
+import logging
+import math
+import os
+import time
+from collections import OrderedDict, namedtuple
+
+from database import pool_stats
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "50000"))
+# Сколько прокси перед приложением дописывают X-Forwarded-For (0 - адрес соединения)
+RATE_LIMIT_PROXY_HOPS = int(os.getenv("RATE_LIMIT_PROXY_HOPS", "0"))
+ADMISSION_POOL_WAIT_MS = float(os.getenv("ADMISSION_POOL_WAIT_MS", "250"))
+ADMISSION_LOOP_LAG_MS = float(os.getenv("ADMISSION_LOOP_LAG_MS", "200"))
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+
+# Ожидание пула - скользящее среднее по выдачам соединений; без новых выдач
+# оно не меняется, поэтому старше этого срока считается неактуальным
+POOL_WAIT_STALE_AFTER = 5.0
+LOOP_LAG_INTERVAL = 0.25
+
+Policy = namedtuple('Policy', 'group rate burst shed')
+
+# Шаблон роута (resource.canonical) -> бюджет; None - без ограничений
+EXEMPT = None
+ROUTE_POLICIES = {
+    '/api/orders/create': Policy('checkout', 0.5, 5, False),
+    '/api/catalog': Policy('catalog', 2, 20, False),
+    '/api/catalog/me': Policy('catalog', 2, 20, False),
+    '/api/photo/{file_id}': Policy('photos', 20, 200, False),
+    '/api/admin/stats/dashboard': Policy('admin_stats', 1, 10, True),
+    '/api/client/stats': Policy('client_stats', 1, 5, True),
+    '/health': EXEMPT,
+    '/': EXEMPT,
+    '/{path}': EXEMPT,
+    '/admin': EXEMPT,
+    '/profile/': EXEMPT,
+    '/profile/{path}': EXEMPT,
+}
+ADMIN_POLICY = Policy('admin', 10, 50, False)
+DEFAULT_POLICY = Policy('default', 5, 30, False)
+
+
+def policy_for(route: str):
+    if route in ROUTE_POLICIES:
+        return ROUTE_POLICIES[route]
+    if route.startswith('/api/admin/'):
+        return ADMIN_POLICY
+    return DEFAULT_POLICY
+
+
+class TokenBucket:
+    __slots__ = ('tokens', 'updated')
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, rate: float, burst: float, now: float) -> float:
+        """Взять токен; 0 - успешно, иначе сколько секунд ждать следующего"""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / rate
+
+
+class RateLimiter:
+    """Token bucket на (клиент, группа); давно неактивные ведра вытесняются"""
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+
+    def acquire(self, client: str, policy: Policy, now: float = None) -> float:
+        """0 - запрос разрешён, иначе через сколько секунд повторить"""
+        now = time.monotonic() if now is None else now
+        key = (client, policy.group)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(policy.burst, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+        return bucket.take(policy.rate, policy.burst, now)
+
+    def clear(self):
+        self._buckets.clear()
+
+
+class LoadMonitor:
+    """Признаки перегрузки: ожидание пула соединений и задержка event loop"""
+
+    def __init__(self, pool_wait_ms: float = ADMISSION_POOL_WAIT_MS, loop_lag_ms: float = ADMISSION_LOOP_LAG_MS):
+        self.pool_wait_ms = pool_wait_ms
+        self.loop_lag_ms = loop_lag_ms
+        self.loop_lag = 0.0
+        self._task = None
+        self._acquisitions = 0
+        self._acquisitions_changed = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._measure_loop_lag())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _measure_loop_lag(self):
+        # Насколько позже заказанного просыпается sleep - столько ждут все корутины
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = max(0.0, loop.time() - started - LOOP_LAG_INTERVAL)
+            self.loop_lag += 0.3 * (lag - self.loop_lag)
+            metrics.event_loop_lag_seconds.set('aiohttp', value=self.loop_lag)
+
+    def pool_wait(self, now: float = None) -> float:
+        """Недавнее ожидание соединения из пула, мс (0, если выдач давно не было)"""
+        now = time.monotonic() if now is None else now
+        snapshot = pool_stats.snapshot()
+        if snapshot['acquisitions'] != self._acquisitions:
+            self._acquisitions = snapshot['acquisitions']
+            self._acquisitions_changed = now
+        elif now - self._acquisitions_changed > POOL_WAIT_STALE_AFTER:
+            return 0.0
+        return snapshot['wait_recent_ms']
+
+    def overload_reason(self):
+        """'db_pool' / 'loop_lag', если сервер перегружен, иначе None"""
+        if self.pool_wait_ms and self.pool_wait() > self.pool_wait_ms:
+            return 'db_pool'
+        if self.loop_lag_ms and self.loop_lag * 1000 > self.loop_lag_ms:
+            return 'loop_lag'
+        return None
+
+
+def retry_after(seconds: float) -> str:
+    return str(max(1, math.ceil(seconds)))
+
+
+rate_limiter = RateLimiter()
+load_monitor = LoadMonitor()
@@ -0,0 +1,119 @@
+"""
+Снимок каталога для /api/catalog
+
+Каталог одинаков для всех пользователей, поэтому он собирается один раз,
+сериализуется в bytes и отдаётся с ETag. Пересборка происходит только после
+изменения товаров/категорий (invalidate) или по истечении CATALOG_CACHE_TTL -
+это ограничивает устаревание, если запись прошла в другом процессе.
+"""
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from services import read_models, serialization
+from services.photo_service import photo_url
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "60"))
+
+CATEGORY_ICONS = {
+    'Попкорн': '🍿',
+    'Чипсы': '🥔',
+    'Батончики': '🍫',
+    'Хлебцы': '🍞',
+    'Напитки': '🥤',
+    'Выпечка': '🥐'
+}
+
+def get_category_icon(name):
+    """Получить иконку категории"""
+    return CATEGORY_ICONS.get(name, '📦')
+
+
+class CatalogSnapshot:
+    """Собранный каталог: данные, готовое тело ответа и ETag"""
+
+    def __init__(self, version: int, data: dict):
+        self.version = version
+        self.data = data
+        self.body = serialization.dumps(data)
+        self.etag = '"' + hashlib.sha1(self.body).hexdigest()[:20] + '"'
+        self.built_at = time.monotonic()
+        self._encoded = {'json': (self.body, self.etag)}
+
+    def encoded(self, fmt: str) -> tuple:
+        """(тело, ETag) в нужном формате; MessagePack кодируется при первом запросе"""
+        encoded = self._encoded.get(fmt)
+        if encoded is None:
+            encoded = self._encoded[fmt] = (serialization.encode(self.data, fmt), f'{self.etag[:-1]}-{fmt}"')
+        return encoded
+
+
+class CatalogCache:
+    """Процессный кэш снимка каталога с версией"""
+
+    def __init__(self, ttl: int = CATALOG_CACHE_TTL):
+        self.ttl = ttl
+        self._version = 0
+        self._snapshot = None
+        self._build_lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    def invalidate(self):
+        """Каталог изменился - следующий запрос пересоберёт снимок"""
+        self._version += 1
+
+    def is_fresh(self) -> bool:
+        """Можно ли отдать текущий снимок без обращения к БД"""
+        snapshot = self._snapshot
+        return (
+            snapshot is not None
+            and snapshot.version == self._version
+            and time.monotonic() - snapshot.built_at < self.ttl
+        )
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        return self._snapshot
+
+    def get(self, db) -> CatalogSnapshot:
+        """Вернуть актуальный снимок, при необходимости пересобрать"""
+        if self.is_fresh():
+            return self._snapshot
+
+        with self._build_lock:
+            # Пока ждали блокировку, снимок мог пересобрать другой поток
+            if self.is_fresh():
+                return self._snapshot
+
+            version = self._version
+            snapshot = CatalogSnapshot(version, self._load(db))
+            self._snapshot = snapshot
+            logger.info(f"📦 Catalog snapshot rebuilt: v{version}, {len(snapshot.body)} bytes")
+            return snapshot
+
+    def _load(self, db) -> dict:
+        # Только нужные колонки, без ORM-сущностей (services/read_models)
+        categories, products = read_models.catalog_rows(db)
+        categories_data = [{'id': cat.id, 'name': cat.name, 'icon': get_category_icon(cat.name)} for cat in categories]
+
+        products_data = [{
+            'id': prod.id, 'name': prod.name, 'price': float(prod.price),
+            'stock': prod.stock, 'category_id': prod.category_id,
+            'photo_url': photo_url(prod.photo_file_id, prod.photo_hash) if prod.photo_file_id else None
+        } for prod in products]
+
+        return {
+            'products': products_data,
+            'categories': categories_data
+        }
+
+
+# Глобальный экземпляр
+catalog_cache = CatalogCache()
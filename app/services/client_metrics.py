@@ -0,0 +1,263 @@
+"""
+Метрики клиента (client_metrics)
+
+Одна строка на клиента: заказы, сумма покупок (total - до бонусов,
+total_paid - к оплате, final_total), скидки, даты первого и последнего
+заказа, начисленные и списанные бонусы. Профиль и статистика
+клиента (WebApp, бот, AI-агент) читают только её - один запрос по client_id.
+
+Строка меняется относительными UPDATE в транзакции заказа или бонусной
+операции. При смене статуса, влияющей на учёт (отмена), метрики клиента
+пересчитываются целиком. reconcile() пересчитывает всех и исправляет
+расхождения - запускается планировщиком (только под supervisor.py) и
+rebuild_aggregates.py (при запуске через start_all.py - по cron).
+Таблицу, созданную create_all по старой модели (без alembic), при старте
+доводит до текущей ensure_schema().
+
+Суммы хранятся в тиынах (как total_spent в модели), отменённые заказы
+не учитываются - как в витрине продаж. Каждый заказ и каждая бонусная
+операция округляется до тиына отдельно одним и тем же SQL-выражением
+(_tiyn) и в приращениях, и в reconcile() - иначе сумма округлений
+расходилась бы с округлением суммы и сверка находила бы ложный дрейф.
+"""
+import logging
+
+from sqlalchemy import (
+    BigInteger, Float, and_, case, cast, delete, exists, func, insert, inspect, literal, or_, select, text, update
+)
+
+from database import upsert_insert
+from models.analytics import ClientMetrics
+from models.bonus import BonusTransaction
+from models.order import Order
+from models.user import Client, User
+from services.sales_rollup import EXCLUDED_STATUSES, counts
+
+logger = logging.getLogger(__name__)
+
+TIYN = 100
+
+table = ClientMetrics.__table__
+
+
+def _tiyn(amount):
+    """Сумма в тиынах (SQL); amount - колонка или число из Python"""
+    if amount is None or isinstance(amount, (int, float)):
+        amount = literal(float(amount or 0), Float)
+    return cast(func.round(amount * TIYN), BigInteger)
+
+
+def _ensure_row(db, client_id: int):
+    """Создать строку метрик клиента, если её ещё нет"""
+    source = (
+        select(Client.id, User.telegram_id)
+        .join(User, User.id == Client.user_id)
+        .where(Client.id == client_id)
+    )
+    dialect_insert = upsert_insert(db)
+    if dialect_insert is None:
+        if db.execute(select(table.c.id).where(table.c.client_id == client_id)).first() is None:
+            db.execute(insert(table).from_select(['client_id', 'telegram_id'], source))
+        return
+
+    db.execute(
+        dialect_insert(table)
+        .from_select(['client_id', 'telegram_id'], source)
+        .on_conflict_do_nothing(index_elements=['client_id'])
+    )
+
+
+def _increment(db, client_id: int, values: dict):
+    _ensure_row(db, client_id)
+    db.execute(
+        update(table)
+        .where(table.c.client_id == client_id)
+        .values(updated_at=func.now(), **values)
+    )
+
+
+def order_placed(db, order):
+    """Заказ создан (после flush, до commit)"""
+    if not counts(order.status):
+        return
+
+    created_at = order.created_at
+    _increment(db, order.client_id, {
+        'total_orders': func.coalesce(table.c.total_orders, 0) + 1,
+        'total_spent': func.coalesce(table.c.total_spent, 0) + _tiyn(order.total),
+        'total_paid': func.coalesce(table.c.total_paid, 0) + _tiyn(order.final_total),
+        'total_discount': func.coalesce(table.c.total_discount, 0) + _tiyn(order.discount_amount),
+        'first_order_at': func.coalesce(table.c.first_order_at, created_at),
+        'last_order_at': case(
+            (or_(table.c.last_order_at.is_(None), table.c.last_order_at < created_at), created_at),
+            else_=table.c.last_order_at
+        ),
+    })
+
+
+def bonus_recorded(db, client_id: int, earned: float = 0, used: float = 0):
+    """Бонусная операция записана (начисление earned / списание used, до commit)"""
+    if not earned and not used:
+        return
+
+    _increment(db, client_id, {
+        'total_bonus_earned': func.coalesce(table.c.total_bonus_earned, 0) + _tiyn(abs(earned)),
+        'total_bonus_used': func.coalesce(table.c.total_bonus_used, 0) + _tiyn(abs(used)),
+    })
+
+
+def status_changed(db, order, old_status: str):
+    """Статус заказа изменён: при отмене/возврате из отмены пересчитать клиента"""
+    if counts(old_status) == counts(order.status):
+        return
+    db.flush()
+    reconcile(db, [order.client_id])
+
+
+def _computed_columns():
+    """Значения метрик, посчитанные из заказов и бонусных операций"""
+    counted = and_(Order.client_id == table.c.client_id, Order.status.notin_(EXCLUDED_STATUSES))
+    bonuses = BonusTransaction.client_id == table.c.client_id
+
+    def scalar(expr, *where):
+        return select(expr).where(*where).scalar_subquery()
+
+    def tiyn_sum(column, *where):
+        # Округление каждой строки, как в order_placed/bonus_recorded
+        return scalar(func.coalesce(func.sum(_tiyn(func.coalesce(column, 0))), 0), *where)
+
+    return {
+        'total_orders': scalar(func.count(Order.id), counted),
+        'total_spent': tiyn_sum(Order.total, counted),
+        'total_paid': tiyn_sum(Order.final_total, counted),
+        'total_discount': tiyn_sum(Order.discount_amount, counted),
+        'first_order_at': scalar(func.min(Order.created_at), counted),
+        'last_order_at': scalar(func.max(Order.created_at), counted),
+        'total_bonus_earned': tiyn_sum(BonusTransaction.amount, bonuses, BonusTransaction.type == 'earn'),
+        'total_bonus_used': tiyn_sum(func.abs(BonusTransaction.amount), bonuses, BonusTransaction.type == 'spend'),
+    }
+
+
+def reconcile(db, client_ids=None) -> int:
+    """
+    Пересчитать метрики из заказов и бонусов
+
+    db - Session или Connection; commit делает вызывающий.
+
+    Returns:
+        число строк, которые разошлись с заказами и были исправлены
+    """
+    missing = (
+        select(Client.id, User.telegram_id)
+        .join(User, User.id == Client.user_id)
+        .where(~exists().where(table.c.client_id == Client.id))
+    )
+    if client_ids is not None:
+        missing = missing.where(Client.id.in_(client_ids))
+    db.execute(insert(table).from_select(['client_id', 'telegram_id'], missing))
+
+    computed = _computed_columns()
+    drifted = or_(*[table.c[name].is_distinct_from(value) for name, value in computed.items()])
+
+    stmt = update(table).where(drifted).values(updated_at=func.now(), **computed)
+    if client_ids is not None:
+        stmt = stmt.where(table.c.client_id.in_(client_ids))
+    return db.execute(stmt).rowcount
+
+
+def reconcile_all(bind) -> int:
+    """Пересчитать всех клиентов в отдельной транзакции (для планировщика)"""
+    with bind.begin() as conn:
+        drifted = reconcile(conn)
+    if drifted:
+        logger.warning(f"⚠️ Client metrics drift repaired: {drifted} clients")
+    else:
+        logger.info("✅ Client metrics in sync")
+    return drifted
+
+
+# Колонки, которых нет в таблице, созданной create_all по старой модели
+ADDED_COLUMNS = ('total_discount', 'total_paid')
+BONUS_COLUMNS = ('total_bonus_earned', 'total_bonus_used')
+CLIENT_ID_INDEX = 'ix_client_metrics_client_id'
+
+
+def ensure_schema(bind):
+    """
+    Довести таблицу, созданную create_all по старой модели, до текущей
+
+    create_all не меняет существующие таблицы, а _ensure_row опирается на
+    уникальный индекс по client_id (ON CONFLICT). Недостающие колонки
+    добавляются, дубли клиентов удаляются (остаётся строка с меньшим id),
+    индекс пересоздаётся уникальным. Бонусы в старой таблице хранились в
+    тенге - после добавления колонок все метрики пересчитываются.
+    """
+    try:
+        with bind.begin() as conn:
+            inspector = inspect(conn)
+            if table.name not in inspector.get_table_names():
+                return
+            columns = {c['name']: c['type'] for c in inspector.get_columns(table.name)}
+            missing = [name for name in ADDED_COLUMNS if name not in columns]
+            for name in missing:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {name} BIGINT"))
+            if conn.dialect.name == 'postgresql':
+                for name in BONUS_COLUMNS:
+                    if not isinstance(columns[name], BigInteger):
+                        conn.execute(text(f"ALTER TABLE {table.name} ALTER COLUMN {name} TYPE BIGINT"))
+
+            unique = any(
+                index['unique'] and index['column_names'] == ['client_id']
+                for index in inspector.get_indexes(table.name)
+            )
+            if not unique:
+                keep = select(func.min(table.c.id)).group_by(table.c.client_id)
+                duplicates = conn.execute(delete(table).where(table.c.id.notin_(keep))).rowcount
+                if duplicates:
+                    logger.warning(f"⚠️ Client metrics: removed {duplicates} duplicate rows")
+                conn.execute(text(f"DROP INDEX IF EXISTS {CLIENT_ID_INDEX}"))
+                conn.execute(text(f"CREATE UNIQUE INDEX {CLIENT_ID_INDEX} ON {table.name} (client_id)"))
+
+            if missing or not unique:
+                reconcile(conn)
+                logger.info("✅ Client metrics table upgraded")
+    except Exception as e:
+        logger.error(f"❌ Client metrics schema upgrade failed: {e}")
+
+
+def backfill_if_empty(bind):
+    """Заполнить метрики при первом запуске (таблицы создаются через create_all)"""
+    try:
+        with bind.connect() as conn:
+            if conn.execute(select(table.c.id).limit(1)).first() is not None:
+                return
+            if conn.execute(select(Client.id).limit(1)).first() is None:
+                return
+        reconcile_all(bind)
+        logger.info("📊 Client metrics backfilled")
+    except Exception as e:
+        logger.error(f"❌ Client metrics backfill failed: {e}")
+
+
+# ---------- Чтение ----------
+
+def summary(db, client_id: int) -> dict:
+    """Метрики клиента одним запросом; нули, если заказов ещё не было"""
+    row = db.query(ClientMetrics).filter(ClientMetrics.client_id == client_id).first()
+
+    total_orders = (row.total_orders or 0) if row else 0
+    total_spent = (row.total_spent or 0) / TIYN if row else 0.0
+    total_paid = (row.total_paid or 0) / TIYN if row else 0.0
+
+    return {
+        'total_orders': total_orders,
+        'total_spent': total_spent,
+        'total_paid': total_paid,
+        'total_saved': (row.total_discount or 0) / TIYN if row else 0.0,
+        'avg_order': total_spent / total_orders if total_orders > 0 else 0.0,
+        'avg_paid': total_paid / total_orders if total_orders > 0 else 0.0,
+        'first_order_at': row.first_order_at if row else None,
+        'last_order_at': row.last_order_at if row else None,
+        'total_bonus_earned': (row.total_bonus_earned or 0) / TIYN if row else 0.0,
+        'total_bonus_used': (row.total_bonus_used or 0) / TIYN if row else 0.0,
+    }
@@ -0,0 +1,184 @@
+"""
+Поиск клиентов для админки
+
+Поиск по company_name, bin_iin, contact_phone и username пользователя,
+фильтры по статусу, торговому представителю и менеджеру. Используется
+aiohttp-обработчиком get_clients и FastAPI admin_get_clients.
+
+Индексы:
+- PostgreSQL: pg_trgm GIN-индексы, ILIKE '%...%' идёт по ним
+- SQLite: FTS5-таблица clients_fts (токенайзер trigram, на старых версиях
+  unicode61 с поиском по префиксу), синхронизируется триггерами
+"""
+import logging
+from contextlib import contextmanager
+
+from sqlalchemy import or_, text
+from sqlalchemy.engine import Connection
+
+from models.user import Client, User
+
+logger = logging.getLogger(__name__)
+
+# Короче трёх символов trigram-индекс не помогает - ищем через LIKE
+MIN_INDEXED_LENGTH = 3
+
+PG_TRGM_INDEXES = (
+    ('ix_clients_company_name_trgm', 'clients', 'company_name'),
+    ('ix_clients_bin_iin_trgm', 'clients', 'bin_iin'),
+    ('ix_clients_contact_phone_trgm', 'clients', 'contact_phone'),
+    ('ix_users_username_trgm', 'users', 'username'),
+)
+
+FTS_COLUMNS = 'company_name, bin_iin, contact_phone, username'
+FTS_SELECT = (
+    "SELECT c.id, c.company_name, c.bin_iin, c.contact_phone, u.username "
+    "FROM clients c LEFT JOIN users u ON u.id = c.user_id"
+)
+FTS_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS clients_fts_ai AFTER INSERT ON clients BEGIN
+        INSERT INTO clients_fts(rowid, {FTS_COLUMNS})
+        SELECT new.id, new.company_name, new.bin_iin, new.contact_phone,
+               (SELECT username FROM users WHERE id = new.user_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS clients_fts_au AFTER UPDATE ON clients BEGIN
+        DELETE FROM clients_fts WHERE rowid = old.id;
+        INSERT INTO clients_fts(rowid, {FTS_COLUMNS})
+        SELECT new.id, new.company_name, new.bin_iin, new.contact_phone,
+               (SELECT username FROM users WHERE id = new.user_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS clients_fts_ad AFTER DELETE ON clients BEGIN
+        DELETE FROM clients_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS clients_fts_users_au AFTER UPDATE OF username ON users BEGIN
+        UPDATE clients_fts SET username = new.username
+        WHERE rowid IN (SELECT id FROM clients WHERE user_id = new.id);
+    END""",
+)
+
+
+@contextmanager
+def _transaction(bind):
+    # Из миграции приходит соединение с уже открытой транзакцией - работаем
+    # в savepoint, чтобы ошибка не оставила её прерванной
+    if isinstance(bind, Connection):
+        with bind.begin_nested():
+            yield bind
+    else:
+        with bind.begin() as conn:
+            yield conn
+
+
+def create_search_index(bind):
+    """
+    Создать индексы поиска клиентов, если их ещё нет
+
+    Идемпотентно. Ошибки (например, нет прав на CREATE EXTENSION pg_trgm)
+    пробрасываются - так их видит миграция Alembic.
+    """
+    dialect = bind.dialect.name
+    if dialect == 'postgresql':
+        _ensure_pg_trgm(bind)
+    elif dialect == 'sqlite':
+        _ensure_sqlite_fts(bind)
+
+
+def ensure_search_index(bind):
+    """
+    create_search_index() для старта приложения (таблицы создаются через
+    create_all): без индексов поиск работает через LIKE, поэтому ошибка
+    только логируется и не мешает запуску
+    """
+    try:
+        create_search_index(bind)
+    except Exception as e:
+        logger.error(f"❌ Client search index setup failed: {e}")
+
+
+def _ensure_pg_trgm(bind):
+    with _transaction(bind) as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        for name, table, column in PG_TRGM_INDEXES:
+            conn.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+            ))
+
+
+def _ensure_sqlite_fts(bind):
+    with _transaction(bind) as conn:
+        exists = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clients_fts'"
+        )).first()
+
+        if not exists:
+            try:
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE clients_fts USING fts5({FTS_COLUMNS}, tokenize='trigram')"
+                ))
+            except Exception:
+                # trigram есть только в SQLite >= 3.34
+                conn.execute(text(
+                    f"CREATE VIRTUAL TABLE clients_fts USING fts5({FTS_COLUMNS}, tokenize='unicode61')"
+                ))
+            conn.execute(text(f"INSERT INTO clients_fts(rowid, {FTS_COLUMNS}) {FTS_SELECT}"))
+            logger.info("🔎 clients_fts created")
+
+        for trigger in FTS_TRIGGERS:
+            conn.execute(text(trigger))
+
+
+def _sqlite_fts_tokenizer(db):
+    """'trigram', 'unicode61' или None, если FTS-таблицы нет"""
+    sql = db.execute(text(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'clients_fts'"
+    )).scalar()
+    if not sql:
+        return None
+    return 'trigram' if 'trigram' in sql else 'unicode61'
+
+
+def _like_filter(term: str):
+    pattern = f"%{term}%"
+    return or_(
+        Client.company_name.ilike(pattern),
+        Client.bin_iin.ilike(pattern),
+        Client.contact_phone.ilike(pattern),
+        Client.user.has(User.username.ilike(pattern)),
+    )
+
+
+def _search_filter(db, term: str):
+    if db.bind.dialect.name == 'sqlite':
+        tokenizer = _sqlite_fts_tokenizer(db)
+        if tokenizer == 'trigram' and len(term) >= MIN_INDEXED_LENGTH:
+            match = '"' + term.replace('"', '""') + '"'
+        elif tokenizer == 'unicode61':
+            match = '"' + term.replace('"', '""') + '"*'
+        else:
+            return _like_filter(term)
+        return Client.id.in_(
+            text("SELECT rowid FROM clients_fts WHERE clients_fts MATCH :match").bindparams(match=match)
+        )
+    return _like_filter(term)
+
+
+def search_clients(db, search: str = None, status: str = None,
+                   sales_rep_id: int = None, manager_id: int = None):
+    """
+    Запрос клиентов с поиском и фильтрами (без сортировки и лимита -
+    их добавляет keyset_page)
+    """
+    query = db.query(Client)
+
+    if status:
+        query = query.filter(Client.status == status)
+    if sales_rep_id:
+        query = query.filter(Client.sales_rep_id == sales_rep_id)
+    if manager_id:
+        query = query.filter(Client.manager_id == manager_id)
+
+    term = (search or '').strip()
+    if term:
+        query = query.filter(_search_filter(db, term))
+
+    return query
@@ -0,0 +1,179 @@
+"""
+Идемпотентные запросы (заголовок Idempotency-Key)
+
+WebApp повторяет оформление заказа при обрыве сети. С ключом повтор не
+выполняет заказ заново, а получает исходный ответ:
+
+1. LRU в памяти процесса - повтор отвечает без обращения к БД
+2. Повтор, пришедший пока первый запрос ещё выполняется, ждёт его результат
+3. Таблица idempotency_keys - ответ, записанный в транзакции заказа
+   (повтор пришёл в другой процесс или после перезапуска)
+
+Ключ с другим телом запроса - ошибка 422. Сохраняются только успешные
+ответы: после ошибки клиент может повторить с тем же ключом. Ключи живут
+IDEMPOTENCY_TTL секунд. Просроченные удаляет purge_expired() при старте и
+по расписанию (планировщик работает только под supervisor.py), а также
+save() - не чаще раза в IDEMPOTENCY_PURGE_INTERVAL секунд на процесс,
+поэтому таблица не растёт и без планировщика (start_all.py).
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete
+
+from models.idempotency import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 100
+
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "3600"))
+
+StoredResponse = namedtuple('StoredResponse', 'request_hash status body expires_at')
+
+
+def request_hash(data) -> str:
+    """sha256 тела запроса (порядок ключей не важен)"""
+    payload = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Ответы на запросы одного типа (scope) по ключу идемпотентности"""
+
+    def __init__(self, scope: str, ttl: int = IDEMPOTENCY_TTL, cache_size: int = IDEMPOTENCY_CACHE_SIZE,
+                 purge_interval: int = IDEMPOTENCY_PURGE_INTERVAL):
+        self.scope = scope
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.purge_interval = purge_interval
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._purged_at = None
+        # key -> asyncio.Future с StoredResponse (или None) выполняющегося запроса
+        self._inflight = {}
+
+    # ---------- Память ----------
+
+    def cached(self, key: str):
+        with self._lock:
+            stored = self._cache.get(key)
+            if stored is None:
+                return None
+            if stored.expires_at <= time.time():
+                del self._cache[key]
+                return None
+            self._cache.move_to_end(key)
+            return stored
+
+    def remember(self, key: str, stored: StoredResponse):
+        with self._lock:
+            self._cache[key] = stored
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    # ---------- Запросы в работе ----------
+
+    def inflight(self, key: str):
+        """Future выполняющегося запроса с этим ключом (в этом процессе) или None"""
+        return self._inflight.get(key)
+
+    def begin(self, key: str):
+        """Отметить запрос как выполняющийся; вернуть его future для finish()"""
+        future = asyncio.get_running_loop().create_future()
+        self._inflight.setdefault(key, future)
+        return future
+
+    def finish(self, key: str, future, stored: StoredResponse = None):
+        """Запрос завершён: запомнить ответ и разбудить ждущие повторы"""
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if stored is not None:
+            self.remember(key, stored)
+        if not future.done():
+            future.set_result(stored)
+
+    # ---------- БД ----------
+
+    def lookup(self, db, key: str):
+        """Сохранённый ответ: память, затем БД"""
+        stored = self.cached(key)
+        if stored is not None:
+            return stored
+
+        row = db.query(IdempotencyKey).filter(
+            IdempotencyKey.scope == self.scope,
+            IdempotencyKey.key == key,
+            IdempotencyKey.expires_at > datetime.utcnow()
+        ).first()
+        if row is None:
+            return None
+        stored = StoredResponse(
+            row.request_hash, row.status_code, row.response_body,
+            time.time() + (row.expires_at - datetime.utcnow()).total_seconds()
+        )
+        self.remember(key, stored)
+        return stored
+
+    def _purge_due(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            if self._purged_at is not None and now - self._purged_at < self.purge_interval:
+                return False
+            self._purged_at = now
+            return True
+
+    def save(self, db, key: str, fingerprint: str, status: int, body: str) -> StoredResponse:
+        """
+        Записать ответ в транзакцию запроса (commit делает вызывающий)
+
+        Повтор, выполненный одновременно в другом процессе, упадёт на
+        первичном ключе при commit - тогда ответ берётся через lookup().
+        """
+        now = datetime.utcnow()
+        # Просроченный ключ с тем же значением не должен мешать вставке;
+        # время от времени заодно удаляются все просроченные ключи scope
+        expired = [IdempotencyKey.scope == self.scope, IdempotencyKey.expires_at <= now]
+        if not self._purge_due():
+            expired.append(IdempotencyKey.key == key)
+        db.execute(delete(IdempotencyKey).where(*expired))
+        db.add(IdempotencyKey(
+            scope=self.scope,
+            key=key,
+            request_hash=fingerprint,
+            status_code=status,
+            response_body=body,
+            created_at=now,
+            expires_at=now + timedelta(seconds=self.ttl)
+        ))
+        return StoredResponse(fingerprint, status, body, time.time() + self.ttl)
+
+
+def purge_expired(bind) -> int:
+    """Удалить просроченные ключи всех типов"""
+    try:
+        with bind.begin() as conn:
+            deleted = conn.execute(
+                delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow())
+            ).rowcount
+        if deleted:
+            logger.info(f"🧹 Idempotency keys purged: {deleted}")
+        return deleted
+    except Exception as e:
+        logger.error(f"❌ Idempotency keys purge failed: {e}")
+        return 0
+
+
+order_requests = IdempotencyStore('orders.create')
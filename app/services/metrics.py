@@ -0,0 +1,231 @@
+"""
+Метрики процесса в текстовом формате Prometheus
+
+Небольшой реестр (Counter / Gauge / Histogram) без внешних зависимостей:
+middleware записывают время и статус ответа по шаблону роута, число
+SQL-запросов и время в БД на запрос; состояние пула соединений читается
+в момент сбора. Всё отдаётся на /metrics (доступ - по METRICS_TOKEN).
+
+Метрики живут в памяти процесса: бот и API считают каждый своё.
+"""
+import hmac
+import os
+import threading
+from bisect import bisect_left
+
+from database import get_pool_stats
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы гистограмм (секунды / штуки)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels) -> tuple:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}")
+        return tuple(str(value) for value in labels)
+
+    def _header(self) -> list:
+        return [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.type_name}',
+        ]
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def inc(self, *labels, amount: float = 1):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self) -> list:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f'{self.name}{_labels(self.labelnames, key)} {_number(value)}' for key, value in items
+        ]
+
+
+class Gauge(Counter):
+    type_name = 'gauge'
+
+    def set(self, *labels, value: float):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels, value: float):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [счётчики по корзинам (без накопления)..., +Inf], сумма
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def collect(self) -> list:
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+
+        lines = self._header()
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                lines.append(
+                    f'{self.name}_bucket{_labels(self.labelnames, key, [("le", _number(float(bound)))])} {cumulative}'
+                )
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, key)} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, func):
+        """Функция, которая обновляет метрики перед выдачей (например, пул)"""
+        self._collectors.append(func)
+        return func
+
+    def render(self) -> str:
+        for collect in self._collectors:
+            collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+# ---------- HTTP ----------
+
+http_requests_total = registry.register(Counter(
+    'http_requests_total', 'HTTP requests by route template and status',
+    ('app', 'method', 'route', 'status')
+))
+http_request_duration_seconds = registry.register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route template',
+    ('app', 'method', 'route')
+))
+http_requests_in_flight = registry.register(Gauge(
+    'http_requests_in_flight', 'HTTP requests being processed', ('app',)
+))
+http_requests_rejected_total = registry.register(Counter(
+    'http_requests_rejected_total', 'HTTP requests rejected by rate limit or load shedding',
+    ('app', 'route', 'reason')
+))
+event_loop_lag_seconds = registry.register(Gauge(
+    'event_loop_lag_seconds', 'Recent event loop scheduling delay', ('app',)
+))
+
+# ---------- БД ----------
+
+db_statements_per_request = registry.register(Histogram(
+    'db_statements_per_request', 'SQL statements executed per HTTP request',
+    ('app', 'route'), buckets=STATEMENT_BUCKETS
+))
+db_time_per_request_seconds = registry.register(Histogram(
+    'db_time_per_request_seconds', 'Time spent in SQL statements per HTTP request',
+    ('app', 'route')
+))
+db_statements_total = registry.register(Counter(
+    'db_statements_total', 'SQL statements executed by route template', ('app', 'route')
+))
+db_pool = registry.register(Gauge(
+    'db_pool', 'Database connection pool state (see /api/admin/stats/db_pool)', ('stat',)
+))
+
+POOL_STATS = (
+    'size', 'checked_out', 'checked_in', 'overflow',
+    'acquisitions', 'timeouts', 'wait_total_ms', 'wait_max_ms', 'wait_recent_ms',
+)
+
+
+@registry.add_collector
+def _collect_pool():
+    stats = get_pool_stats()
+    for name in POOL_STATS:
+        if isinstance(stats.get(name), (int, float)):
+            db_pool.set(name, value=stats[name])
+
+
+def observe_request(app: str, method: str, route: str, status: int, duration: float, scope=None):
+    """Записать завершённый HTTP-запрос (scope - QueryScope этого запроса)"""
+    http_requests_total.inc(app, method, route, status)
+    http_request_duration_seconds.observe(app, method, route, value=duration)
+    if scope is not None:
+        db_statements_per_request.observe(app, route, value=scope.statements)
+        db_time_per_request_seconds.observe(app, route, value=scope.db_time)
+        if scope.statements:
+            db_statements_total.inc(app, route, amount=scope.statements)
+
+
+def render() -> str:
+    return registry.render()
+
+
+def is_authorized(authorization: str) -> bool:
+    """
+    Доступ к /metrics: Authorization: "Bearer <METRICS_TOKEN>"
+
+    Без METRICS_TOKEN /metrics закрыт. telegram_id администраторов не
+    подходит - он публичный (render.yaml).
+    """
+    if not METRICS_TOKEN or not authorization:
+        return False
+    return hmac.compare_digest(authorization.strip().encode(), f'Bearer {METRICS_TOKEN}'.encode())
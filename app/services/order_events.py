@@ -0,0 +1,33 @@
+"""
+События заказов для агрегатов
+
+Все места, где создаётся заказ или меняется его статус, вызывают эти
+функции в своей транзакции - до commit, после flush. Так агрегаты
+меняются вместе с заказом или не меняются вовсе.
+"""
+from models.order import OrderItem
+from services import client_metrics, product_affinity, sales_rollup
+
+
+def order_placed(db, order, lines=None, client=None):
+    """
+    Заказ создан
+
+    Args:
+        lines: [(product_id, quantity, price)]; если None - читаются из order_items
+        client: клиент заказа, если уже загружен
+    """
+    if lines is None:
+        lines = db.query(OrderItem.product_id, OrderItem.quantity, OrderItem.price).filter(
+            OrderItem.order_id == order.id
+        ).all()
+
+    sales_rollup.record_order(db, order, lines, client)
+    client_metrics.order_placed(db, order)
+    product_affinity.record_order(db, order, lines)
+
+
+def order_status_changed(db, order, old_status: str):
+    """Статус заказа изменён (order.status уже новый)"""
+    sales_rollup.status_changed(db, order, old_status)
+    client_metrics.status_changed(db, order, old_status)
@@ -0,0 +1,146 @@
+"""
+Номера заказов без коллизий (ORD-0000123)
+
+Процесс резервирует блок из ORDER_NUMBER_BLOCK номеров за один запрос к БД
+и выдаёт их из памяти, поэтому оформление заказа не ждёт БД ради номера и
+никогда не упирается в уникальный индекс:
+- PostgreSQL: nextval('order_number_seq') по generate_series - одна выборка
+  на блок; последовательность не транзакционная и не блокирует заказы
+- SQLite и остальные: таблица order_number_counters, UPDATE ... RETURNING
+  в отдельной короткой транзакции
+
+Номера, не выданные до перезапуска процесса, теряются - в нумерации
+бывают пропуски, но не повторы.
+"""
+import logging
+import os
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+from sqlalchemy import func, insert, select, text, update
+from sqlalchemy.engine import Connection
+
+from database import engine
+from models.order import Order, OrderNumberCounter
+
+logger = logging.getLogger(__name__)
+
+ORDER_NUMBER_BLOCK = int(os.getenv("ORDER_NUMBER_BLOCK", "20"))
+ORDER_NUMBER_FORMAT = "ORD-{:07d}"
+
+SEQUENCE_NAME = 'order_number_seq'
+COUNTER_NAME = 'orders'
+
+
+def format_order_number(number: int) -> str:
+    return ORDER_NUMBER_FORMAT.format(number)
+
+
+def _existing_floor(conn) -> int:
+    # Заказы, загруженные в обход счётчика (генератор данных), имеют номер ORD-{id}
+    return conn.execute(select(func.coalesce(func.max(Order.id), 0))).scalar() or 0
+
+
+@contextmanager
+def _transaction(bind):
+    # Из миграции приходит соединение с уже открытой транзакцией
+    if isinstance(bind, Connection):
+        yield bind
+    else:
+        with bind.begin() as conn:
+            yield conn
+
+
+def ensure_counter(bind):
+    """
+    Создать последовательность / строку счётчика и поднять их выше
+    существующих заказов. Идемпотентно: старт приложения и миграция.
+    """
+    try:
+        with _transaction(bind) as conn:
+            floor = _existing_floor(conn)
+            if conn.dialect.name == 'postgresql':
+                conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME}"))
+                conn.execute(text(
+                    f"SELECT setval('{SEQUENCE_NAME}', :floor) "
+                    f"WHERE :floor > (SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM {SEQUENCE_NAME})"
+                ), {'floor': floor})
+                return
+
+            current = conn.execute(
+                select(OrderNumberCounter.value).where(OrderNumberCounter.name == COUNTER_NAME)
+            ).scalar()
+            if current is None:
+                conn.execute(insert(OrderNumberCounter).values(name=COUNTER_NAME, value=floor))
+            elif current < floor:
+                conn.execute(
+                    update(OrderNumberCounter)
+                    .where(OrderNumberCounter.name == COUNTER_NAME)
+                    .values(value=floor)
+                )
+    except Exception as e:
+        logger.error(f"❌ Order number counter setup failed: {e}")
+
+
+class OrderNumberAllocator:
+    """Выдаёт номера из зарезервированного блока; блок - один запрос к БД"""
+
+    def __init__(self, bind, block_size: int = ORDER_NUMBER_BLOCK):
+        self.bind = bind
+        self.block_size = max(1, block_size)
+        self._numbers = deque()
+        self._lock = threading.Lock()
+
+    def next_number(self) -> int:
+        with self._lock:
+            if not self._numbers:
+                self._numbers.extend(self._reserve(self.block_size))
+            return self._numbers.popleft()
+
+    def next(self) -> str:
+        """Следующий номер заказа (ORD-0000123)"""
+        return format_order_number(self.next_number())
+
+    def reset(self):
+        """Забыть блок (после fork - у дочернего процесса должен быть свой)"""
+        self._numbers = deque()
+        self._lock = threading.Lock()
+
+    def _reserve(self, count: int) -> list:
+        # Отдельная транзакция: блок не откатывается вместе с заказом
+        with self.bind.begin() as conn:
+            if conn.dialect.name == 'postgresql':
+                return list(conn.execute(
+                    text(f"SELECT nextval('{SEQUENCE_NAME}') FROM generate_series(1, :count)"),
+                    {'count': count}
+                ).scalars())
+            return self._reserve_from_counter(conn, count)
+
+    def _reserve_from_counter(self, conn, count: int) -> list:
+        stmt = (
+            update(OrderNumberCounter)
+            .where(OrderNumberCounter.name == COUNTER_NAME)
+            .values(value=OrderNumberCounter.value + count)
+        )
+        if conn.dialect.update_returning:
+            last = conn.execute(stmt.returning(OrderNumberCounter.value)).scalar()
+        else:
+            last = None
+            if conn.execute(stmt).rowcount:
+                last = conn.execute(
+                    select(OrderNumberCounter.value).where(OrderNumberCounter.name == COUNTER_NAME)
+                ).scalar()
+
+        if last is None:
+            # Счётчик ещё не создан (старт без ensure_counter)
+            last = _existing_floor(conn) + count
+            conn.execute(insert(OrderNumberCounter).values(name=COUNTER_NAME, value=last))
+        return list(range(last - count + 1, last + 1))
+
+
+order_numbers = OrderNumberAllocator(engine)
+
+# Процессы, запущенные через fork, не должны делить блок с родителем
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=order_numbers.reset)
@@ -0,0 +1,627 @@
+"""
+Фото товаров для /api/photo/{file_id}
+
+Источники оригиналов:
+- local_* - файлы, загруженные через админку (PHOTO_DIR/originals)
+- остальные id - file_id Telegram, скачиваются один раз через Bot API
+
+Размеры (thumb / card / full) и форматы (JPEG / WebP) генерируются Pillow
+в пуле процессов и кэшируются в два уровня: LRU в памяти (ограничен по
+байтам) перед кэшем на диске (PHOTO_DISK_CACHE_MB, вытесняются давно не
+читанные файлы).
+
+Версия из ссылки (?v=) сверяется с хэшем текущего оригинала: чужая версия -
+404, поэтому ответ с ?v= всегда соответствует этой версии, а подбор ?v= не
+плодит файлы в кэше. Неудачный поиск file_id в Telegram запоминается на
+PHOTO_MISS_TTL секунд.
+
+Загрузка из админки: файл потоково пишется на диск с ограничением размера,
+нормализуется в пуле процессов (EXIF-поворот, sRGB, максимальный размер),
+после чего все размеры генерируются заранее. Хэш содержимого сохраняется
+в Product.photo_hash и попадает в ссылку (?v=), поэтому кэши браузеров и
+CDN не отдают старое фото.
+"""
+import asyncio
+import hashlib
+import io
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import aiohttp
+from sqlalchemy import inspect, text
+
+from models.product import Product
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHOTO_DIR = os.getenv("PHOTO_DIR", os.path.join(BASE_DIR, "media", "photos"))
+PHOTO_WORKERS = int(os.getenv("PHOTO_WORKERS", "2"))
+PHOTO_MEMORY_CACHE_MB = int(os.getenv("PHOTO_MEMORY_CACHE_MB", "32"))
+PHOTO_DISK_CACHE_MB = int(os.getenv("PHOTO_DISK_CACHE_MB", "1024"))
+PHOTO_MISS_TTL = int(os.getenv("PHOTO_MISS_TTL", "60"))
+PHOTO_MAX_UPLOAD_MB = int(os.getenv("PHOTO_MAX_UPLOAD_MB", "10"))
+PHOTO_MAX_ARCHIVE_MB = int(os.getenv("PHOTO_MAX_ARCHIVE_MB", "200"))
+# Оригинал после нормализации не больше этой стороны
+PHOTO_MAX_SIDE = int(os.getenv("PHOTO_MAX_SIDE", "2000"))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff', '.heic')
+# Можно указать локальный стенд вместо api.telegram.org
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "https://api.telegram.org").rstrip('/')
+
+# Максимальная сторона для каждого размера
+VARIANTS = {
+    'thumb': 200,
+    'card': 600,
+    'full': 1600,
+}
+DEFAULT_VARIANT = 'card'
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+}
+
+FILE_ID_RE = re.compile(r'^[A-Za-z0-9_-]{1,256}$')
+# Сколько неудачных file_id помнить (запросы с выдуманными id)
+MISSES_MAX_ENTRIES = 10000
+# После вытеснения кэш на диске занимает не больше этой доли лимита
+DISK_CACHE_PRUNE_TO = 0.9
+
+
+class PhotoNotFound(Exception):
+    """Фото нет ни локально, ни в Telegram"""
+
+
+class PhotoTooLarge(Exception):
+    """Загружаемый файл больше допустимого размера"""
+
+
+class InvalidPhoto(Exception):
+    """Файл не является корректным изображением"""
+
+
+def normalize_photo(source_path: str, target_path: str, max_side: int) -> str:
+    """
+    Проверить и нормализовать загруженное фото, сохранить как JPEG
+
+    EXIF-поворот, перевод в sRGB по ICC-профилю, прозрачность на белом
+    фоне, ограничение размера. Выполняется в отдельном процессе.
+
+    Returns:
+        sha256 итогового файла
+    """
+    from PIL import Image, ImageCms, ImageOps
+
+    try:
+        with Image.open(source_path) as probe:
+            probe.verify()
+
+        with Image.open(source_path) as img:
+            img = ImageOps.exif_transpose(img)
+
+            icc_profile = img.info.get('icc_profile')
+            if icc_profile:
+                try:
+                    img = ImageCms.profileToProfile(
+                        img,
+                        ImageCms.ImageCmsProfile(io.BytesIO(icc_profile)),
+                        ImageCms.createProfile('sRGB'),
+                        outputMode='RGBA' if img.mode in ('RGBA', 'LA') else 'RGB'
+                    )
+                except (ImageCms.PyCMSError, OSError, ValueError):
+                    # Битый профиль - просто конвертируем как есть
+                    pass
+
+            if img.mode in ('RGBA', 'LA', 'P'):
+                img = img.convert('RGBA')
+                background = Image.new('RGB', img.size, (255, 255, 255))
+                background.paste(img, mask=img.getchannel('A'))
+                img = background
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            out = io.BytesIO()
+            img.save(out, 'JPEG', quality=90, optimize=True)
+    except (OSError, SyntaxError, ValueError, Image.DecompressionBombError) as e:
+        raise InvalidPhoto(str(e))
+
+    body = out.getvalue()
+    tmp_path = f"{target_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, target_path)
+    return hashlib.sha256(body).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """sha256 файла (как Product.photo_hash после normalize_photo)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def prune_cache_dir(cache_dir: str, max_bytes: int) -> int:
+    """
+    Удалить давно не читанные файлы кэша, если он больше max_bytes
+
+    Returns:
+        размер кэша после очистки
+    """
+    files = []
+    total = 0
+    for dirpath, _, filenames in os.walk(cache_dir):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+            total += stat.st_size
+    if total <= max_bytes:
+        return total
+
+    target = max_bytes * DISK_CACHE_PRUNE_TO
+    files.sort()
+    removed = 0
+    for _, size, path in files:
+        if total <= target:
+            break
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+        try:
+            os.removedirs(os.path.dirname(path))
+        except OSError:
+            pass
+    logger.info(f"🧹 Photo cache pruned: {removed} files, {total // (1024 * 1024)} MB left")
+    return total
+
+
+def render_variant(source_path: str, max_side: int, fmt: str) -> bytes:
+    """
+    Уменьшить изображение и закодировать в нужный формат
+
+    Выполняется в отдельном процессе (ProcessPoolExecutor).
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source_path) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ('RGB', 'RGBA') or (fmt == 'JPEG' and img.mode == 'RGBA'):
+            img = img.convert('RGB')
+        img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+        out = io.BytesIO()
+        if fmt == 'WEBP':
+            img.save(out, 'WEBP', quality=80, method=4)
+        else:
+            img.save(out, 'JPEG', quality=82, optimize=True, progressive=True)
+        return out.getvalue()
+
+
+class PhotoMemoryCache:
+    """LRU готовых изображений, ограниченный суммарным размером"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+            return body
+
+    def put(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self._items[key] = body
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+    def drop(self, file_id: str):
+        with self._lock:
+            for key in [k for k in self._items if k[0] == file_id]:
+                self.size -= len(self._items.pop(key))
+
+
+class PhotoService:
+    """Поиск оригинала, генерация размеров и кэширование"""
+
+    def __init__(self, photo_dir: str = PHOTO_DIR, workers: int = PHOTO_WORKERS,
+                 memory_cache_mb: int = PHOTO_MEMORY_CACHE_MB, disk_cache_mb: int = PHOTO_DISK_CACHE_MB):
+        self.photo_dir = photo_dir
+        self.originals_dir = os.path.join(photo_dir, 'originals')
+        self.cache_dir = os.path.join(photo_dir, 'cache')
+        self.workers = workers
+        self.memory = PhotoMemoryCache(memory_cache_mb * 1024 * 1024)
+        self.disk_cache_bytes = disk_cache_mb * 1024 * 1024
+        self._pool = None
+        # Одна загрузка/генерация на ключ, даже если запросов много
+        self._inflight = {}
+        # file_id -> (mtime, size, версия) оригинала
+        self._versions = {}
+        # file_id -> monotonic, до которого Telegram не спрашиваем
+        self._misses = OrderedDict()
+        # Размер кэша на диске: None - ещё не считали
+        self._disk_usage = None
+        self._pruning = None
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def run_in_pool(self, func, *args):
+        """Выполнить CPU-задачу (Pillow) в пуле процессов"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pool, func, *args)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    # ---------- Оригиналы ----------
+
+    def original_path(self, file_id: str) -> str:
+        return os.path.join(self.originals_dir, file_id)
+
+    def _cache_path(self, file_id: str, version: str, variant: str, fmt: str) -> str:
+        return os.path.join(self.cache_dir, file_id, version or '_', f'{variant}.{fmt}')
+
+    async def _ensure_original(self, file_id: str) -> str:
+        path = self.original_path(file_id)
+        if os.path.exists(path):
+            return path
+        if file_id.startswith('local_'):
+            raise PhotoNotFound(file_id)
+
+        missed_until = self._misses.get(file_id)
+        if missed_until is not None:
+            if time.monotonic() < missed_until:
+                raise PhotoNotFound(file_id)
+            del self._misses[file_id]
+        try:
+            await self._single_flight(('original', file_id), self._download_from_telegram, file_id, path)
+        except (PhotoNotFound, aiohttp.ClientError, asyncio.TimeoutError, KeyError, ValueError) as e:
+            # Выдуманный или недоступный file_id не должен каждый раз идти в Telegram
+            self._misses[file_id] = time.monotonic() + PHOTO_MISS_TTL
+            while len(self._misses) > MISSES_MAX_ENTRIES:
+                self._misses.popitem(last=False)
+            if isinstance(e, PhotoNotFound):
+                raise
+            raise PhotoNotFound(file_id) from e
+        return path
+
+    async def _original_version(self, file_id: str, path: str) -> str:
+        """Версия (?v=) текущего оригинала; пересчитывается, если файл заменён"""
+        stat = os.stat(path)
+        cached = self._versions.get(file_id)
+        if cached is not None and cached[:2] == (stat.st_mtime, stat.st_size):
+            return cached[2]
+        loop = asyncio.get_running_loop()
+        version = photo_version(await loop.run_in_executor(None, file_digest, path))
+        self._versions[file_id] = (stat.st_mtime, stat.st_size, version)
+        return version
+
+    async def _download_from_telegram(self, file_id: str, path: str):
+        """Скачать файл по file_id через Bot API (getFile + file/bot...)"""
+        token = os.getenv("BOT_TOKEN", "")
+        api = f"{TELEGRAM_API_URL}/bot{token}"
+        timeout = aiohttp.ClientTimeout(total=30)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            async with session.get(f"{api}/getFile", params={'file_id': file_id}) as resp:
+                data = await resp.json(content_type=None)
+            if not data.get('ok'):
+                raise PhotoNotFound(file_id)
+
+            file_path = data['result']['file_path']
+            url = f"{TELEGRAM_API_URL}/file/bot{token}/{file_path}"
+            async with session.get(url) as resp:
+                if resp.status != 200:
+                    raise PhotoNotFound(file_id)
+                body = await resp.read()
+
+        os.makedirs(self.originals_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        logger.info(f"📥 Photo downloaded from Telegram: {file_id} ({len(body)} bytes)")
+
+    # ---------- Размеры ----------
+
+    async def get(self, file_id: str, variant: str, fmt: str, version: str = '') -> bytes:
+        """
+        Готовое изображение: память -> диск -> генерация
+
+        version - хэш содержимого из ссылки (?v=); входит в ключ кэша, чтобы
+        после замены фото не отдавался старый размер из другого процесса.
+        Размер генерируется, только если version совпадает с текущим
+        оригиналом (иначе PhotoNotFound), так что в кэше под version лежит
+        именно эта версия.
+        """
+        if not FILE_ID_RE.match(file_id) or (version and not FILE_ID_RE.match(version)):
+            raise PhotoNotFound(file_id)
+
+        key = (file_id, version, variant, fmt)
+        body = self.memory.get(key)
+        if body is not None:
+            return body
+
+        cache_path = self._cache_path(file_id, version, variant, fmt)
+        try:
+            with open(cache_path, 'rb') as f:
+                body = f.read()
+        except FileNotFoundError:
+            body = await self._single_flight(key, self._render, file_id, version, variant, fmt, cache_path)
+        else:
+            touch(cache_path)
+
+        self.memory.put(key, body)
+        return body
+
+    async def _render(self, file_id: str, version: str, variant: str, fmt: str, cache_path: str) -> bytes:
+        source = await self._ensure_original(file_id)
+        if version and version != await self._original_version(file_id, source):
+            raise PhotoNotFound(file_id)
+        body = await self.run_in_pool(render_variant, source, VARIANTS[variant], FORMATS[fmt][0])
+
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(body)
+        os.replace(tmp_path, cache_path)
+        self._disk_cache_written(len(body))
+        return body
+
+    def _disk_cache_written(self, size: int):
+        """Учесть новый файл кэша; при превышении лимита - очистка в фоне"""
+        if self._disk_usage is not None:
+            self._disk_usage += size
+            if self._disk_usage <= self.disk_cache_bytes:
+                return
+        if self._pruning is None or self._pruning.done():
+            self._pruning = asyncio.ensure_future(self._prune_disk_cache())
+
+    async def _prune_disk_cache(self):
+        loop = asyncio.get_running_loop()
+        try:
+            self._disk_usage = await loop.run_in_executor(
+                None, prune_cache_dir, self.cache_dir, self.disk_cache_bytes
+            )
+        except Exception as e:
+            logger.error(f"❌ Photo cache prune failed: {e}")
+
+    async def _single_flight(self, key, func, *args):
+        future = self._inflight.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = asyncio.ensure_future(func(*args))
+        self._inflight[key] = future
+        try:
+            return await future
+        finally:
+            self._inflight.pop(key, None)
+
+    def invalidate(self, file_id: str):
+        """Сбросить все размеры фото (после замены оригинала)"""
+        self.memory.drop(file_id)
+        self._versions.pop(file_id, None)
+        shutil.rmtree(os.path.join(self.cache_dir, file_id), ignore_errors=True)
+
+    # ---------- Загрузка ----------
+
+    def incoming_path(self) -> str:
+        """Временный файл для приёма загрузки"""
+        incoming_dir = os.path.join(self.photo_dir, 'incoming')
+        os.makedirs(incoming_dir, exist_ok=True)
+        return os.path.join(incoming_dir, uuid.uuid4().hex)
+
+    async def receive(self, field, max_bytes: int) -> str:
+        """
+        Потоково записать multipart-поле во временный файл
+
+        Raises:
+            PhotoTooLarge: если поле больше max_bytes
+        """
+        path = self.incoming_path()
+        size = 0
+        try:
+            with open(path, 'wb') as f:
+                while True:
+                    chunk = await field.read_chunk(UPLOAD_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise PhotoTooLarge(f"Файл больше {max_bytes // (1024 * 1024)} МБ")
+                    f.write(chunk)
+        except BaseException:
+            remove_temp(path)
+            raise
+        return path
+
+    async def store(self, file_id: str, source_path: str) -> str:
+        """
+        Нормализовать загруженный файл, заменить оригинал и заранее
+        сгенерировать все размеры
+
+        Returns:
+            sha256 нового оригинала
+        """
+        os.makedirs(self.originals_dir, exist_ok=True)
+        digest = await self.run_in_pool(normalize_photo, source_path, self.original_path(file_id), PHOTO_MAX_SIDE)
+        self.invalidate(file_id)
+
+        version = photo_version(digest)
+        await asyncio.gather(*(
+            self.get(file_id, variant, fmt, version)
+            for variant in VARIANTS
+            for fmt in FORMATS
+        ))
+        logger.info(f"🖼 Photo stored: {file_id} v{version}")
+        return digest
+
+
+class PhotoImportJob:
+    """Пакетный импорт фото из zip-архива с прогрессом"""
+
+    def __init__(self, filename: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.filename = filename
+        self.status = 'pending'
+        self.total = 0
+        self.processed = 0
+        self.succeeded = 0
+        self.errors = []
+        self.created_at = time.time()
+        self.finished_at = None
+        self.task = None
+
+    def fail(self, name: str, reason: str):
+        self.errors.append(f"{name}: {reason}")
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.id,
+            'filename': self.filename,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'succeeded': self.succeeded,
+            'failed': len(self.errors),
+            'progress': round(self.processed / self.total * 100, 1) if self.total else 0.0,
+            'errors': self.errors[-50:],
+        }
+
+
+class PhotoImportJobs:
+    """Последние задачи импорта (в памяти процесса)"""
+
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self._jobs = OrderedDict()
+
+    def create(self, filename: str) -> PhotoImportJob:
+        job = PhotoImportJob(filename)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.keep:
+            self._jobs.popitem(last=False)
+        return job
+
+    def get(self, job_id: str):
+        return self._jobs.get(job_id)
+
+
+def list_archive_images(archive_path: str, max_entry_bytes: int) -> list:
+    """
+    Изображения в zip-архиве: [(имя в архиве, имя файла без расширения)]
+
+    Служебные файлы macOS и каталоги пропускаются; слишком большие записи
+    возвращаются с пустым stem, чтобы их можно было отметить как ошибку.
+    """
+    try:
+        with zipfile.ZipFile(archive_path) as archive:
+            entries = []
+            for info in archive.infolist():
+                name = info.filename
+                base = os.path.basename(name)
+                if info.is_dir() or name.startswith('__MACOSX/') or base.startswith('.'):
+                    continue
+                stem, ext = os.path.splitext(base)
+                if ext.lower() not in IMAGE_EXTENSIONS:
+                    continue
+                entries.append((name, stem if info.file_size <= max_entry_bytes else ''))
+            return entries
+    except zipfile.BadZipFile as e:
+        raise InvalidPhoto(str(e))
+
+
+def extract_archive_entry(archive_path: str, name: str, target_path: str):
+    """Распаковать одну запись архива в файл"""
+    with zipfile.ZipFile(archive_path) as archive, archive.open(name) as src, open(target_path, 'wb') as dst:
+        shutil.copyfileobj(src, dst, UPLOAD_CHUNK_SIZE)
+
+
+def photo_version(digest: str) -> str:
+    """Короткая версия фото для ссылок (?v=)"""
+    return digest[:12]
+
+
+def photo_url(file_id: str, digest: str = None) -> str:
+    """Ссылка на фото товара для WebApp"""
+    if digest:
+        return f'/api/photo/{file_id}?v={photo_version(digest)}'
+    return f'/api/photo/{file_id}'
+
+
+def touch(path: str):
+    """Отметить чтение файла кэша: по mtime вытесняются давно не читанные"""
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+
+def remove_temp(path: str):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def photo_etag(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def ensure_photo_hash(bind):
+    """
+    Добавить products.photo_hash в таблицу, созданную create_all до этой колонки
+
+    create_all не меняет существующие таблицы, а без колонки не читается ни
+    один Product (каталог, загрузка фото). То же делает миграция 5c8e2f1a9d34.
+    """
+    table = Product.__table__
+    try:
+        with bind.begin() as conn:
+            columns = {c['name'] for c in inspect(conn).get_columns(table.name)}
+            if 'photo_hash' not in columns:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN photo_hash VARCHAR(64)"))
+                logger.info("✅ products.photo_hash added")
+    except Exception as e:
+        logger.error(f"❌ products.photo_hash setup failed: {e}")
+
+
+# Глобальные экземпляры
+photo_service = PhotoService()
+photo_jobs = PhotoImportJobs()
@@ -0,0 +1,208 @@
+"""
+Избранные товары клиента и «пора заказать» (client_product_affinity)
+
+Строка на пару клиент × товар: сколько купил, в скольких заказах, когда
+впервые и последний раз, средний интервал между покупками и дата, когда
+пора заказать снова. Обновляется при оформлении заказа (record_order),
+читается одним запросом по индексу (client_id, ...).
+
+Учитываются все заказы клиента, как раньше в избранном.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import bindparam, case, delete, func, insert, select, update
+
+from database import upsert_insert
+from models.analytics import ClientProductAffinity
+from models.order import Order, OrderItem
+from models.product import Product
+
+logger = logging.getLogger(__name__)
+
+# Покупки в один день не должны давать «пора заказать» сразу же
+MIN_REORDER_INTERVAL_DAYS = 1
+# Показываем товары, которые пора заказать в ближайшие N дней
+REORDER_HORIZON_DAYS = 3
+
+KEY_COLUMNS = ('client_id', 'product_id')
+table = ClientProductAffinity.__table__
+
+
+def _with_schedule(row: dict) -> dict:
+    """Дописать средний интервал и дату следующего заказа"""
+    first, last, count = row['first_purchased_at'], row['last_purchased_at'], row['order_count']
+    if count >= 2 and first and last:
+        interval = (last - first).total_seconds() / 86400 / (count - 1)
+        row['avg_interval_days'] = interval
+        row['reorder_due_at'] = last + timedelta(days=max(interval, MIN_REORDER_INTERVAL_DAYS))
+    else:
+        row['avg_interval_days'] = None
+        row['reorder_due_at'] = None
+    return row
+
+
+def _newer(current, incoming, earliest: bool):
+    """Более ранняя (earliest) или поздняя из дат; NULL в строке - берётся incoming"""
+    if earliest:
+        return case((current <= incoming, current), else_=incoming)
+    return case((current >= incoming, current), else_=incoming)
+
+
+def _upsert(db, rows):
+    """
+    Прибавить покупки к строкам относительно их текущих значений
+
+    Два параллельных заказа с новой парой клиент × товар не теряют друг
+    друга: второй INSERT ждёт первый и прибавляет к его строке.
+    """
+    dialect_insert = upsert_insert(db)
+    if dialect_insert is None:
+        for row in rows:
+            condition = [table.c[k] == row[k] for k in KEY_COLUMNS]
+            result = db.execute(update(table).where(*condition).values(
+                total_quantity=table.c.total_quantity + row['total_quantity'],
+                order_count=table.c.order_count + 1,
+                first_purchased_at=_newer(table.c.first_purchased_at, row['first_purchased_at'], earliest=True),
+                last_purchased_at=_newer(table.c.last_purchased_at, row['last_purchased_at'], earliest=False),
+            ))
+            if result.rowcount == 0:
+                db.execute(insert(table).values(**row))
+        return
+
+    stmt = dialect_insert(table)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={
+            'total_quantity': table.c.total_quantity + excluded.total_quantity,
+            'order_count': table.c.order_count + 1,
+            'first_purchased_at': _newer(table.c.first_purchased_at, excluded.first_purchased_at, earliest=True),
+            'last_purchased_at': _newer(table.c.last_purchased_at, excluded.last_purchased_at, earliest=False),
+        }
+    )
+    db.execute(stmt, rows)
+
+
+def _update_schedule(db, client_id: int, product_ids: list):
+    """Пересчитать интервал и дату следующего заказа по итоговым строкам"""
+    current = db.execute(
+        select(table.c.product_id, table.c.order_count, table.c.first_purchased_at, table.c.last_purchased_at)
+        .where(table.c.client_id == client_id, table.c.product_id.in_(product_ids))
+    ).all()
+    params = []
+    for row in current:
+        scheduled = _with_schedule(dict(row._mapping))
+        params.append({
+            'b_product_id': row.product_id,
+            'avg_interval_days': scheduled['avg_interval_days'],
+            'reorder_due_at': scheduled['reorder_due_at'],
+        })
+    # SET берётся из ключей параметров (avg_interval_days, reorder_due_at)
+    db.execute(
+        update(table).where(table.c.client_id == client_id, table.c.product_id == bindparam('b_product_id')),
+        params
+    )
+
+
+def record_order(db, order, lines):
+    """
+    Учесть заказ (после flush, до commit)
+
+    Счётчики и даты меняются UPSERT'ом относительно значений в БД, затем по
+    итоговым строкам (уже заблокированным этой транзакцией) пересчитывается
+    расписание.
+
+    Args:
+        lines: [(product_id, quantity, price)]
+    """
+    quantities = defaultdict(int)
+    for product_id, quantity, _ in lines:
+        quantities[product_id] += quantity
+    if not quantities:
+        return
+
+    purchased_at = order.created_at
+    _upsert(db, [{
+        'client_id': order.client_id,
+        'product_id': product_id,
+        'total_quantity': quantity,
+        'order_count': 1,
+        'first_purchased_at': purchased_at,
+        'last_purchased_at': purchased_at,
+    } for product_id, quantity in sorted(quantities.items())])  # один порядок блокировок у всех заказов
+    _update_schedule(db, order.client_id, list(quantities))
+
+
+def rebuild(db):
+    """
+    Пересобрать таблицу из заказов
+
+    db - Session или Connection; commit делает вызывающий.
+    """
+    grouped = db.execute(
+        select(
+            Order.client_id,
+            OrderItem.product_id,
+            func.sum(OrderItem.quantity),
+            func.count(func.distinct(Order.id)),
+            func.min(Order.created_at),
+            func.max(Order.created_at),
+        )
+        .join(Order, Order.id == OrderItem.order_id)
+        .group_by(Order.client_id, OrderItem.product_id)
+    ).all()
+
+    db.execute(delete(table))
+    rows = [
+        _with_schedule({
+            'client_id': client_id,
+            'product_id': product_id,
+            'total_quantity': int(total or 0),
+            'order_count': count,
+            'first_purchased_at': first,
+            'last_purchased_at': last,
+        })
+        for client_id, product_id, total, count, first, last in grouped
+    ]
+    if rows:
+        db.execute(insert(table), rows)
+
+
+def backfill_if_empty(bind):
+    """Заполнить таблицу при первом запуске (таблицы создаются через create_all)"""
+    try:
+        with bind.begin() as conn:
+            if conn.execute(select(table.c.client_id).limit(1)).first() is not None:
+                return
+            if conn.execute(select(Order.id).limit(1)).first() is None:
+                return
+            rebuild(conn)
+        logger.info("📊 Product affinity backfilled")
+    except Exception as e:
+        logger.error(f"❌ Product affinity backfill failed: {e}")
+
+
+# ---------- Чтение ----------
+
+def favorites(db, client_id: int, limit: int = 10, active_only: bool = True):
+    """[(Product, total_quantity)] - самые покупаемые товары клиента"""
+    query = (
+        db.query(Product, ClientProductAffinity.total_quantity)
+        .join(ClientProductAffinity, ClientProductAffinity.product_id == Product.id)
+        .filter(ClientProductAffinity.client_id == client_id)
+    )
+    if active_only:
+        query = query.filter(Product.is_active == True)
+    return query.order_by(ClientProductAffinity.total_quantity.desc()).limit(limit).all()
+
+
+def reorder_suggestions(db, client_id: int, limit: int = 10, now: datetime = None) -> list:
+    """id товаров, которые клиенту пора заказать снова (ближайшие первыми)"""
+    horizon = (now or datetime.utcnow()) + timedelta(days=REORDER_HORIZON_DAYS)
+    rows = db.query(ClientProductAffinity.product_id).filter(
+        ClientProductAffinity.client_id == client_id,
+        ClientProductAffinity.reorder_due_at <= horizon
+    ).order_by(ClientProductAffinity.reorder_due_at).limit(limit).all()
+    return [row[0] for row in rows]
@@ -0,0 +1,86 @@
+"""
+Модели чтения для списков API
+
+Списки товаров, категорий, клиентов, заказов и снимок каталога выбирают
+только нужные колонки (select / query по колонкам) и получают Row - без
+ORM-сущностей, identity map и инструментированных атрибутов. Строки сразу
+превращаются в dict под сериализатор (services/serialization кодирует
+datetime в isoformat), форма ответов прежняя.
+
+Колонки подписаны ключами ответа; created_at и id не переименовываются -
+по ним keyset_page строит курсор.
+"""
+from sqlalchemy import func, literal, select
+
+from models.order import Order
+from models.product import Category, Product
+from models.user import Client
+
+UNKNOWN_CLIENT = 'Неизвестно'
+
+PRODUCT_COLUMNS = (
+    Product.id, Product.name, Product.price, Product.stock,
+    Product.category_id, Product.is_active, Product.photo_file_id,
+)
+
+CATEGORY_COLUMNS = (Category.id, Category.name, Category.is_active, Category.sort_order)
+
+CLIENT_COLUMNS = (
+    Client.id, Client.company_name, Client.bin_iin, Client.contact_phone,
+    Client.address, Client.status, Client.sales_rep_id,
+    func.coalesce(Client.bonus_balance, literal(0.0)).label('bonus_balance'),
+    func.coalesce(Client.debt, literal(0.0)).label('debt'),
+    Client.first_order_discount_used, Client.created_at,
+)
+
+ORDER_COLUMNS = (
+    Order.id, Order.client_id,
+    func.coalesce(Client.company_name, UNKNOWN_CLIENT).label('client_name'),
+    Order.total.label('total_amount'), Order.discount_amount,
+    Order.status, Order.created_at,
+)
+
+
+def as_dicts(rows) -> list:
+    return [row._asdict() for row in rows]
+
+
+def product_list(db, category_id: int = None, is_active: bool = None) -> list:
+    """Товары для админки (как GET /api/admin/products)"""
+    stmt = select(*PRODUCT_COLUMNS).order_by(Product.name)
+    if category_id is not None:
+        stmt = stmt.where(Product.category_id == category_id)
+    if is_active is not None:
+        stmt = stmt.where(Product.is_active == is_active)
+    return as_dicts(db.execute(stmt))
+
+
+def category_list(db) -> list:
+    return as_dicts(db.execute(select(*CATEGORY_COLUMNS).order_by(Category.sort_order)))
+
+
+def client_rows(query):
+    """Запрос клиентов (search_clients) -> колонки списка; фильтры сохраняются"""
+    return query.with_entities(*CLIENT_COLUMNS)
+
+
+def order_rows(db):
+    """Запрос заказов с именем клиента (без фильтров, сортировки и лимита)"""
+    return db.query(*ORDER_COLUMNS).outerjoin(Client, Order.client_id == Client.id)
+
+
+def catalog_rows(db) -> tuple:
+    """(категории, товары) каталога WebApp - только активные, товары в наличии"""
+    categories = db.execute(
+        select(Category.id, Category.name)
+        .where(Category.is_active == True)
+        .order_by(Category.sort_order)
+    ).all()
+    products = db.execute(
+        select(
+            Product.id, Product.name, Product.price, Product.stock,
+            Product.category_id, Product.photo_file_id, Product.photo_hash
+        )
+        .where(Product.is_active == True, Product.stock > 0)
+    ).all()
+    return categories, products
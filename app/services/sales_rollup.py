@@ -0,0 +1,298 @@
+"""
+Витрина продаж по дням (sales_rollup)
+
+Дашборды читают только её, поэтому дашборд за год стоит столько же,
+сколько за неделю: вместо orders/order_items суммируются готовые строки
+день × товар × клиент × торговый × менеджер.
+
+Заказ добавляется в витрину в своей транзакции (record_order), при отмене
+вычитается, при возврате из отмены добавляется снова (status_changed).
+Счётчики меняются UPSERT'ом относительно текущих значений, так что
+параллельные заказы не теряют друг друга. Строки, в которых после
+вычитания не осталось заказов, удаляются - витрина совпадает с rebuild(),
+который пересобирает её из заказов для первого заполнения и исправления
+расхождений.
+"""
+import logging
+from collections import defaultdict
+from datetime import date
+
+from sqlalchemy import delete, func, insert, literal, select, update
+
+from database import upsert_insert
+from models.analytics import SalesRollup
+from models.order import Order, OrderItem
+from models.user import Client
+
+logger = logging.getLogger(__name__)
+
+# Заказы в этих статусах в витрину не входят
+EXCLUDED_STATUSES = ('cancelled',)
+
+KEY_COLUMNS = ('day', 'product_id', 'client_id', 'sales_rep_id', 'manager_id')
+MEASURES = ('quantity', 'revenue', 'net_revenue', 'order_count', 'bonus_used')
+
+table = SalesRollup.__table__
+
+
+def counts(status: str) -> bool:
+    """Учитывается ли заказ в этом статусе"""
+    return status not in EXCLUDED_STATUSES
+
+
+def _rows(order, lines, sales_rep_id, sign):
+    key = {
+        'day': order.created_at.date(),
+        'client_id': order.client_id,
+        'sales_rep_id': sales_rep_id or 0,
+        'manager_id': order.manager_id or 0,
+    }
+
+    per_product = defaultdict(lambda: [0, 0.0])
+    for product_id, quantity, price in lines:
+        per_product[product_id][0] += quantity
+        per_product[product_id][1] += quantity * price
+
+    rows = [{
+        **key,
+        'product_id': 0,
+        'quantity': sign * sum(q for q, _ in per_product.values()),
+        'revenue': sign * float(order.total or 0),
+        'net_revenue': sign * float(order.final_total or 0),
+        'order_count': sign,
+        'bonus_used': sign * float(order.bonus_used or 0),
+    }]
+    rows.extend({
+        **key,
+        'product_id': product_id,
+        'quantity': sign * quantity,
+        'revenue': sign * revenue,
+        'net_revenue': sign * revenue,
+        'order_count': sign,
+        'bonus_used': 0.0,
+    } for product_id, (quantity, revenue) in per_product.items())
+    return rows
+
+
+def _upsert(db, rows):
+    """Прибавить rows к витрине одним пакетным INSERT ... ON CONFLICT"""
+    dialect_insert = upsert_insert(db)
+    if dialect_insert is None:
+        _upsert_generic(db, rows)
+        return
+
+    stmt = dialect_insert(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(KEY_COLUMNS),
+        set_={m: table.c[m] + stmt.excluded[m] for m in MEASURES}
+    )
+    db.execute(stmt, rows)
+
+
+def _upsert_generic(db, rows):
+    for row in rows:
+        condition = [table.c[k] == row[k] for k in KEY_COLUMNS]
+        result = db.execute(
+            update(table).where(*condition).values({m: table.c[m] + row[m] for m in MEASURES})
+        )
+        if result.rowcount == 0:
+            db.execute(insert(table).values(**row))
+
+
+def record_order(db, order, lines=None, client=None, sign: int = 1):
+    """
+    Учесть заказ в витрине (sign=-1 - вычесть)
+
+    Вызывать после flush (нужны order.id и order.created_at) и до commit.
+
+    Args:
+        lines: [(product_id, quantity, price)]; если None - читаются из order_items
+        client: клиент заказа, если уже загружен (нужен sales_rep_id)
+    """
+    if not counts(order.status):
+        return
+
+    if lines is None:
+        lines = db.query(OrderItem.product_id, OrderItem.quantity, OrderItem.price).filter(
+            OrderItem.order_id == order.id
+        ).all()
+    if client is None:
+        client = db.get(Client, order.client_id)
+
+    rows = _rows(order, lines, client.sales_rep_id if client else None, sign)
+    _upsert(db, rows)
+    if sign < 0:
+        _delete_empty(db, rows)
+
+
+def _delete_empty(db, rows):
+    """Удалить строки rows, в которых не осталось заказов (order_count = 0)"""
+    key = {k: rows[0][k] for k in KEY_COLUMNS if k != 'product_id'}
+    db.execute(
+        delete(table)
+        .where(*[table.c[k] == v for k, v in key.items()])
+        .where(table.c.product_id.in_([row['product_id'] for row in rows]))
+        .where(table.c.order_count <= 0)
+    )
+
+
+def status_changed(db, order, old_status: str):
+    """
+    Статус заказа изменён (вызывать до commit)
+
+    При отмене заказ вычитается из витрины, при возврате из отмены -
+    добавляется. Торговый берётся текущий у клиента; если его сменили
+    после заказа, расхождение исправит rebuild().
+    """
+    if counts(old_status) == counts(order.status):
+        return
+
+    if counts(order.status):
+        record_order(db, order)
+    else:
+        # record_order пропускает отменённые - вычитаем как из старого статуса
+        new_status, order.status = order.status, old_status
+        try:
+            record_order(db, order, sign=-1)
+        finally:
+            order.status = new_status
+
+
+def rebuild(db, date_from: date = None):
+    """
+    Пересобрать витрину из заказов (целиком или начиная с date_from)
+
+    db - Session или Connection; commit делает вызывающий.
+    """
+    day = func.date(Order.created_at)
+    sales_rep_id = func.coalesce(Client.sales_rep_id, 0)
+    manager_id = func.coalesce(Order.manager_id, 0)
+
+    order_filter = [Order.status.notin_(EXCLUDED_STATUSES)]
+    if date_from:
+        order_filter.append(Order.created_at >= date_from)
+        db.execute(delete(table).where(table.c.day >= date_from))
+    else:
+        db.execute(delete(table))
+
+    items_per_order = (
+        select(OrderItem.order_id, func.sum(OrderItem.quantity).label('quantity'))
+        .group_by(OrderItem.order_id)
+        .subquery()
+    )
+
+    orders_select = (
+        select(
+            day, literal(0), Order.client_id, sales_rep_id, manager_id,
+            func.coalesce(func.sum(items_per_order.c.quantity), 0),
+            func.coalesce(func.sum(Order.total), 0),
+            func.coalesce(func.sum(Order.final_total), 0),
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.bonus_used), 0),
+        )
+        .select_from(Order)
+        .join(Client, Client.id == Order.client_id)
+        .outerjoin(items_per_order, items_per_order.c.order_id == Order.id)
+        .where(*order_filter)
+        .group_by(day, Order.client_id, sales_rep_id, manager_id)
+    )
+
+    line_revenue = func.sum(OrderItem.quantity * OrderItem.price)
+    products_select = (
+        select(
+            day, OrderItem.product_id, Order.client_id, sales_rep_id, manager_id,
+            func.sum(OrderItem.quantity),
+            line_revenue,
+            line_revenue,
+            func.count(func.distinct(Order.id)),
+            literal(0.0),
+        )
+        .select_from(OrderItem)
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(Client, Client.id == Order.client_id)
+        .where(*order_filter)
+        .group_by(day, OrderItem.product_id, Order.client_id, sales_rep_id, manager_id)
+    )
+
+    columns = list(KEY_COLUMNS) + list(MEASURES)
+    db.execute(insert(table).from_select(columns, orders_select))
+    db.execute(insert(table).from_select(columns, products_select))
+
+
+# ---------- Чтение для дашбордов ----------
+
+def _range(query, date_from: date, date_to: date = None, manager_id: int = None):
+    query = query.filter(SalesRollup.day >= date_from)
+    if date_to:
+        query = query.filter(SalesRollup.day <= date_to)
+    if manager_id:
+        query = query.filter(SalesRollup.manager_id == manager_id)
+    return query
+
+
+def totals(db, date_from: date, date_to: date = None, manager_id: int = None) -> dict:
+    """Выручка, число заказов и бонусы за период"""
+    row = _range(
+        db.query(
+            func.coalesce(func.sum(SalesRollup.revenue), 0),
+            func.coalesce(func.sum(SalesRollup.net_revenue), 0),
+            func.coalesce(func.sum(SalesRollup.order_count), 0),
+            func.coalesce(func.sum(SalesRollup.bonus_used), 0),
+        ).filter(SalesRollup.product_id == 0),
+        date_from, date_to, manager_id
+    ).one()
+    return {
+        'revenue': float(row[0]),
+        'net_revenue': float(row[1]),
+        'orders': int(row[2]),
+        'bonus_used': float(row[3]),
+    }
+
+
+def top_products(db, date_from: date, limit: int = 5, date_to: date = None, manager_id: int = None):
+    """[(product_id, quantity, revenue)] по убыванию количества"""
+    quantity = func.sum(SalesRollup.quantity)
+    return _range(
+        db.query(SalesRollup.product_id, quantity, func.sum(SalesRollup.revenue))
+        .filter(SalesRollup.product_id != 0),
+        date_from, date_to, manager_id
+    ).group_by(SalesRollup.product_id).order_by(quantity.desc()).limit(limit).all()
+
+
+def top_clients(db, date_from: date, limit: int = 5, date_to: date = None, manager_id: int = None):
+    """[(client_id, revenue, orders)] по убыванию выручки"""
+    revenue = func.sum(SalesRollup.revenue)
+    return _range(
+        db.query(SalesRollup.client_id, revenue, func.sum(SalesRollup.order_count))
+        .filter(SalesRollup.product_id == 0),
+        date_from, date_to, manager_id
+    ).group_by(SalesRollup.client_id).order_by(revenue.desc()).limit(limit).all()
+
+
+def top_sales_reps(db, date_from: date, limit: int = 5, date_to: date = None):
+    """[(sales_rep_id, revenue, orders)] по убыванию выручки, без заказов без торгового"""
+    revenue = func.sum(SalesRollup.revenue)
+    return _range(
+        db.query(SalesRollup.sales_rep_id, revenue, func.sum(SalesRollup.order_count))
+        .filter(SalesRollup.product_id == 0, SalesRollup.sales_rep_id != 0),
+        date_from, date_to
+    ).group_by(SalesRollup.sales_rep_id).order_by(revenue.desc()).limit(limit).all()
+
+
+def backfill_if_empty(bind):
+    """
+    Заполнить витрину при первом запуске
+
+    Таблицы создаются через create_all, поэтому после деплоя витрина
+    может быть пустой при существующих заказах.
+    """
+    try:
+        with bind.begin() as conn:
+            if conn.execute(select(table.c.day).limit(1)).first() is not None:
+                return
+            if conn.execute(select(Order.id).limit(1)).first() is None:
+                return
+            rebuild(conn)
+        logger.info("📊 Sales rollup backfilled")
+    except Exception as e:
+        logger.error(f"❌ Sales rollup backfill failed: {e}")
@@ -0,0 +1,149 @@
+"""
+Сериализация ответов API (JSON / MessagePack)
+
+- JSON кодируется orjson, если он установлен, иначе стандартным json
+  (JSON_BACKEND=json принудительно включает стандартный - для сравнения)
+- Клиент с Accept: application/msgpack получает MessagePack (нужен msgpack)
+- Decimal, datetime, date и set кодируются без ручного преобразования в
+  обработчиках; форма ответа в обоих форматах одинаковая
+
+json_response() - замена web.json_response: формат ответа выбирает
+serialization_middleware по заголовку Accept текущего запроса (contextvar
+виден и в обработчиках, выполняемых в пуле БД).
+"""
+import json
+import logging
+import os
+from contextvars import ContextVar
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from aiohttp import web
+
+try:
+    import orjson
+except ImportError:  # orjson необязателен - тогда стандартный json
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # без msgpack ответы всегда в JSON
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+JSON_TYPE = 'application/json'
+MSGPACK_TYPE = 'application/msgpack'
+MSGPACK_TYPES = (MSGPACK_TYPE, 'application/x-msgpack')
+
+JSON_BACKEND = os.getenv("JSON_BACKEND", "auto").lower()
+if JSON_BACKEND == 'orjson' and orjson is None:
+    logger.warning("⚠️ JSON_BACKEND=orjson, но orjson не установлен - используется json")
+USE_ORJSON = orjson is not None and JSON_BACKEND != 'json'
+
+FORMATS = ('json', 'msgpack') if msgpack is not None else ('json',)
+
+_format = ContextVar('response_format', default='json')
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+# Ключи-числа как в json; datetime - через _default, чтобы вывод совпадал с json
+ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson is not None else 0
+
+
+def _stdlib_dumps(data) -> bytes:
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def dumps(data) -> bytes:
+    """JSON в UTF-8 без пробелов"""
+    if USE_ORJSON:
+        try:
+            return orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        except TypeError:
+            # Целые больше 64 бит и прочее, что orjson не умеет
+            pass
+    return _stdlib_dumps(data)
+
+
+def loads(body):
+    return orjson.loads(body) if USE_ORJSON else json.loads(body)
+
+
+def packb(data) -> bytes:
+    return msgpack.packb(data, default=_default, use_bin_type=True, datetime=False)
+
+
+def encode(data, fmt: str = 'json') -> bytes:
+    return packb(data) if fmt == 'msgpack' else dumps(data)
+
+
+def content_type(fmt: str) -> str:
+    return MSGPACK_TYPE if fmt == 'msgpack' else JSON_TYPE
+
+
+def negotiate(accept: str) -> str:
+    """'msgpack', если клиент предпочитает его JSON, иначе 'json'"""
+    if msgpack is None or not accept:
+        return 'json'
+    best, best_q = 'json', -1.0
+    for part in accept.lower().split(','):
+        name, _, params = part.strip().partition(';')
+        q = 1.0
+        for param in params.split(';'):
+            param = param.strip()
+            if param.startswith('q='):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if name in MSGPACK_TYPES:
+            fmt = 'msgpack'
+        elif name in (JSON_TYPE, 'application/*', '*/*'):
+            fmt = 'json'
+        else:
+            continue
+        # При равном q выигрывает тип, указанный раньше
+        if q > best_q:
+            best, best_q = fmt, q
+    return best if best_q > 0 else 'json'
+
+
+def current_format() -> str:
+    return _format.get()
+
+
+def encoded_response(body: bytes, fmt: str, *, status: int = 200, reason: str = None, headers=None) -> web.Response:
+    """Ответ с уже закодированным телом (например, снимок каталога)"""
+    response = web.Response(
+        body=body, status=status, reason=reason, headers=headers,
+        content_type=content_type(fmt), charset='utf-8' if fmt == 'json' else None
+    )
+    if len(FORMATS) > 1:
+        response.headers.add('Vary', 'Accept')
+    return response
+
+
+def json_response(data=None, *, status: int = 200, reason: str = None, headers=None) -> web.Response:
+    """web.json_response с быстрым кодированием и MessagePack по Accept"""
+    fmt = _format.get()
+    return encoded_response(encode(data, fmt), fmt, status=status, reason=reason, headers=headers)
+
+
+@web.middleware
+async def serialization_middleware(request, handler):
+    """Выбрать формат ответов json_response() для этого запроса"""
+    token = _format.set(negotiate(request.headers.get('Accept', '')))
+    try:
+        return await handler(request)
+    finally:
+        _format.reset(token)
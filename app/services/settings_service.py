@@ -0,0 +1,215 @@
+"""
+Кэш системных настроек (system_settings)
+
+Все строки читаются одним запросом и хранятся в памяти уже приведёнными
+к своему типу, горячие пути читают настройки без запросов к БД.
+
+После записи вызывается settings_service.changed(): кэш процесса
+сбрасывается, а остальные процессы узнают об изменении
+- на PostgreSQL через NOTIFY system_settings (LISTEN в фоновом потоке)
+- на SQLite опросом max(updated_at)/count(*) раз в SETTINGS_POLL_INTERVAL
+"""
+import logging
+import os
+import select as select_module
+import threading
+
+from sqlalchemy import func, select, text
+
+from database import SessionLocal, engine
+from models.settings import SystemSetting
+
+logger = logging.getLogger(__name__)
+
+SETTINGS_CHANNEL = "system_settings"
+SETTINGS_POLL_INTERVAL = float(os.getenv("SETTINGS_POLL_INTERVAL", "5"))
+
+# Известные настройки: тип и значение по умолчанию, если строки нет в БД
+SETTINGS_SCHEMA = {
+    'bonus_earn_percent': (int, 3),
+    'bonus_max_use_percent': (int, 70),
+    'bonus_expiry_days': (int, 30),
+    'bonus_percent_default': (float, 2.0),
+    'bonus_expiry_months': (int, 6),
+    'min_order_amount': (float, 10000.0),
+    'credit_limit_default': (float, 500000.0),
+    'payment_delay_default': (int, 14),
+    'low_stock_threshold': (int, 10),
+    'tier1_threshold': (int, 15000),
+    'tier2_threshold': (int, 25000),
+    'tier3_threshold': (int, 50000),
+    'tier2_gift_product_id': (int, 0),
+}
+
+
+def parse_setting(value: str, type_: str):
+    """Привести строковое значение настройки к её типу"""
+    if type_ == 'int':
+        return int(float(value))
+    if type_ == 'float':
+        return float(value)
+    if type_ == 'bool':
+        return value.lower() == 'true'
+    return value
+
+
+class SettingsService:
+    """Типизированные настройки в памяти процесса"""
+
+    def __init__(self, session_factory=SessionLocal, bind=engine):
+        self.session_factory = session_factory
+        self.bind = bind
+        self._values = None
+        # Меняется при invalidate() - загрузка, начатая до записи, не кэшируется
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._listener = None
+        self._stop = threading.Event()
+
+    def _load(self) -> dict:
+        db = self.session_factory()
+        try:
+            rows = db.query(SystemSetting.key, SystemSetting.value, SystemSetting.type).all()
+        finally:
+            db.close()
+
+        values = {}
+        for key, value, type_ in rows:
+            try:
+                values[key] = parse_setting(value, type_)
+            except ValueError:
+                logger.warning(f"⚠️ Setting {key}={value!r} is not {type_}")
+                values[key] = value
+        return values
+
+    def all(self) -> dict:
+        """Все настройки (загружаются при первом обращении)"""
+        values = self._values
+        if values is not None:
+            return values
+
+        with self._lock:
+            if self._values is not None:
+                return self._values
+            generation = self._generation
+            values = self._load()
+            if generation == self._generation:
+                self._values = values
+            return values
+
+    def get(self, key: str, default=None):
+        """
+        Значение настройки, приведённое к типу из SETTINGS_SCHEMA
+
+        default переопределяет значение по умолчанию из схемы.
+        """
+        type_, schema_default = SETTINGS_SCHEMA.get(key, (None, None))
+        value = self.all().get(key)
+
+        if value is None:
+            value = default if default is not None else schema_default
+        if type_ is not None and value is not None and not isinstance(value, type_):
+            try:
+                value = type_(value)
+            except (TypeError, ValueError):
+                value = default if default is not None else schema_default
+        return value
+
+    def invalidate(self):
+        """Сбросить кэш этого процесса - перечитать при следующем обращении"""
+        self._generation += 1
+        self._values = None
+
+    def changed(self):
+        """
+        Настройки записаны (вызывать после commit)
+
+        Сбрасывает кэш и оповещает другие процессы.
+        """
+        self.invalidate()
+        if self.bind.dialect.name == 'postgresql':
+            try:
+                with self.bind.connect() as conn:
+                    conn.execute(text("SELECT pg_notify(:channel, '')"), {'channel': SETTINGS_CHANNEL})
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"❌ Settings NOTIFY failed: {e}")
+
+    # ---------- Оповещения от других процессов ----------
+
+    def start_listener(self):
+        """Запустить фоновый поток, следящий за изменениями из других процессов"""
+        if self._listener is not None and self._listener.is_alive():
+            return
+
+        self._stop.clear()
+        target = self._listen_postgres if self.bind.dialect.name == 'postgresql' else self._poll
+        self._listener = threading.Thread(target=target, name="settings-listener", daemon=True)
+        self._listener.start()
+        logger.info(f"👂 Settings listener started ({self.bind.dialect.name})")
+
+    def stop_listener(self):
+        self._stop.set()
+
+    def _listen_postgres(self):
+        import psycopg
+
+        conninfo = self.bind.url.set(drivername='postgresql').render_as_string(hide_password=False)
+        while not self._stop.is_set():
+            try:
+                with psycopg.connect(conninfo, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {SETTINGS_CHANNEL}")
+                    # Пока не слушали, могли пропустить изменения
+                    self.invalidate()
+                    while not self._stop.is_set():
+                        if self._wait_notifies(conn):
+                            self.invalidate()
+            except Exception as e:
+                logger.error(f"❌ Settings listener error: {e}")
+                self._stop.wait(SETTINGS_POLL_INTERVAL)
+
+    @staticmethod
+    def _wait_notifies(conn) -> int:
+        """
+        Дождаться NOTIFY (не дольше SETTINGS_POLL_INTERVAL), вернуть их число
+
+        Connection.notifies(timeout=...) появился в psycopg 3.2; select() по
+        сокету и чтение оповещений из libpq работают в любой 3.x, поэтому
+        слушатель не зависит от установленной версии.
+        """
+        ready, _, _ = select_module.select([conn.fileno()], [], [], SETTINGS_POLL_INTERVAL)
+        if not ready:
+            return 0
+        pgconn = conn.pgconn
+        pgconn.consume_input()
+        received = 0
+        while pgconn.notifies() is not None:
+            received += 1
+        return received
+
+    def _fingerprint(self):
+        with self.bind.connect() as conn:
+            return tuple(conn.execute(
+                select(func.max(SystemSetting.updated_at), func.count(SystemSetting.id))
+            ).one())
+
+    def _poll(self):
+        try:
+            last = self._fingerprint()
+        except Exception as e:
+            logger.error(f"❌ Settings poll error: {e}")
+            last = None
+        while not self._stop.wait(SETTINGS_POLL_INTERVAL):
+            try:
+                current = self._fingerprint()
+            except Exception as e:
+                logger.error(f"❌ Settings poll error: {e}")
+                continue
+            if last is not None and current != last:
+                logger.info("🔄 Settings changed in another process")
+                self.invalidate()
+            last = current
+
+
+# Глобальный экземпляр
+settings_service = SettingsService()
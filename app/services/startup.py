@@ -0,0 +1,34 @@
+"""
+Startup-хуки: то, что create_all не создаёт и не заполняет
+
+Один список для всех точек входа - aiohttp (api_server.create_app),
+FastAPI (main.py) и supervisor.
+"""
+from services import client_metrics, product_affinity, sales_rollup
+from services.client_search import ensure_search_index
+from services.idempotency import purge_expired
+from services.order_numbers import ensure_counter
+from services.photo_service import ensure_photo_hash
+
+
+def run_startup_hooks(bind):
+    """
+    Колонки, индексы, счётчики и витрины, которые create_all не создаёт/не заполняет
+
+    Идемпотентны, но не рассчитаны на одновременный запуск: при нескольких
+    воркерах их один раз выполняет supervisor, а воркеры создаются с
+    create_app(startup_hooks=False).
+    """
+    # Таблицы, созданные create_all по старым моделям
+    client_metrics.ensure_schema(bind)
+    ensure_photo_hash(bind)
+    # Индексы поиска клиентов (таблицы создаются через create_all, без alembic)
+    ensure_search_index(bind)
+    # Счётчик номеров заказов выше уже существующих заказов
+    ensure_counter(bind)
+    # Просроченные ключи идемпотентности (пока процесс лежал)
+    purge_expired(bind)
+    # Витрины пусты после первого деплоя - заполняем из заказов
+    sales_rollup.backfill_if_empty(bind)
+    client_metrics.backfill_if_empty(bind)
+    product_affinity.backfill_if_empty(bind)
@@ -0,0 +1,222 @@
+"""
+Раздача статики WebApp из памяти
+
+Файлы читаются один раз при старте (и перечитываются при изменении mtime),
+для каждого считается ETag по содержимому. Ответы идут с ETag,
+Last-Modified и Cache-Control, поддерживаются 304 и Range-запросы.
+Большие файлы в память не грузятся и отдаются через sendfile (FileResponse).
+"""
+import hashlib
+import logging
+import mimetypes
+import os
+import time
+from email.utils import formatdate, parsedate_to_datetime
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Файлы больше этого размера отдаются через sendfile, а не из памяти
+STATIC_MEMORY_LIMIT = int(os.getenv("STATIC_MEMORY_LIMIT", str(1024 * 1024)))
+STATIC_MAX_AGE = int(os.getenv("STATIC_MAX_AGE", "3600"))
+# Как часто (сек) проверять mtime файла на диске
+STATIC_CHECK_INTERVAL = float(os.getenv("STATIC_CHECK_INTERVAL", "2"))
+
+TEXT_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+mimetypes.add_type('application/manifest+json', '.webmanifest')
+
+
+class StaticAsset:
+    """Файл, загруженный в память"""
+
+    def __init__(self, path: str, stat: os.stat_result, body: bytes = None):
+        self.path = path
+        self.mtime = stat.st_mtime
+        self.size = stat.st_size
+        self.body = body
+        self.checked_at = time.monotonic()
+
+        content_type, _ = mimetypes.guess_type(path)
+        self.content_type = content_type or 'application/octet-stream'
+        self.charset = 'utf-8' if self.content_type.startswith(TEXT_TYPES) else None
+
+        if body is not None:
+            self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        else:
+            self.etag = f'"{int(self.mtime * 1000):x}-{self.size:x}"'
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+
+    @property
+    def in_memory(self) -> bool:
+        return self.body is not None
+
+
+class StaticAssets:
+    """Каталог статики, обслуживаемый из памяти"""
+
+    def __init__(self, root: str, max_age: int = STATIC_MAX_AGE):
+        self.root = os.path.realpath(root)
+        self.max_age = max_age
+        self._assets = {}
+
+    def load(self):
+        """Загрузить все файлы каталога (вызывается при старте приложения)"""
+        count = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                rel_path = os.path.relpath(os.path.join(dirpath, filename), self.root)
+                if self._load_asset(rel_path.replace(os.sep, '/')) is not None:
+                    count += 1
+        logger.info(f"📁 Static assets loaded: {self.root} ({count} files)")
+
+    def _resolve(self, rel_path: str):
+        """Путь на диске или None, если он выходит за пределы root"""
+        full_path = os.path.realpath(os.path.join(self.root, rel_path))
+        if full_path != self.root and full_path.startswith(self.root + os.sep):
+            return full_path
+        return None
+
+    def _load_asset(self, rel_path: str):
+        full_path = self._resolve(rel_path)
+        if full_path is None:
+            return None
+
+        try:
+            stat = os.stat(full_path)
+            if not os.path.isfile(full_path):
+                return None
+            body = None
+            if stat.st_size <= STATIC_MEMORY_LIMIT:
+                with open(full_path, 'rb') as f:
+                    body = f.read()
+        except OSError:
+            self._assets.pop(rel_path, None)
+            return None
+
+        asset = StaticAsset(full_path, stat, body)
+        self._assets[rel_path] = asset
+        return asset
+
+    def get(self, rel_path: str):
+        """Найти файл; изменённый на диске файл перечитывается"""
+        asset = self._assets.get(rel_path)
+        if asset is None:
+            return self._load_asset(rel_path)
+
+        now = time.monotonic()
+        if now - asset.checked_at < STATIC_CHECK_INTERVAL:
+            return asset
+
+        asset.checked_at = now
+        try:
+            stat = os.stat(asset.path)
+        except OSError:
+            self._assets.pop(rel_path, None)
+            return None
+
+        if stat.st_mtime != asset.mtime or stat.st_size != asset.size:
+            logger.info(f"🔄 Static asset changed: {rel_path}")
+            return self._load_asset(rel_path)
+        return asset
+
+    def _cache_headers(self, asset: StaticAsset) -> dict:
+        # HTML всегда перепроверяется - в нём ссылки на остальные файлы
+        if asset.content_type == 'text/html':
+            cache_control = 'no-cache'
+        else:
+            cache_control = f'public, max-age={self.max_age}'
+        return {
+            'ETag': asset.etag,
+            'Last-Modified': asset.last_modified,
+            'Cache-Control': cache_control,
+            'Accept-Ranges': 'bytes',
+        }
+
+    def serve(self, request, rel_path: str):
+        """Ответ для файла rel_path (404, 304, 206 или 200)"""
+        asset = self.get(rel_path)
+        if asset is None:
+            return web.Response(status=404)
+
+        headers = self._cache_headers(asset)
+
+        if not asset.in_memory:
+            # FileResponse сам обрабатывает Range/If-None-Match и использует sendfile
+            return web.FileResponse(asset.path, headers=headers)
+
+        if _not_modified(request, asset):
+            return web.Response(status=304, headers=headers)
+
+        byte_range = _parse_range(request, asset)
+        if byte_range == 'invalid':
+            headers['Content-Range'] = f'bytes */{asset.size}'
+            return web.Response(status=416, headers=headers)
+        if byte_range is not None:
+            start, end = byte_range
+            headers['Content-Range'] = f'bytes {start}-{end}/{asset.size}'
+            return web.Response(
+                status=206, body=asset.body[start:end + 1],
+                content_type=asset.content_type, charset=asset.charset, headers=headers
+            )
+
+        return web.Response(
+            body=asset.body, content_type=asset.content_type, charset=asset.charset, headers=headers
+        )
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Слабое сравнение для If-None-Match (W/ от сжатых ответов тоже подходит)"""
+    if header.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in header.split(',')]
+    return any(tag.removeprefix('W/') == etag for tag in tags)
+
+
+def _not_modified(request, asset: StaticAsset) -> bool:
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match is not None:
+        return etag_matches(if_none_match, asset.etag)
+
+    if_modified_since = request.headers.get('If-Modified-Since')
+    if if_modified_since:
+        try:
+            return parsedate_to_datetime(if_modified_since).timestamp() >= int(asset.mtime)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def _parse_range(request, asset: StaticAsset):
+    """
+    Один диапазон bytes=start-end -> (start, end)
+
+    None - отдать файл целиком (нет Range, несколько диапазонов или
+    If-Range не совпал), 'invalid' - диапазон вне файла (416)
+    """
+    header = request.headers.get('Range')
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != asset.etag and if_range != asset.last_modified:
+        return None
+
+    start_s, _, end_s = header[len('bytes='):].strip().partition('-')
+    try:
+        if start_s:
+            start = int(start_s)
+            end = int(end_s) if end_s else asset.size - 1
+        else:
+            # bytes=-N - последние N байт
+            start = asset.size - int(end_s)
+            end = asset.size - 1
+    except ValueError:
+        return None
+
+    start = max(start, 0)
+    end = min(end, asset.size - 1)
+    if start > end:
+        return 'invalid'
+    return start, end
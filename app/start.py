@@ -33,10 +33,8 @@ async def run_api():
     
     await asyncio.Event().wait()
 
-async def main():
-    """Запуск бота и API одновременно"""
-    logger.info("🚀 Starting HappySnack unified service...")
-    
+def create_tables():
+    """Создать таблицы всех моделей (без alembic)"""
     # Database initialization - импортируем ВСЕ модели
     try:
         from database import Base, engine
@@ -46,14 +44,21 @@ async def main():
         from models.bonus import BonusTransaction
         from models.ai_log import AIConversation, AIProactiveMessage
         from models.ai_settings import AIAgentSettings
-        from models.analytics import AnalyticsEvent, ClientMetrics
+        from models.analytics import AnalyticsEvent, ClientMetrics, SalesRollup, ClientProductAffinity
         from models.settings import SystemSetting
+        from models.idempotency import IdempotencyKey
         
         Base.metadata.create_all(bind=engine)
         logger.info("✅ Database tables ready")
     except Exception as e:
         logger.error(f"❌ Database init failed: {e}")
         raise
+
+async def main():
+    """Запуск бота и API одновременно"""
+    logger.info("🚀 Starting HappySnack unified service...")
+    
+    create_tables()
     
     try:
         await asyncio.gather(
@@ -0,0 +1,458 @@
+"""
+Запуск сервиса в несколько процессов (вместо start.py)
+
+start.py держит бота и API в одном event loop одного процесса - одно ядро,
+и всплеск CPU в одном тормозит другого. Супервизор запускает отдельные
+процессы (новые интерпретаторы, не fork):
+
+    api-N       API_WORKERS процессов aiohttp на одном порту (SO_REUSEPORT),
+                соединения между ними распределяет ядро
+    bot         один процесс polling (Telegram не даёт двум getUpdates)
+    scheduler   один процесс APScheduler (задачи не должны дублироваться)
+
+Перед запуском воркеров один раз создаются таблицы и выполняются
+startup-хуки api_server (индексы, счётчики, витрины) - сами воркеры их
+не запускают, чтобы не выполнять их одновременно.
+
+Супервизор следит за процессами:
+- упавший процесс перезапускается; при частых падениях - с растущей паузой
+- heartbeat: процесс обновляет свой файл из event loop раз в
+  WORKER_HEARTBEAT_INTERVAL; нет обновления WORKER_HEARTBEAT_TIMEOUT
+  секунд - loop завис, процесс перезапускается
+- WORKER_MAX_RSS_MB: процесс, превысивший лимит памяти, перезапускается
+- SIGHUP - поочерёдный перезапуск (новый API-воркер стартует до остановки
+  старого, порт не простаивает); SIGTERM/SIGINT - мягкая остановка: API
+  дорабатывает текущие запросы до WORKER_SHUTDOWN_TIMEOUT секунд
+- USE_UVLOOP: auto (uvloop, если установлен) / true / false
+
+Кэши процессов (каталог, настройки) у каждого воркера свои: настройки
+синхронизирует settings_service, снимок каталога устаревает не дольше
+CATALOG_CACHE_TTL; rate limit действует на воркер.
+
+Запуск из каталога app:
+    python supervisor.py --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger('supervisor')
+
+API_WORKERS = int(os.getenv("API_WORKERS", "0"))  # 0 - по числу ядер
+USE_UVLOOP = os.getenv("USE_UVLOOP", "auto").lower()
+WORKER_HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", "5"))
+WORKER_HEARTBEAT_TIMEOUT = float(os.getenv("WORKER_HEARTBEAT_TIMEOUT", "60"))
+WORKER_START_TIMEOUT = float(os.getenv("WORKER_START_TIMEOUT", "120"))
+WORKER_SHUTDOWN_TIMEOUT = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT", "30"))
+WORKER_MAX_RSS_MB = int(os.getenv("WORKER_MAX_RSS_MB", "0"))  # 0 - без лимита
+
+CHECK_INTERVAL = 1.0
+# Процесс, проживший меньше, считается упавшим при старте - пауза растёт
+CRASH_WINDOW = 30.0
+MAX_RESTART_DELAY = 60.0
+
+ROLES = ('prepare', 'api', 'bot', 'scheduler')
+
+
+def setup_logging(name: str):
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f'%(asctime)s [{name}] %(levelname)s %(name)s: %(message)s'
+    )
+
+
+def install_event_loop() -> str:
+    """uvloop вместо стандартного loop (USE_UVLOOP); вернуть имя реализации"""
+    if USE_UVLOOP == 'false':
+        return 'asyncio'
+    try:
+        import uvloop
+    except ImportError:
+        if USE_UVLOOP == 'true':
+            logger.warning("⚠️ USE_UVLOOP=true, но uvloop не установлен - используется asyncio")
+        return 'asyncio'
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    return 'uvloop'
+
+
+def rss_mb(pid: int):
+    """Резидентная память процесса в МБ (None, если узнать нельзя)"""
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process(pid).memory_info().rss / 1024 / 1024
+    except Exception:
+        return None
+
+
+# ============================================
+# ДОЧЕРНИЕ ПРОЦЕССЫ
+# ============================================
+
+async def heartbeat(path: str):
+    """Отмечаться из event loop: если loop завис, файл перестаёт обновляться"""
+    while True:
+        with open(path, 'a'):
+            os.utime(path)
+        await asyncio.sleep(WORKER_HEARTBEAT_INTERVAL)
+
+
+def _stop_event() -> asyncio.Event:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, stop.set)
+    return stop
+
+
+async def serve_api(port: int, heartbeat_file: str):
+    from aiohttp import web
+    from api_server import create_app
+
+    stop = _stop_event()
+    runner = web.AppRunner(create_app(startup_hooks=False))
+    await runner.setup()
+    site = web.TCPSite(
+        runner, '0.0.0.0', port,
+        reuse_port=hasattr(socket, 'SO_REUSEPORT'),
+        shutdown_timeout=WORKER_SHUTDOWN_TIMEOUT
+    )
+    await site.start()
+    logger.info(f"✅ API worker listening on port {port}")
+
+    beat = asyncio.create_task(heartbeat(heartbeat_file))
+    await stop.wait()
+    logger.info("🛑 API worker stopping, finishing requests...")
+    beat.cancel()
+    await runner.cleanup()
+
+
+async def serve_bot(port: int, heartbeat_file: str):
+    from bot import main as bot_main
+
+    # aiogram сам ловит SIGTERM/SIGINT и останавливает polling
+    beat = asyncio.create_task(heartbeat(heartbeat_file))
+    try:
+        await bot_main()
+    finally:
+        beat.cancel()
+
+
+async def serve_scheduler(port: int, heartbeat_file: str):
+    from scheduler import proactive_messenger
+
+    stop = _stop_event()
+    proactive_messenger.start()
+    beat = asyncio.create_task(heartbeat(heartbeat_file))
+    await stop.wait()
+    beat.cancel()
+    proactive_messenger.stop()
+
+
+def prepare_database():
+    """Таблицы и startup-хуки - один раз до запуска воркеров"""
+    from start import create_tables
+    create_tables()
+
+    from services.startup import run_startup_hooks
+    from database import engine
+    run_startup_hooks(engine)
+    logger.info("✅ Database prepared")
+
+
+def run_role(role: str, port: int):
+    """Точка входа дочернего процесса"""
+    setup_logging(os.getenv('WORKER_NAME', role))
+    if hasattr(signal, 'SIGHUP'):
+        # SIGHUP группе процессов (закрытый терминал, kill -HUP -pgid) - дело супервизора
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    if role == 'prepare':
+        prepare_database()
+        return
+
+    serve = {'api': serve_api, 'bot': serve_bot, 'scheduler': serve_scheduler}[role]
+    loop_name = install_event_loop()
+    logger.info(f"🚀 Starting {role} (pid {os.getpid()}, {loop_name})")
+    asyncio.run(serve(port, os.environ['WORKER_HEARTBEAT_FILE']))
+
+
+# ============================================
+# СУПЕРВИЗОР
+# ============================================
+
+class Worker:
+    """Один дочерний процесс и его состояние"""
+
+    def __init__(self, role: str, name: str, port: int, heartbeat_dir: str):
+        self.role = role
+        self.name = name
+        self.port = port
+        self.heartbeat_file = os.path.join(heartbeat_dir, f'{name}.heartbeat')
+        self.process = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.next_start_at = 0.0
+
+    def start(self):
+        if os.path.exists(self.heartbeat_file):
+            os.unlink(self.heartbeat_file)
+        env = {**os.environ, 'WORKER_NAME': self.name, 'WORKER_HEARTBEAT_FILE': self.heartbeat_file}
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--role', self.role, '--port', str(self.port)],
+            env=env
+        )
+        self.started_at = time.monotonic()
+        logger.info(f"▶️ {self.name} started (pid {self.process.pid})")
+
+    def clone(self) -> 'Worker':
+        """Такой же воркер со своим heartbeat - для замены без простоя"""
+        worker = Worker(self.role, self.name, self.port, os.path.dirname(self.heartbeat_file))
+        worker.heartbeat_file += f'.{int(time.time() * 1000)}'
+        worker.restarts = self.restarts + 1
+        return worker
+
+    @property
+    def pid(self):
+        return self.process.pid if self.process else None
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def ready(self) -> bool:
+        """Процесс запустился и отметился хотя бы раз"""
+        return os.path.exists(self.heartbeat_file)
+
+    def heartbeat_age(self) -> float:
+        # mtime файла - по часам ОС, поэтому и сравниваем с time.time()
+        try:
+            return time.time() - os.path.getmtime(self.heartbeat_file)
+        except OSError:
+            return float('inf')
+
+    def stop(self, timeout: float = WORKER_SHUTDOWN_TIMEOUT):
+        """SIGTERM, ждать timeout, затем SIGKILL"""
+        if not self.alive():
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout + 5)
+        except subprocess.TimeoutExpired:
+            logger.warning(f"⚠️ {self.name} did not stop in time, killing")
+            self.process.kill()
+            self.process.wait()
+
+
+class Supervisor:
+    def __init__(self, workers: int, port: int, bot: bool = True, scheduler: bool = True):
+        self.port = port
+        self.heartbeat_dir = tempfile.mkdtemp(prefix='happysnack-workers-')
+        self.workers = [
+            Worker('api', f'api-{i + 1}', port, self.heartbeat_dir) for i in range(workers)
+        ]
+        if bot:
+            self.workers.append(Worker('bot', 'bot', port, self.heartbeat_dir))
+        if scheduler:
+            self.workers.append(Worker('scheduler', 'scheduler', port, self.heartbeat_dir))
+        self.stopping = False
+        self.reload_requested = False
+        self.rss_supported = True
+
+    # ---------- Сигналы ----------
+
+    def _on_stop(self, signum, frame):
+        logger.info(f"🛑 Received {signal.Signals(signum).name}, stopping workers...")
+        self.stopping = True
+
+    def _on_reload(self, signum, frame):
+        logger.info("🔄 Received SIGHUP, rolling restart")
+        self.reload_requested = True
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        if hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, self._on_reload)
+
+    # ---------- Жизненный цикл ----------
+
+    def prepare(self) -> bool:
+        result = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--role', 'prepare'],
+            env={**os.environ, 'WORKER_NAME': 'prepare'}
+        )
+        if result.returncode != 0:
+            logger.error(f"❌ Database preparation failed (exit code {result.returncode})")
+            return False
+        return True
+
+    def run(self) -> int:
+        self.install_signal_handlers()
+        logger.info(
+            f"🚀 Supervisor pid {os.getpid()}: "
+            + ', '.join(worker.name for worker in self.workers)
+            + f", port {self.port}"
+        )
+        try:
+            if not self.prepare():
+                return 1
+            for worker in self.workers:
+                worker.start()
+
+            while not self.stopping:
+                if self.reload_requested:
+                    self.reload_requested = False
+                    self.rolling_restart()
+                self.check_workers()
+                time.sleep(CHECK_INTERVAL)
+        finally:
+            self.shutdown()
+            shutil.rmtree(self.heartbeat_dir, ignore_errors=True)
+        return 0
+
+    def shutdown(self):
+        """Мягко остановить всех: SIGTERM сразу всем, затем ждать"""
+        running = [worker for worker in self.workers if worker.alive()]
+        for worker in running:
+            worker.process.terminate()
+        deadline = time.monotonic() + WORKER_SHUTDOWN_TIMEOUT + 5
+        for worker in running:
+            try:
+                worker.process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                logger.warning(f"⚠️ {worker.name} did not stop in time, killing")
+                worker.process.kill()
+                worker.process.wait()
+        logger.info("✅ All workers stopped")
+
+    # ---------- Проверки ----------
+
+    def check_workers(self):
+        now = time.monotonic()
+        for index, worker in enumerate(self.workers):
+            if self.stopping:
+                return
+
+            if not worker.alive():
+                if worker.process is not None and worker.next_start_at == 0.0:
+                    self._schedule_restart(worker, f"exited with code {worker.process.returncode}")
+                if now >= worker.next_start_at:
+                    worker.restarts += 1
+                    worker.next_start_at = 0.0
+                    worker.start()
+                continue
+
+            if not worker.ready():
+                if now - worker.started_at > WORKER_START_TIMEOUT:
+                    logger.error(f"❌ {worker.name} did not become ready in {WORKER_START_TIMEOUT:.0f}s")
+                    worker.stop(timeout=0)
+                continue
+
+            age = worker.heartbeat_age()
+            if age > WORKER_HEARTBEAT_TIMEOUT:
+                logger.error(f"💔 {worker.name} (pid {worker.pid}) missed heartbeat for {age:.0f}s, killing")
+                worker.stop(timeout=0)
+                continue
+
+            if WORKER_MAX_RSS_MB and self.rss_supported:
+                memory = rss_mb(worker.pid)
+                if memory is None:
+                    self.rss_supported = False
+                    logger.warning("⚠️ Cannot read process RSS - WORKER_MAX_RSS_MB disabled")
+                elif memory > WORKER_MAX_RSS_MB:
+                    logger.warning(
+                        f"🐘 {worker.name} (pid {worker.pid}) uses {memory:.0f} MB > {WORKER_MAX_RSS_MB} MB, restarting"
+                    )
+                    self.workers[index] = self.replace(worker)
+
+    def _schedule_restart(self, worker: Worker, reason: str):
+        uptime = time.monotonic() - worker.started_at
+        if uptime < CRASH_WINDOW:
+            # Падает сразу после старта - не крутить перезапуски в цикле
+            delay = min(MAX_RESTART_DELAY, 2 ** min(worker.restarts, 6))
+        else:
+            worker.restarts = 0
+            delay = 0.0
+        worker.next_start_at = time.monotonic() + delay
+        logger.error(f"❌ {worker.name} (pid {worker.pid}) {reason} after {uptime:.0f}s, restart in {delay:.0f}s")
+
+    # ---------- Перезапуск ----------
+
+    def replace(self, worker: Worker) -> Worker:
+        """
+        Заменить процесс новым
+
+        API: новый воркер стартует на том же порту (SO_REUSEPORT), старый
+        останавливается, когда новый готов. Бот и планировщик не могут
+        работать в двух экземплярах - сначала остановка, затем запуск.
+        """
+        if worker.role != 'api' or not hasattr(socket, 'SO_REUSEPORT'):
+            worker.stop()
+            worker.restarts += 1
+            worker.start()
+            return worker
+
+        replacement = worker.clone()
+        replacement.start()
+        deadline = time.monotonic() + WORKER_START_TIMEOUT
+        while not replacement.ready():
+            if not replacement.alive() or time.monotonic() > deadline or self.stopping:
+                logger.error(f"❌ Replacement for {worker.name} failed to start, keeping pid {worker.pid}")
+                replacement.stop(timeout=0)
+                return worker
+            time.sleep(0.2)
+
+        worker.stop()
+        if os.path.exists(worker.heartbeat_file):
+            os.unlink(worker.heartbeat_file)
+        logger.info(f"🔁 {worker.name}: pid {worker.pid} -> {replacement.pid}")
+        return replacement
+
+    def rolling_restart(self):
+        for index, worker in enumerate(list(self.workers)):
+            if self.stopping:
+                return
+            if worker.alive():
+                self.workers[index] = self.replace(worker)
+        logger.info("✅ Rolling restart finished")
+
+
+def default_workers() -> int:
+    if not hasattr(socket, 'SO_REUSEPORT'):
+        # Без SO_REUSEPORT два процесса не откроют один порт
+        return 1
+    return API_WORKERS or os.cpu_count() or 1
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=None, help='API-воркеров (по умолчанию API_WORKERS или число ядер)')
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 8080)))
+    parser.add_argument('--no-bot', action='store_true', help='Не запускать бота')
+    parser.add_argument('--no-scheduler', action='store_true', help='Не запускать планировщик')
+    parser.add_argument('--role', choices=ROLES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.role:
+        run_role(args.role, args.port)
+        sys.exit(0)
+
+    setup_logging('supervisor')
+    workers = args.workers or default_workers()
+    if workers > 1 and not hasattr(socket, 'SO_REUSEPORT'):
+        logger.warning("⚠️ SO_REUSEPORT is not supported - running a single API worker")
+        workers = 1
+    supervisor = Supervisor(workers, args.port, bot=not args.no_bot, scheduler=not args.no_scheduler)
+    sys.exit(supervisor.run())
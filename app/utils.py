@@ -70,10 +70,9 @@ def verify_telegram_webapp_data(init_data: str) -> dict:
         return None
 
 def generate_order_number() -> str:
-    """Генерирует уникальный номер заказа"""
-    now = datetime.now()
-    timestamp = now.strftime("%Y%m%d%H%M%S")
-    return f"ORD-{timestamp}"
+    """Генерирует уникальный номер заказа (ORD-0000123, см. services/order_numbers)"""
+    from services.order_numbers import order_numbers
+    return order_numbers.next()
 
 def calculate_bonus_amount(total: float, bonus_percent: float) -> float:
     """Рассчитывает сумму бонусов к начислению"""
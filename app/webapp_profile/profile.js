@@ -37,21 +37,12 @@ async function loadProfile() {
     document.getElementById('totalSaved').textContent = `${profile.total_saved.toLocaleString()}₸`;
 }
 
-// Загрузка заказов
-async function loadOrders(status = 'all') {
-    const endpoint = status === 'all' 
-        ? `/api/client/orders?user_id=${userId}`
-        : `/api/client/orders?user_id=${userId}&status=${status}`;
-    
-    const orders = await apiRequest(endpoint);
-    const container = document.getElementById('ordersList');
-    
-    if (!orders || orders.length === 0) {
-        container.innerHTML = '<div class="empty-state">Заказов пока нет</div>';
-        return;
-    }
-    
-    container.innerHTML = orders.map(order => `
+// Загрузка заказов (постранично: курсор следующей страницы в X-Next-Cursor)
+let ordersStatus = 'all';
+let ordersCursor = null;
+
+function renderOrderCard(order) {
+    return `
         <div class="order-card">
             <div class="order-header">
                 <span class="order-number">Заказ #${order.id}</span>
@@ -66,7 +57,47 @@ async function loadOrders(status = 'all') {
                 <button class="order-btn" onclick="viewOrder(${order.id})">👁 Детали</button>
             </div>
         </div>
-    `).join('');
+    `;
+}
+
+async function loadOrders(status = 'all', cursor = null) {
+    ordersStatus = status;
+    let endpoint = status === 'all' 
+        ? `/api/client/orders?user_id=${userId}`
+        : `/api/client/orders?user_id=${userId}&status=${status}`;
+    if (cursor) endpoint += `&cursor=${encodeURIComponent(cursor)}`;
+    
+    let orders = null;
+    try {
+        const response = await fetch(`${API_BASE}${endpoint}`);
+        if (!response.ok) throw new Error('API Error');
+        ordersCursor = response.headers.get('X-Next-Cursor');
+        orders = await response.json();
+    } catch (error) {
+        console.error('API Error:', error);
+        tg.showAlert('Ошибка загрузки данных');
+    }
+    const container = document.getElementById('ordersList');
+    
+    if (!cursor && (!orders || orders.length === 0)) {
+        container.innerHTML = '<div class="empty-state">Заказов пока нет</div>';
+        return;
+    }
+    
+    const moreButton = document.getElementById('ordersMore');
+    if (moreButton) moreButton.remove();
+    
+    const html = (orders || []).map(renderOrderCard).join('');
+    if (cursor) {
+        container.insertAdjacentHTML('beforeend', html);
+    } else {
+        container.innerHTML = html;
+    }
+    
+    if (ordersCursor) {
+        container.insertAdjacentHTML('beforeend',
+            '<button id="ordersMore" class="order-btn" onclick="loadOrders(ordersStatus, ordersCursor)">Показать ещё</button>');
+    }
 }
 
 // Повторить заказ